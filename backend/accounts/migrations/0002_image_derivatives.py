@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="avatar_derivatives",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
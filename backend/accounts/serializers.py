@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from recipes.serializers import ImageDerivativesField
 from .models import UserProfile, UserPreference
 
 
@@ -12,11 +13,12 @@ class UserSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     age = serializers.ReadOnlyField()
+    avatar_images = ImageDerivativesField('avatar')
     
     class Meta:
         model = UserProfile
         fields = [
-            'bio', 'avatar', 'date_of_birth', 'age', 'dietary_restrictions',
+            'bio', 'avatar', 'avatar_images', 'date_of_birth', 'age', 'dietary_restrictions',
             'allergies', 'favorite_cuisines', 'disliked_ingredients',
             'cooking_skill_level', 'preferred_meal_time', 'activity_level',
             'weight_goal', 'notifications_enabled', 'meal_reminders',
@@ -35,11 +37,12 @@ class UserProfileDetailSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     preferences = UserPreferenceSerializer(source='user.preferences', many=True, read_only=True)
     age = serializers.ReadOnlyField()
+    avatar_images = ImageDerivativesField('avatar')
     
     class Meta:
         model = UserProfile
         fields = [
-            'user', 'bio', 'avatar', 'date_of_birth', 'age', 'dietary_restrictions',
+            'user', 'bio', 'avatar', 'avatar_images', 'date_of_birth', 'age', 'dietary_restrictions',
             'allergies', 'favorite_cuisines', 'disliked_ingredients',
             'cooking_skill_level', 'preferred_meal_time', 'activity_level',
             'weight_goal', 'notifications_enabled', 'meal_reminders',
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ai_assistant", "0003_alter_airequest_request_type"),
+        ("recipes", "0004_cursor_pagination_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="airequest",
+            index=models.Index(fields=["user", "-created_at", "-id"], name="airequest_user_created_idx"),
+        ),
+    ]
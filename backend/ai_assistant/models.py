@@ -22,6 +22,9 @@ class AIRequest(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='airequest_user_created_idx'),
+        ]
         
     def __str__(self):
         return f"{self.user.username} - {self.request_type} on {self.created_at.date()}"
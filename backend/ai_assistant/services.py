@@ -9,7 +9,8 @@ import google.generativeai as genai
 from PIL import Image
 from io import BytesIO
 
-from recipes.models import Recipe, Ingredient, Instruction, RecipeTag
+from recipes.models import Recipe
+from recipes.services import create_recipe
 from .models import AIRequest, FoodRecognition, RecipeGeneration
 
 logger = logging.getLogger(__name__)
@@ -281,50 +282,47 @@ class GeminiAIService:
             Recipe instance or None if creation fails
         """
         try:
-            # Create Recipe
-            recipe = Recipe.objects.create(
-                title=recipe_data.get('title', 'AI Generated Recipe'),
-                description=recipe_data.get('description', ''),
-                prep_time=recipe_data.get('prep_time', 30),
-                cook_time=recipe_data.get('cook_time', 30),
-                servings=recipe_data.get('servings', 4),
-                difficulty=recipe_data.get('difficulty', 'medium'),
-                cuisine=recipe_data.get('cuisine', 'other'),
-                created_by=user,
-                ai_generated=True,
+            nutrition = recipe_data.get('nutrition', {})
+            recipe_fields = {
+                'title': recipe_data.get('title', 'AI Generated Recipe'),
+                'description': recipe_data.get('description', ''),
+                'prep_time': recipe_data.get('prep_time', 30),
+                'cook_time': recipe_data.get('cook_time', 30),
+                'servings': recipe_data.get('servings', 4),
+                'difficulty': recipe_data.get('difficulty', 'medium'),
+                'cuisine': recipe_data.get('cuisine', 'other'),
+                'created_by': user,
+                'ai_generated': True,
                 # Nutrition data
-                calories_per_serving=recipe_data.get('nutrition', {}).get('calories_per_serving'),
-                protein_grams=recipe_data.get('nutrition', {}).get('protein_grams'),
-                carbs_grams=recipe_data.get('nutrition', {}).get('carbs_grams'),
-                fat_grams=recipe_data.get('nutrition', {}).get('fat_grams'),
-                fiber_grams=recipe_data.get('nutrition', {}).get('fiber_grams')
-            )
+                'calories_per_serving': nutrition.get('calories_per_serving'),
+                'protein_grams': nutrition.get('protein_grams'),
+                'carbs_grams': nutrition.get('carbs_grams'),
+                'fat_grams': nutrition.get('fat_grams'),
+                'fiber_grams': nutrition.get('fiber_grams'),
+            }
+            
+            ingredients = [
+                {
+                    'name': ingredient_data.get('name', ''),
+                    'quantity': ingredient_data.get('quantity', 1),
+                    'unit': ingredient_data.get('unit', 'piece'),
+                    'notes': ingredient_data.get('notes', ''),
+                    'order': idx + 1,
+                }
+                for idx, ingredient_data in enumerate(recipe_data.get('ingredients', []))
+            ]
+            
+            instructions = [
+                {
+                    'step_number': instruction_data.get('step_number', 1),
+                    'instruction': instruction_data.get('instruction', ''),
+                    'time_minutes': instruction_data.get('time_minutes'),
+                    'temperature': instruction_data.get('temperature', ''),
+                }
+                for instruction_data in recipe_data.get('instructions', [])
+            ]
             
-            # Create Ingredients
-            for idx, ingredient_data in enumerate(recipe_data.get('ingredients', [])):
-                Ingredient.objects.create(
-                    recipe=recipe,
-                    name=ingredient_data.get('name', ''),
-                    quantity=ingredient_data.get('quantity', 1),
-                    unit=ingredient_data.get('unit', 'piece'),
-                    notes=ingredient_data.get('notes', ''),
-                    order=idx + 1
-                )
-            
-            # Create Instructions
-            for instruction_data in recipe_data.get('instructions', []):
-                Instruction.objects.create(
-                    recipe=recipe,
-                    step_number=instruction_data.get('step_number', 1),
-                    instruction=instruction_data.get('instruction', ''),
-                    time_minutes=instruction_data.get('time_minutes'),
-                    temperature=instruction_data.get('temperature', '')
-                )
-            
-            # Create Tags
-            for tag_name in recipe_data.get('tags', []):
-                tag, created = RecipeTag.objects.get_or_create(name=tag_name.lower())
-                recipe.tags.add(tag)
+            recipe = create_recipe(recipe_fields, ingredients, instructions, recipe_data.get('tags', []))
             
             return recipe
             
@@ -5,6 +5,8 @@ from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.db import models
 
+from onlypans_backend.pagination import SwitchablePagination
+
 from .models import AIRequest, AIFeedback
 from .serializers import (
     AIRequestSerializer, AIRequestCreateSerializer, AIFeedbackSerializer,
@@ -18,6 +20,8 @@ class AIRequestListView(generics.ListAPIView):
     """List user's AI requests"""
     serializer_class = AIRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SwitchablePagination
+    cursor_ordering = ['-created_at', '-id']
     
     def get_queryset(self):
         return AIRequest.objects.filter(user=self.request.user).order_by('-created_at')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MealPlan, Meal, ShoppingList, ShoppingListItem, MealRating
+from .models import MealPlan, Meal, ShoppingList, ShoppingListItem, MealRating, IngredientCategoryRule
 
 
 class MealInline(admin.TabularInline):
@@ -68,3 +68,11 @@ class MealRatingAdmin(admin.ModelAdmin):
     list_filter = ['rating', 'would_make_again', 'created_at']
     search_fields = ['meal__recipe__title', 'user__username']
     readonly_fields = ['created_at']
+
+
+@admin.register(IngredientCategoryRule)
+class IngredientCategoryRuleAdmin(admin.ModelAdmin):
+    list_display = ['keyword', 'category']
+    list_editable = ['category']
+    list_filter = ['category']
+    search_fields = ['keyword', 'category']
@@ -0,0 +1,131 @@
+"""
+Shopping list categories for ingredient names.
+
+IngredientCategoryRule rows (editable in the admin) map a keyword or phrase
+to a category. They are compiled into a token index: each keyword is
+normalized to lower-cased singular words, then entered under every
+singular/plural spelling of them, so a name is matched on its raw
+lower-cased words by trying, at every word, the spellings that could start
+there, longest first. The longest phrase found wins, so "garlic powder" is
+Pantry even though "garlic" alone is Produce; between phrases of equal
+length the later one wins, since the head noun of an ingredient name
+usually comes last ("lemon pepper chicken" is chicken).
+
+The compiled index is cached per process and rebuilt when the rules
+version moves (rule saves and deletes bump it, see meals.signals), or at
+the latest every REFRESH_INTERVAL seconds. The interval covers rule edits
+served by other processes, whose version bumps a per-process cache
+(LocMemCache) never shows here. Results are memoized per name, as the
+same names recur across lists.
+"""
+import re
+import threading
+import time
+from itertools import product
+
+from recipes.cache import bump_version, get_version
+from recipes.catalog import singularize
+
+from .models import IngredientCategoryRule
+
+
+RULES_VERSION_KEY = 'meals:category-rules-version'
+DEFAULT_CATEGORY = 'Other'
+WORD = re.compile(r'[a-z]+')
+# Memoized names per compiled index, so an odd batch of unique names can't grow it forever
+MEMO_LIMIT = 50000
+REFRESH_INTERVAL = 60
+
+
+def tokenize(name):
+    return tuple(map(singularize, WORD.findall(name.lower())))
+
+
+def _word_forms(word):
+    """The words singularize() maps to word: itself and its plural spellings"""
+    candidates = {word, word + 's', word + 'es', word[:-1] + 'ies'}
+    return sorted(form for form in candidates if singularize(form) == word)
+
+
+class Categorizer:
+    """Compiled keyword -> category index; call it with an ingredient name"""
+
+    def __init__(self, rules):
+        self.phrases = {}
+        for keyword, category in rules:
+            words = tokenize(keyword)
+            if words:
+                self.phrases[words] = category
+        # Every singular/plural spelling of every phrase, joined by spaces, so
+        # names are matched on their raw lower-cased words without singularizing them
+        self.index = {}
+        # First word of a spelling -> the longest spelling starting with it
+        self.starts = {}
+        for words, category in self.phrases.items():
+            for spelling in product(*map(_word_forms, words)):
+                self.index[' '.join(spelling)] = category
+                self.starts[spelling[0]] = max(self.starts.get(spelling[0], 0), len(spelling))
+        self.memo = {}
+
+    def __call__(self, name):
+        category = self.memo.get(name)
+        if category is None:
+            category = self.categorize(name)
+            if len(self.memo) < MEMO_LIMIT:
+                self.memo[name] = category
+        return category
+
+    def categorize(self, name):
+        lowered = name.lower()
+        # str.split is several times faster than the regex, for names that are only letters and spaces
+        if lowered.isascii() and lowered.replace(' ', '').isalpha():
+            words = lowered.split()
+        else:
+            words = WORD.findall(lowered)
+        if self.starts.keys().isdisjoint(words):
+            return DEFAULT_CATEGORY
+        best_length, best = 0, DEFAULT_CATEGORY
+        for start, word in enumerate(words):
+            longest = self.starts.get(word)
+            if longest is None:
+                continue
+            if longest == 1:
+                # A later match of the same length takes over
+                if best_length <= 1:
+                    best_length, best = 1, self.index[word]
+                continue
+            for length in range(min(longest, len(words) - start), max(best_length, 1) - 1, -1):
+                category = self.index.get(' '.join(words[start:start + length]))
+                if category is not None:
+                    best_length, best = length, category
+                    break
+        return best
+
+
+_categorizer = None
+_version = None
+_compiled_at = None
+_lock = threading.Lock()
+
+
+def _current(version):
+    return (
+        _categorizer is not None and version == _version
+        and time.monotonic() - _compiled_at < REFRESH_INTERVAL
+    )
+
+
+def get_categorizer():
+    """The process's compiled categorizer, rebuilt as described above"""
+    global _categorizer, _version, _compiled_at
+    version = get_version(RULES_VERSION_KEY)
+    if not _current(version):
+        with _lock:
+            if not _current(version):
+                _categorizer = Categorizer(IngredientCategoryRule.objects.values_list('keyword', 'category'))
+                _version, _compiled_at = version, time.monotonic()
+    return _categorizer
+
+
+def rules_changed():
+    bump_version(RULES_VERSION_KEY)
@@ -0,0 +1,41 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from meals.categories import Categorizer, get_categorizer
+from recipes.benchmarks import WORDS, timed
+
+
+class Command(BaseCommand):
+    help = 'Measure ingredient categorization throughput, for unique and for repeated names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=20000, help='Ingredient names to categorize')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs (median is reported)')
+
+    def handle(self, *args, **options):
+        categorizer = get_categorizer()
+        keywords = [' '.join(words) for words in categorizer.phrases]
+        rng = random.Random(42)
+        # Two filler words before a rule keyword, or three and no keyword
+        names = [
+            ' '.join(rng.sample(WORDS, 2) + [rng.choice(keywords)]) if rng.random() < 0.8
+            else ' '.join(rng.sample(WORDS, 3))
+            for _ in range(options['names'])
+        ]
+        self.stdout.write(f'{len(categorizer.phrases)} rules, {len(names)} names')
+
+        def unique():
+            for name in names:
+                categorizer.categorize(name)
+
+        def memoized():
+            for name in names:
+                categorizer(name)
+
+        compile_ms = timed(lambda: Categorizer(zip(keywords, categorizer.phrases.values())), options['repeat'])
+        memoized()
+        for label, fn in (('unique names', unique), ('memoized names', memoized)):
+            ms = timed(fn, options['repeat'])
+            self.stdout.write(f'{label:>15}: {ms:8.1f} ms, {len(names) / ms:8.0f} names/ms')
+        self.stdout.write(f'{"compile":>15}: {compile_ms:8.2f} ms')
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from meals.categories import get_categorizer
+from meals.models import Meal, MealPlan, ShoppingList, ShoppingListItem
+from meals.shopping import rebuild_shopping_list
+from recipes.benchmarks import WORDS, seed_recipes, timed
+
+
+def per_meal_shopping_list(meal_plan):
+    """The previous implementation: one ingredient query per meal, one INSERT per item"""
+    shopping_list, _ = ShoppingList.objects.get_or_create(meal_plan=meal_plan)
+    shopping_list.items.all().delete()
+    categorize = get_categorizer()
+    totals = {}
+    for meal in meal_plan.meals.all():
+        for ingredient in meal.recipe.ingredients.all():
+            key = (ingredient.name.lower(), ingredient.unit)
+            if key in totals:
+                totals[key]['quantity'] += ingredient.quantity * meal.servings
+            else:
+                totals[key] = {
+                    'ingredient_name': ingredient.name,
+                    'quantity': ingredient.quantity * meal.servings,
+                    'unit': ingredient.unit,
+                    'category': categorize(ingredient.name),
+                }
+    for data in totals.values():
+        ShoppingListItem.objects.create(shopping_list=shopping_list, **data)
+
+
+def count_queries(fn):
+    # Counted with a wrapper: the debug query log is capped at 9000 entries
+    executed = []
+
+    def counter(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counter):
+        fn()
+    return len(executed)
+
+
+class Command(BaseCommand):
+    help = 'Compare per-meal and set-based shopping list generation for 30, 90 and 365 day plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, nargs='+', default=[30, 90, 365], help='Plan lengths to benchmark')
+        parser.add_argument('--recipes', type=int, default=300, help='Distinct recipes meals are drawn from')
+        parser.add_argument('--ingredients', type=int, default=10, help='Ingredients per recipe')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per plan (median is reported)')
+
+    def handle(self, *args, **options):
+        vocabulary = [f'{a} {b}' for a in WORDS[25:35] for b in WORDS[:20]]
+        with transaction.atomic():
+            recipe_ids = seed_recipes(options['recipes'], ingredients_per_recipe=options['ingredients'],
+                                      ingredient_names=vocabulary)
+            user, _ = User.objects.get_or_create(username='benchmark-user')
+            self.stdout.write(f"{'days':>6}{'meals':>7}{'items':>7}{'old q':>8}{'old ms':>10}{'new q':>8}{'new ms':>10}")
+            for days in options['days']:
+                plan = self.make_plan(user, days, recipe_ids)
+                row = [days, plan.meals.count()]
+                for generate in (per_meal_shopping_list, rebuild_shopping_list):
+                    row += [count_queries(lambda: generate(plan)), timed(lambda: generate(plan), options['repeat'])]
+                    items = ShoppingListItem.objects.filter(shopping_list__meal_plan=plan).count()
+                self.stdout.write(f'{row[0]:>6}{row[1]:>7}{items:>7}{row[2]:>8}{row[3]:>10.1f}{row[4]:>8}{row[5]:>10.1f}')
+            # Throw the synthetic data away
+            transaction.set_rollback(True)
+
+    def make_plan(self, user, days, recipe_ids):
+        start = date.today()
+        plan = MealPlan.objects.create(user=user, start_date=start, end_date=start + timedelta(days=days - 1))
+        meal_types = ['breakfast', 'lunch', 'dinner']
+        Meal.objects.bulk_create([
+            Meal(
+                meal_plan=plan, recipe_id=recipe_ids[(day * 3 + index) % len(recipe_ids)],
+                date=start + timedelta(days=day), meal_type=meal_type, servings=1 + (day + index) % 4,
+            )
+            for day in range(days)
+            for index, meal_type in enumerate(meal_types)
+        ])
+        return plan
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from meals.models import ShoppingList
+from meals.shopping import check_shopping_list, rebuild_shopping_list
+from meals.units import base_unit
+
+
+class Command(BaseCommand):
+    help = 'Compare stored shopping lists with a full recompute of their meal plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plan', type=int, action='append', help='Only check this meal plan id (repeatable)')
+        parser.add_argument('--fix', action='store_true',
+                            help='Rebuild lists that differ (purchased flags and notes are kept)')
+
+    def handle(self, *args, **options):
+        lists = ShoppingList.objects.select_related('meal_plan').order_by('id')
+        if options['plan']:
+            lists = lists.filter(meal_plan_id__in=options['plan'])
+
+        checked = inconsistent = 0
+        for shopping_list in lists.iterator(chunk_size=200):
+            checked += 1
+            differences = check_shopping_list(shopping_list)
+            if not differences:
+                continue
+            inconsistent += 1
+            self.stdout.write(f'Plan {shopping_list.meal_plan_id}: {len(differences)} item(s) differ')
+            for (name, family), stored, expected in differences[:20]:
+                unit = base_unit(family)
+                self.stdout.write(f'  {name}: stored {stored:g} {unit}, expected {expected:g} {unit}')
+            if options['fix']:
+                rebuild_shopping_list(shopping_list.meal_plan)
+
+        summary = f'Checked {checked} shopping lists, {inconsistent} inconsistent'
+        if options['fix'] and inconsistent:
+            summary += ', rebuilt'
+        self.stdout.write(summary)
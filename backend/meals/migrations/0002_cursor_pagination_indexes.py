@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("meals", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mealrating",
+            index=models.Index(fields=["user", "-created_at", "-id"], name="mealrating_user_created_idx"),
+        ),
+    ]
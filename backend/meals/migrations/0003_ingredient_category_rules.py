@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:50
+
+from django.db import migrations, models
+
+
+# The keyword lists shopping lists were categorized with before the rules table
+DEFAULT_RULES = {
+    "Produce": [
+        "tomato", "onion", "garlic", "potato", "carrot", "celery", "lettuce", "spinach",
+        "bell pepper", "cucumber", "avocado", "banana", "apple", "lemon", "lime",
+    ],
+    "Meat & Seafood": ["chicken", "beef", "pork", "fish", "salmon", "shrimp", "turkey", "lamb"],
+    "Dairy & Eggs": ["milk", "cheese", "butter", "yogurt", "cream", "eggs"],
+    "Pantry": [
+        "rice", "pasta", "flour", "sugar", "salt", "pepper", "oil", "vinegar",
+        "soy sauce", "garlic powder", "onion powder",
+    ],
+}
+
+
+def seed_rules(apps, schema_editor):
+    IngredientCategoryRule = apps.get_model("meals", "IngredientCategoryRule")
+    IngredientCategoryRule.objects.bulk_create([
+        IngredientCategoryRule(keyword=keyword, category=category)
+        for category, keywords in DEFAULT_RULES.items()
+        for keyword in keywords
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("meals", "0002_cursor_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngredientCategoryRule",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("keyword", models.CharField(help_text='Word or phrase, e.g. "garlic powder"', max_length=100, unique=True)),
+                ("category", models.CharField(max_length=50)),
+            ],
+            options={
+                "ordering": ["category", "keyword"],
+            },
+        ),
+        migrations.RunPython(seed_rules, migrations.RunPython.noop),
+    ]
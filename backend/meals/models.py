@@ -72,6 +72,18 @@ class ShoppingListItem(models.Model):
         return f"{self.quantity} {self.unit} {self.ingredient_name}"
 
 
+class IngredientCategoryRule(models.Model):
+    """Shopping list category for ingredient names containing a keyword (see meals.categories)"""
+    keyword = models.CharField(max_length=100, unique=True, help_text="Word or phrase, e.g. \"garlic powder\"")
+    category = models.CharField(max_length=50)
+    
+    class Meta:
+        ordering = ['category', 'keyword']
+        
+    def __str__(self):
+        return f"{self.keyword} -> {self.category}"
+
+
 class MealRating(models.Model):
     meal = models.ForeignKey(Meal, on_delete=models.CASCADE, related_name='ratings')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -82,6 +94,9 @@ class MealRating(models.Model):
     
     class Meta:
         unique_together = ['meal', 'user']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='mealrating_user_created_idx'),
+        ]
         
     def __str__(self):
         return f"{self.user.username} rated {self.meal}: {self.rating}/5"
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import MealPlan, Meal, ShoppingList, ShoppingListItem, MealRating
-from recipes.serializers import RecipeListSerializer
+from recipes.serializers import RecipeListSerializer, UserStateListSerializer
 
 
 class MealPlanSerializer(serializers.ModelSerializer):
@@ -18,6 +18,10 @@ class MealPlanSerializer(serializers.ModelSerializer):
         return obj.meals.count()
 
 
+class MealListSerializer(UserStateListSerializer):
+    recipe_id_attr = 'recipe_id'
+
+
 class MealSerializer(serializers.ModelSerializer):
     recipe_details = RecipeListSerializer(source='recipe', read_only=True)
     
@@ -28,36 +32,37 @@ class MealSerializer(serializers.ModelSerializer):
             'servings', 'notes', 'completed', 'completed_at', 'created_at'
         ]
         read_only_fields = ['meal_plan', 'created_at', 'completed_at']
+        list_serializer_class = MealListSerializer
+
+
+def meals_by_date(meals, dates=()):
+    """
+    {date: {meal type: meal or None}} over already serialized meals, with
+    an empty day for each of dates that has none
+    """
+    meal_types = [meal_type for meal_type, _ in Meal.MEAL_TYPE_CHOICES]
+    days = {date.isoformat(): dict.fromkeys(meal_types) for date in dates}
+    for meal in meals:
+        days.setdefault(meal['date'], dict.fromkeys(meal_types))[meal['meal_type']] = meal
+    return dict(sorted(days.items()))
 
 
 class MealPlanDetailSerializer(serializers.ModelSerializer):
     meals = MealSerializer(many=True, read_only=True)
-    meals_by_date = serializers.SerializerMethodField()
     
     class Meta:
         model = MealPlan
         fields = [
             'id', 'name', 'start_date', 'end_date', 'created_at', 
-            'updated_at', 'is_active', 'meals', 'meals_by_date'
+            'updated_at', 'is_active', 'meals'
         ]
         read_only_fields = ['user', 'created_at', 'updated_at']
     
-    def get_meals_by_date(self, obj):
-        meals = obj.meals.all().order_by('date', 'meal_type')
-        meals_dict = {}
-        
-        for meal in meals:
-            date_str = meal.date.isoformat()
-            if date_str not in meals_dict:
-                meals_dict[date_str] = {
-                    'breakfast': None,
-                    'lunch': None,
-                    'dinner': None,
-                    'snack': None
-                }
-            meals_dict[date_str][meal.meal_type] = MealSerializer(meal).data
-        
-        return meals_dict
+    def to_representation(self, instance):
+        # The grid reuses the serialized meals rather than serializing them again
+        data = super().to_representation(instance)
+        data['meals_by_date'] = meals_by_date(data['meals'])
+        return data
 
 
 class ShoppingListItemSerializer(serializers.ModelSerializer):
@@ -0,0 +1,193 @@
+"""
+Shopping list generation and upkeep.
+
+A plan's ingredient totals come from one grouped query over the
+ingredient -> recipe -> meal join: each ingredient scaled by the meal's
+servings over the recipe's, summed per (lower-cased name, unit). The rows
+are then converted to base units in one pass and merged per unit family
+(see meals.units), so "1 cup milk" and "4 tbsp milk" make one line, shown
+in a display unit that fits the total. A full rebuild merges those totals
+into the list inside a transaction, with one bulk INSERT, UPDATE and
+DELETE, so a plan of any length costs the same handful of queries.
+
+Between rebuilds the list is kept current by deltas: when a meal is added,
+removed, re-served or swapped to another recipe (see meals.signals), only
+the ingredients of the recipes involved are added or subtracted. Saving a
+scheduled recipe (its servings or ingredients may have changed) rebuilds
+the lists of the plans using it. Both paths update matching items in
+place, so purchased flags and notes survive. Ingredient rows written
+without saving their recipe (bulk scripts, the shell) are not seen;
+`manage.py check_shopping_lists` compares stored lists with a recompute.
+"""
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, Min, Sum, Value
+from django.db.models.functions import Greatest, Lower
+
+from recipes.models import Ingredient
+
+from .categories import get_categorizer
+from .models import MealPlan, ShoppingList, ShoppingListItem
+from .units import to_base, to_display
+
+
+# Base quantities within this of zero are what is left after subtracting a meal's share
+EPSILON = 1e-6
+
+
+def _totals(rows):
+    """
+    Sum (name, unit, quantity) rows into {(lower-cased name, unit family):
+    [name, base quantity, metric]}, converting every row in one pass
+    """
+    if not rows:
+        return {}
+    names, units, quantities = zip(*rows)
+    families, base, metric = to_base(units, quantities)
+    index, display_names, groups = {}, [], []
+    for name, unit_family in zip(names, families):
+        # Keyed in Python: SQLite's LOWER() only folds ASCII
+        key = (name.lower(), unit_family)
+        group = index.get(key)
+        if group is None:
+            group = index[key] = len(display_names)
+            display_names.append(name)
+        else:
+            display_names[group] = min(display_names[group], name)
+        groups.append(group)
+    groups = np.array(groups, dtype=np.intp)
+    sums = np.bincount(groups, weights=base, minlength=len(index)).tolist()
+    imperial = np.bincount(groups, weights=~metric, minlength=len(index)).tolist()
+    return {key: [display_names[group], sums[group], not imperial[group]] for key, group in index.items()}
+
+
+def ingredient_totals(meal_plan):
+    """{(lower-cased name, unit family): [name, base quantity, metric]} across the plan's meals"""
+    rows = (
+        Ingredient.objects.filter(recipe__scheduled_meals__meal_plan=meal_plan)
+        .annotate(key=Lower('name'))
+        .values('key', 'unit')
+        .annotate(name=Min('name'), quantity=Sum(
+            F('quantity') * F('recipe__scheduled_meals__servings') / Greatest(F('recipe__servings'), Value(1))
+        ))
+        .order_by()
+    )
+    return _totals([(row['name'], row['unit'], row['quantity']) for row in rows])
+
+
+def recipe_totals(servings_by_recipe):
+    """The same totals for {recipe id: planned servings}, where servings may be negative"""
+    ingredients = Ingredient.objects.filter(recipe_id__in=list(servings_by_recipe)).values_list(
+        'recipe_id', 'name', 'unit', 'quantity', 'recipe__servings'
+    )
+    return _totals([
+        (name, unit, quantity * servings_by_recipe[recipe_id] / max(recipe_servings, 1))
+        for recipe_id, name, unit, quantity, recipe_servings in ingredients
+    ])
+
+
+def _apply(shopping_list, totals, replace=False):
+    """
+    Add totals to the list's items, or with replace set make the items
+    equal to them. Matching items are updated in place, so their purchased
+    flags and notes survive; items that reach zero are removed, as are
+    extra items of the same name and unit family.
+    """
+    items = list(shopping_list.items.all())
+    families, stored, stored_metric = to_base([item.unit for item in items], [item.quantity for item in items])
+    matches = {}
+    for position, (item, unit_family) in enumerate(zip(items, families)):
+        matches.setdefault((item.ingredient_name.lower(), unit_family), []).append(position)
+
+    deleted = []
+    # (item or None for a new one, name, family, base quantity, metric) to set
+    changes = []
+    for key, (name, quantity, metric) in totals.items():
+        positions = matches.pop(key, None)
+        if positions is None:
+            if quantity > EPSILON:
+                changes.append((None, name, key[1], quantity, metric))
+            continue
+        deleted.extend(items[position] for position in positions[1:])
+        if not replace:
+            quantity += stored[positions].sum()
+            metric = metric and stored_metric[positions].all()
+        item = items[positions[0]]
+        if quantity <= EPSILON:
+            deleted.append(item)
+        else:
+            changes.append((item, name, key[1], quantity, metric))
+    if replace:
+        deleted.extend(items[position] for positions in matches.values() for position in positions)
+
+    created, updated = [], []
+    if changes:
+        units, quantities = to_display(*[[change[field] for change in changes] for field in (2, 3, 4)])
+        categorize = get_categorizer()
+        for (item, name, _, _, _), unit, quantity in zip(changes, units, quantities.tolist()):
+            if item is None:
+                created.append(ShoppingListItem(
+                    shopping_list=shopping_list, ingredient_name=name, quantity=quantity, unit=unit,
+                    category=categorize(name),
+                ))
+            elif unit != item.unit or abs(quantity - item.quantity) > EPSILON * max(1.0, quantity):
+                item.unit, item.quantity = unit, quantity
+                updated.append(item)
+
+    ShoppingListItem.objects.bulk_create(created)
+    ShoppingListItem.objects.bulk_update(updated, ['quantity', 'unit'])
+    if deleted:
+        ShoppingListItem.objects.filter(id__in=[item.id for item in deleted]).delete()
+
+
+def rebuild_shopping_list(meal_plan):
+    """Bring the plan's shopping list in line with its current ingredient totals"""
+    totals = ingredient_totals(meal_plan)
+    with transaction.atomic():
+        shopping_list, _ = ShoppingList.objects.get_or_create(meal_plan=meal_plan)
+        _apply(shopping_list, totals, replace=True)
+    return shopping_list
+
+
+def rebuild_shopping_lists(meal_plan_ids):
+    """Rebuild the shopping lists these plans have; plans without one (or deleted since) are skipped"""
+    for meal_plan in MealPlan.objects.filter(id__in=meal_plan_ids, shopping_list__isnull=False):
+        rebuild_shopping_list(meal_plan)
+
+
+def apply_meal_change(meal_plan_id, before, after):
+    """
+    Update a plan's shopping list for one meal going from `before` to
+    `after`, each a (recipe id, servings) pair or None for no meal.
+    """
+    servings = Counter()
+    if before is not None:
+        servings[before[0]] -= before[1]
+    if after is not None:
+        servings[after[0]] += after[1]
+    servings = {recipe_id: count for recipe_id, count in servings.items() if count}
+    if not servings:
+        return
+    with transaction.atomic():
+        shopping_list = ShoppingList.objects.select_for_update().filter(meal_plan_id=meal_plan_id).first()
+        if shopping_list is not None:
+            _apply(shopping_list, recipe_totals(servings))
+
+
+def check_shopping_list(shopping_list):
+    """(key, stored, expected) base quantities for every item that differs from a full recompute"""
+    expected = ingredient_totals(shopping_list.meal_plan)
+    items = list(shopping_list.items.values_list('ingredient_name', 'unit', 'quantity'))
+    families, quantities, _ = to_base([unit for _, unit, _ in items], [quantity for _, _, quantity in items])
+    stored = Counter()
+    for (name, _, _), unit_family, quantity in zip(items, families, quantities.tolist()):
+        stored[(name.lower(), unit_family)] += quantity
+    differences = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected[key][1] if key in expected else 0.0
+        have = stored.get(key, 0.0)
+        if abs(want - have) > EPSILON * max(1.0, abs(want)):
+            differences.append((key, have, want))
+    return differences
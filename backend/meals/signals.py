@@ -0,0 +1,119 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes.models import Recipe
+
+from .categories import rules_changed
+from .models import IngredientCategoryRule, Meal, MealPlan
+from .shopping import apply_meal_change, rebuild_shopping_lists
+
+
+@receiver(post_save, sender=Meal)
+@receiver(post_delete, sender=Meal)
+def touch_meal_plan(sender, instance, **kwargs):
+    # A plan's updated_at is the change marker for everything it renders.
+    # Runs before the shopping receivers below, so _shopping_state still
+    # holds the plan a moved meal came from.
+    plan_ids = {instance.__dict__.get('meal_plan_id')}
+    if instance._shopping_state is not None:
+        plan_ids.add(instance._shopping_state[0])
+    plan_ids.discard(None)
+    MealPlan.objects.filter(pk__in=plan_ids).update(updated_at=timezone.now())
+
+
+SHOPPING_FIELDS = ('meal_plan_id', 'recipe_id', 'servings')
+
+
+def _shopping_state(meal, default=None):
+    # Read from __dict__ so a meal loaded with deferred fields costs no query;
+    # fields it lacks take their value from default, a previous state
+    default = default or (None,) * len(SHOPPING_FIELDS)
+    values = tuple(meal.__dict__.get(field, previous) for field, previous in zip(SHOPPING_FIELDS, default))
+    return None if None in values else values
+
+
+def _cascaded(origin):
+    # The plan's list goes with a deleted plan or user; recipe deletes are handled below
+    return getattr(origin, 'model', type(origin)) in (MealPlan, User, Recipe)
+
+
+def _apply_state_change(before, after):
+    # States are (plan id, recipe id, servings); a meal moved between plans leaves one list and joins the other
+    if before is not None and after is not None and before[0] == after[0]:
+        apply_meal_change(after[0], before[1:], after[1:])
+        return
+    if before is not None:
+        apply_meal_change(before[0], before[1:], None)
+    if after is not None:
+        apply_meal_change(after[0], None, after[1:])
+
+
+@receiver(post_init, sender=Meal)
+def remember_meal_shopping_state(sender, instance, **kwargs):
+    instance._shopping_state = _shopping_state(instance) if instance.pk else None
+
+
+@receiver(pre_save, sender=Meal)
+@receiver(pre_delete, sender=Meal)
+def load_meal_shopping_state(sender, instance, origin=None, **kwargs):
+    # A meal loaded with deferred fields: read what its row holds before it changes
+    if instance._state.adding or instance._shopping_state is not None or _cascaded(origin):
+        return
+    instance._shopping_state = Meal.objects.filter(pk=instance.pk).values_list(*SHOPPING_FIELDS).first()
+
+
+@receiver(post_save, sender=Meal)
+def update_shopping_list_for_saved_meal(sender, instance, created, **kwargs):
+    before = None if created else instance._shopping_state
+    after = _shopping_state(instance, default=before)
+    if before != after:
+        _apply_state_change(before, after)
+    instance._shopping_state = after
+
+
+@receiver(post_delete, sender=Meal)
+def update_shopping_list_for_deleted_meal(sender, instance, origin=None, **kwargs):
+    if _cascaded(origin):
+        return
+    _apply_state_change(instance._shopping_state, None)
+
+
+# A full save, or one of the update path's, which always touches updated_at,
+# also after rewriting only the ingredients (in bulk, so with no signals of their own)
+RECIPE_SHOPPING_FIELDS = {'servings', 'updated_at'}
+
+
+@receiver(post_save, sender=Recipe)
+def update_shopping_lists_for_edited_recipe(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not RECIPE_SHOPPING_FIELDS.intersection(update_fields)):
+        return
+    recipe_id = instance.pk
+    # Once the ingredients written after the recipe row (admin inlines) are in as well
+    transaction.on_commit(lambda: rebuild_shopping_lists(
+        Meal.objects.filter(recipe_id=recipe_id).values('meal_plan_id')
+    ))
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_plans_of_deleted_recipe(sender, instance, **kwargs):
+    # Its meals cascade with it, but by their post_delete its ingredients may be gone as well
+    instance._shopping_plan_ids = list(
+        Meal.objects.filter(recipe=instance).order_by().values_list('meal_plan_id', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def update_shopping_lists_for_deleted_recipe(sender, instance, **kwargs):
+    plan_ids = getattr(instance, '_shopping_plan_ids', None)
+    if plan_ids:
+        # After the whole cascade, when plans deleted along with it are gone
+        transaction.on_commit(lambda: rebuild_shopping_lists(plan_ids))
+
+
+@receiver(post_save, sender=IngredientCategoryRule)
+@receiver(post_delete, sender=IngredientCategoryRule)
+def category_rules_changed(sender, instance, **kwargs):
+    rules_changed()
@@ -1,3 +1,276 @@
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, RecipeFavorite
+from recipes.services import create_recipe, update_recipe
+
+from .categories import get_categorizer, rules_changed
+from .models import IngredientCategoryRule, Meal, MealPlan, ShoppingList
+from .shopping import check_shopping_list, rebuild_shopping_list
+
+
+class ShoppingListDeltaTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.soup = self.recipe('Soup', 2, [('Milk', 1, 'cup'), ('Flour', 100, 'g'), ('Garlic', 2, 'clove')])
+        self.bread = self.recipe('Bread', 1, [('flour', 0.5, 'kg'), ('Butter', 2, 'tbsp')])
+        self.plan = self.meal_plan()
+        self.meal = Meal.objects.create(
+            meal_plan=self.plan, recipe=self.soup, date=date(2026, 1, 1), meal_type='dinner', servings=2
+        )
+        self.shopping_list = rebuild_shopping_list(self.plan)
+
+    def recipe(self, title, servings, ingredients):
+        return create_recipe(
+            {'title': title, 'description': title, 'prep_time': 5, 'cook_time': 5,
+             'servings': servings, 'created_by': self.user},
+            [{'name': name, 'quantity': quantity, 'unit': unit, 'order': order}
+             for order, (name, quantity, unit) in enumerate(ingredients)],
+            [],
+            [],
+        )
+
+    def meal_plan(self):
+        return MealPlan.objects.create(user=self.user, start_date=date(2026, 1, 1), end_date=date(2026, 1, 7))
+
+    def items(self, shopping_list=None):
+        shopping_list = shopping_list or self.shopping_list
+        return {
+            item.ingredient_name.lower(): (round(item.quantity, 6), item.unit)
+            for item in shopping_list.items.all()
+        }
+
+    def assertConsistent(self, shopping_list=None):
+        self.assertEqual(check_shopping_list(shopping_list or self.shopping_list), [])
+
+    def test_rebuild_merges_units_and_scales_by_recipe_servings(self):
+        self.assertEqual(self.items(), {'milk': (1, 'cup'), 'flour': (100, 'g'), 'garlic': (2, 'clove')})
+
+    def test_generating_costs_the_same_queries_for_any_plan_length(self):
+        def generate(meal_count):
+            plan = self.meal_plan()
+            for number in range(meal_count):
+                recipe, meal_type = (self.soup, 'dinner') if number % 2 else (self.bread, 'lunch')
+                Meal.objects.create(
+                    meal_plan=plan, recipe=recipe, date=date(2026, 1, 1 + number // 2), meal_type=meal_type
+                )
+            client = APIClient()
+            client.force_authenticate(self.user)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.post(f'/api/meals/plans/{plan.pk}/generate-shopping-list/')
+            self.assertEqual(response.status_code, 200)
+            return ShoppingList.objects.get(meal_plan=plan), len(queries)
+
+        _, few = generate(2)
+        shopping_list, many = generate(10)
+        self.assertEqual(many, few)
+        self.assertEqual(self.items(shopping_list)['butter'], (0.625, 'cup'))
+        self.assertEqual(
+            dict(shopping_list.items.values_list('ingredient_name', 'category')),
+            {'Butter': 'Dairy & Eggs', 'Flour': 'Pantry', 'Garlic': 'Produce', 'Milk': 'Dairy & Eggs'},
+        )
+        self.assertConsistent(shopping_list)
+
+    def test_adding_a_meal(self):
+        Meal.objects.create(meal_plan=self.plan, recipe=self.bread, date=date(2026, 1, 2), meal_type='lunch')
+        self.assertEqual(self.items()['flour'], (600, 'g'))
+        self.assertEqual(self.items()['butter'], (2, 'tbsp'))
+        self.assertConsistent()
+
+    def test_reserving_a_meal(self):
+        self.meal.servings = 4
+        self.meal.save()
+        self.assertEqual(self.items()['milk'], (2, 'cup'))
+        self.assertConsistent()
+
+    def test_swapping_a_recipe(self):
+        self.meal.recipe = self.bread
+        self.meal.save()
+        self.assertEqual(self.items(), {'flour': (1, 'kg'), 'butter': (0.25, 'cup')})
+        self.assertConsistent()
+
+    def test_deleting_a_meal(self):
+        self.meal.delete()
+        self.assertEqual(self.items(), {})
+        self.assertConsistent()
+
+    def test_moving_a_meal_to_another_plan(self):
+        other_plan = self.meal_plan()
+        other_list = rebuild_shopping_list(other_plan)
+        self.meal.meal_plan = other_plan
+        self.meal.save()
+        self.assertEqual(self.items(), {})
+        self.assertEqual(self.items(other_list)['milk'], (1, 'cup'))
+        self.assertConsistent()
+        self.assertConsistent(other_list)
+
+    def test_saving_a_meal_loaded_with_deferred_fields(self):
+        meal = Meal.objects.only('id', 'meal_plan').get(pk=self.meal.pk)
+        meal.servings = 6
+        meal.save()
+        self.assertEqual(self.items()['milk'], (3, 'cup'))
+        self.assertConsistent()
+
+    def test_deleting_a_meal_loaded_with_deferred_fields(self):
+        Meal.objects.only('id').get(pk=self.meal.pk).delete()
+        self.assertEqual(self.items(), {})
+        self.assertConsistent()
+
+    def test_deleting_a_scheduled_recipe(self):
+        Meal.objects.create(meal_plan=self.plan, recipe=self.bread, date=date(2026, 1, 2), meal_type='lunch')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bread.delete()
+        self.assertEqual(self.items()['flour'], (100, 'g'))
+        self.assertNotIn('butter', self.items())
+        self.assertConsistent()
+
+    def test_editing_a_scheduled_recipe(self):
+        ingredients = [
+            {'name': 'Milk', 'quantity': 3, 'unit': 'cup', 'order': 0},
+            {'name': 'Flour', 'quantity': 100, 'unit': 'g', 'order': 1},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            update_recipe(Recipe.objects.get(pk=self.soup.pk), {}, ingredients)
+        self.assertEqual(self.items(), {'milk': (3, 'cup'), 'flour': (100, 'g')})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_recipe(Recipe.objects.get(pk=self.soup.pk), {'servings': 4})
+        self.assertEqual(self.items(), {'milk': (1.5, 'cup'), 'flour': (50, 'g')})
+        self.assertConsistent()
+
+    def test_deleting_the_author_of_a_scheduled_recipe(self):
+        author = User.objects.create_user('baker', password='secret')
+        self.bread.created_by = author
+        self.bread.save()
+        Meal.objects.create(meal_plan=self.plan, recipe=self.bread, date=date(2026, 1, 2), meal_type='lunch')
+        with self.captureOnCommitCallbacks(execute=True):
+            author.delete()
+        self.assertEqual(self.items(), {'milk': (1, 'cup'), 'flour': (100, 'g'), 'garlic': (2, 'clove')})
+
+    def test_deleting_the_plan_with_its_meals(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.delete()
+        self.assertFalse(ShoppingList.objects.filter(pk=self.shopping_list.pk).exists())
+
+    def test_purchased_flags_and_notes_survive_changes(self):
+        item = self.shopping_list.items.get(ingredient_name='Milk')
+        item.purchased = True
+        item.notes = 'whole'
+        item.save()
+
+        Meal.objects.create(meal_plan=self.plan, recipe=self.soup, date=date(2026, 1, 2), meal_type='lunch')
+        rebuild_shopping_list(self.plan)
+
+        item.refresh_from_db()
+        self.assertEqual((item.purchased, item.notes, item.quantity), (True, 'whole', 1.5))
+        self.assertConsistent()
+
+    def test_check_shopping_lists_reports_and_fixes_drift(self):
+        self.shopping_list.items.filter(ingredient_name='Flour').update(quantity=5)
+
+        output = StringIO()
+        call_command('check_shopping_lists', stdout=output)
+        self.assertIn('flour: stored 5 g, expected 100 g', output.getvalue())
+        self.assertIn('1 inconsistent', output.getvalue())
+
+        call_command('check_shopping_lists', '--fix', stdout=StringIO())
+        self.assertConsistent()
+
+
+class CategorizerTests(TestCase):
+    def setUp(self):
+        # The compiled index outlives each test's rolled back rules
+        self.addCleanup(rules_changed)
+
+    def test_longest_phrase_then_last_word_wins(self):
+        categorize = get_categorizer()
+        self.assertEqual(categorize('Garlic'), 'Produce')
+        self.assertEqual(categorize('Garlic powder'), 'Pantry')
+        self.assertEqual(categorize('Lemon pepper chicken'), 'Meat & Seafood')
+        self.assertEqual(categorize('Ripe tomatoes'), 'Produce')
+        self.assertEqual(categorize('Dozen eggs'), 'Dairy & Eggs')
+        self.assertEqual(categorize('Saffron'), 'Other')
+
+    def test_rule_edits_are_picked_up(self):
+        IngredientCategoryRule.objects.create(keyword='saffron', category='Spices')
+        self.assertEqual(get_categorizer()('Saffron threads'), 'Spices')
+
+    def test_rule_edits_from_other_processes_are_picked_up_after_the_interval(self):
+        self.assertEqual(get_categorizer()('Milk'), 'Dairy & Eggs')
+        # An update() sends no signal, like an edit whose version bump went to another process's cache
+        IngredientCategoryRule.objects.filter(keyword='milk').update(category='Drinks')
+        self.assertEqual(get_categorizer()('Milk'), 'Dairy & Eggs')
+        with mock.patch('meals.categories.REFRESH_INTERVAL', 0):
+            self.assertEqual(get_categorizer()('Milk'), 'Drinks')
+
+
+class MealPlanConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.plan = MealPlan.objects.create(user=self.user, start_date=date(2026, 1, 1), end_date=date(2026, 1, 7))
+        self.recipes = []
+        for day in range(1, 5):
+            recipe = create_recipe({
+                'title': f'Recipe {day}', 'description': 'Dinner', 'prep_time': 5, 'cook_time': 5,
+                'created_by': self.user,
+            })
+            Meal.objects.create(meal_plan=self.plan, recipe=recipe, date=date(2026, 1, day), meal_type='dinner')
+            self.recipes.append(recipe)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/meals/plans/{self.plan.pk}/'
+
+    def favorite(self, *positions):
+        RecipeFavorite.objects.filter(user=self.user).delete()
+        for position in positions:
+            RecipeFavorite.objects.create(user=self.user, recipe=self.recipes[position])
+
+    def test_etag_tells_favorite_sets_with_equal_id_sums_apart(self):
+        self.favorite(0, 3)
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.favorite(1, 2)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_no_last_modified(self):
+        self.assertNotIn('Last-Modified', self.client.get(self.url))
+
+
+class MealPlanCalendarTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def calendar(self, plan, query=''):
+        return self.client.get(f'/api/meals/plans/{plan.pk}/calendar/{query}')
+
+    def test_default_range_is_capped_for_long_plans(self):
+        plan = MealPlan.objects.create(user=self.user, start_date=date(2026, 1, 1), end_date=date(2027, 12, 31))
+        response = self.calendar(plan)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['from'], response.data['to']), ('2026-01-01', '2027-01-01'))
+        self.assertEqual(len(response.data['meals_by_date']), 366)
+
+        self.assertEqual(self.calendar(plan, '?from=2026-01-01&to=2027-12-31').status_code, 400)
+
+    def test_grid_holds_each_day_of_the_range(self):
+        plan = MealPlan.objects.create(user=self.user, start_date=date(2026, 1, 1), end_date=date(2026, 1, 7))
+        recipe = create_recipe({
+            'title': 'Stew', 'description': 'Stew', 'prep_time': 5, 'cook_time': 5, 'created_by': self.user,
+        })
+        Meal.objects.create(meal_plan=plan, recipe=recipe, date=date(2026, 1, 2), meal_type='dinner')
 
-# Create your tests here.
+        days = self.calendar(plan, '?from=2026-01-01&to=2026-01-03').data['meals_by_date']
+        self.assertEqual(list(days), ['2026-01-01', '2026-01-02', '2026-01-03'])
+        self.assertIsNone(days['2026-01-01']['dinner'])
+        self.assertEqual(days['2026-01-02']['dinner']['recipe_details']['title'], 'Stew')
@@ -0,0 +1,85 @@
+"""
+Units for shopping list quantities.
+
+Every Ingredient unit belongs to a family. Volume and mass units convert to
+a base unit (ml, g) by a fixed factor; count units (piece, clove, can, ...)
+and "to taste" are each a family of their own, as a clove and a can of
+something don't convert, and so are units this table doesn't know (items
+edited by hand). Quantities are summed per family in base units, then shown
+in a display unit: the largest unit of a ladder that the quantity reaches,
+on the metric ladder when every contributing unit was metric and on the
+US one otherwise ("3 tsp" + "1 tbsp" is "2 tbsp", "400 ml" + "1 l" is
+"1.4 l", "1 cup" + "100 ml" is "1.42 cup").
+
+Both directions work on numpy arrays, so a whole plan's rows are converted
+in one pass.
+"""
+import numpy as np
+
+
+VOLUME = 'volume'
+MASS = 'mass'
+
+# unit: (family, base units per unit, metric)
+UNITS = {
+    'tsp': (VOLUME, 4.92892159375, False),
+    'tbsp': (VOLUME, 14.78676478125, False),
+    'cup': (VOLUME, 236.5882365, False),
+    'ml': (VOLUME, 1.0, True),
+    'l': (VOLUME, 1000.0, True),
+    'oz': (MASS, 28.349523125, False),
+    'lb': (MASS, 453.59237, False),
+    'g': (MASS, 1.0, True),
+    'kg': (MASS, 1000.0, True),
+}
+BASE_UNITS = {VOLUME: 'ml', MASS: 'g'}
+
+# (family, metric): display units from smallest, with the base quantity each starts at
+LADDERS = {
+    (VOLUME, False): [('tsp', 0.0), ('tbsp', UNITS['tbsp'][1]), ('cup', UNITS['cup'][1] / 4)],
+    (VOLUME, True): [('ml', 0.0), ('l', UNITS['l'][1])],
+    (MASS, False): [('oz', 0.0), ('lb', UNITS['lb'][1])],
+    (MASS, True): [('g', 0.0), ('kg', UNITS['kg'][1])],
+}
+
+
+def family(unit):
+    return UNITS[unit][0] if unit in UNITS else unit
+
+
+def base_unit(family):
+    return BASE_UNITS.get(family, family)
+
+
+def to_base(units, quantities):
+    """
+    (families, base quantities, metric flags) for parallel sequences of
+    units and quantities; units outside the table are kept as they are.
+    """
+    known = [UNITS.get(unit, (unit, 1.0, True)) for unit in units]
+    families = [entry[0] for entry in known]
+    factors = np.fromiter((entry[1] for entry in known), dtype=float, count=len(known))
+    metric = np.fromiter((entry[2] for entry in known), dtype=bool, count=len(known))
+    return families, np.asarray(quantities, dtype=float) * factors, metric
+
+
+def to_display(families, quantities, metric):
+    """(units, quantities) in display units for base quantities, as laid out above"""
+    families = np.asarray(families, dtype=object)
+    quantities = np.asarray(quantities, dtype=float)
+    metric = np.asarray(metric, dtype=bool)
+    units = families.copy()
+    display = quantities.copy()
+    for (ladder_family, ladder_metric), ladder in LADDERS.items():
+        rows = np.flatnonzero((families == ladder_family) & (metric == ladder_metric))
+        if not len(rows):
+            continue
+        names = np.array([unit for unit, _ in ladder], dtype=object)
+        starts = np.array([start for _, start in ladder])
+        factors = np.array([UNITS[unit][1] for unit, _ in ladder])
+        # Tolerance for base quantities a rounding error short of a step (3 tsp -> 1 tbsp)
+        steps = np.searchsorted(starts, quantities[rows] * (1 + 1e-9), side='right') - 1
+        steps = np.maximum(steps, 0)
+        units[rows] = names[steps]
+        display[rows] = quantities[rows] / factors[steps]
+    return units.tolist(), display
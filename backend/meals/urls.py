@@ -6,6 +6,7 @@ urlpatterns = [
     path('plans/', views.MealPlanListCreateView.as_view(), name='meal-plan-list-create'),
     path('plans/<int:pk>/', views.MealPlanDetailView.as_view(), name='meal-plan-detail'),
     path('plans/<int:meal_plan_id>/stats/', views.meal_plan_stats, name='meal-plan-stats'),
+    path('plans/<int:meal_plan_id>/calendar/', views.meal_plan_calendar, name='meal-plan-calendar'),
     
     # Meals
     path('plans/<int:meal_plan_id>/meals/', views.MealListCreateView.as_view(), name='meal-list-create'),
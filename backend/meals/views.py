@@ -3,15 +3,20 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import Q, Count, Max, Prefetch, Sum
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
 
+from onlypans_backend.conditional import ConditionalRetrieveMixin
+from onlypans_backend.pagination import SwitchablePagination
+
 from .models import MealPlan, Meal, ShoppingList, ShoppingListItem, MealRating
+from .shopping import rebuild_shopping_list
 from .serializers import (
     MealPlanSerializer, MealPlanDetailSerializer, MealSerializer,
-    ShoppingListSerializer, ShoppingListItemSerializer, MealRatingSerializer
+    ShoppingListSerializer, ShoppingListItemSerializer, MealRatingSerializer, meals_by_date
 )
-from recipes.models import Recipe
+from recipes.models import Recipe, RecipeFavorite, RecipeRating
 
 
 class MealPlanListCreateView(generics.ListCreateAPIView):
@@ -28,13 +33,39 @@ class MealPlanListCreateView(generics.ListCreateAPIView):
         ShoppingList.objects.create(meal_plan=meal_plan)
 
 
-class MealPlanDetailView(generics.RetrieveUpdateDestroyAPIView):
+class MealPlanDetailView(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a meal plan"""
     serializer_class = MealPlanDetailSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return MealPlan.objects.filter(user=self.request.user).prefetch_related('meals__recipe')
+        return MealPlan.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('meals', queryset=Meal.objects.select_related('recipe__created_by').prefetch_related('recipe__tags'))
+        )
+    
+    def get_version(self):
+        plan = MealPlan.objects.filter(pk=self.kwargs['pk'], user=self.request.user).values('id', 'updated_at').first()
+        if plan is None:
+            return None
+        
+        # Meal writes touch plan.updated_at; the embedded recipe cards and the
+        # user's own favorites/ratings on them are fingerprinted here
+        planned = Q(scheduled_meals__meal_plan_id=plan['id'])
+        recipes = Recipe.objects.filter(planned).aggregate(
+            changed_at=Max('updated_at'), ratings=Sum('rating_count'), rating_sum=Sum('rating_sum')
+        )
+        # The ids themselves: a count and a sum of ids can't tell {1, 4} from {2, 3}
+        favorites = sorted(set(
+            RecipeFavorite.objects.filter(user=self.request.user, recipe__scheduled_meals__meal_plan_id=plan['id'])
+            .values_list('recipe_id', flat=True)
+        ))
+        own_ratings = RecipeRating.objects.filter(user=self.request.user, recipe__scheduled_meals__meal_plan_id=plan['id']).aggregate(
+            count=Count('id'), changed_at=Max('updated_at')
+        )
+        
+        markers = (plan, sorted(recipes.items()), favorites, sorted(own_ratings.items()))
+        # No Last-Modified, for the reason given in RecipeDetailView.get_version
+        return markers, None
 
 
 class MealListCreateView(generics.ListCreateAPIView):
@@ -45,7 +76,7 @@ class MealListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         meal_plan_id = self.kwargs.get('meal_plan_id')
         meal_plan = get_object_or_404(MealPlan, id=meal_plan_id, user=self.request.user)
-        return Meal.objects.filter(meal_plan=meal_plan).select_related('recipe')
+        return Meal.objects.filter(meal_plan=meal_plan).select_related('recipe__created_by').prefetch_related('recipe__tags')
     
     def perform_create(self, serializer):
         meal_plan_id = self.kwargs.get('meal_plan_id')
@@ -84,73 +115,11 @@ def generate_shopping_list(request, meal_plan_id):
     """Generate shopping list from meal plan"""
     meal_plan = get_object_or_404(MealPlan, id=meal_plan_id, user=request.user)
     
-    # Get or create shopping list
-    shopping_list, created = ShoppingList.objects.get_or_create(meal_plan=meal_plan)
-    
-    # Clear existing items
-    shopping_list.items.all().delete()
-    
-    # Aggregate ingredients from all meals
-    ingredient_totals = {}
-    
-    for meal in meal_plan.meals.all():
-        for ingredient in meal.recipe.ingredients.all():
-            key = (ingredient.name.lower(), ingredient.unit)
-            if key in ingredient_totals:
-                ingredient_totals[key]['quantity'] += ingredient.quantity * meal.servings
-            else:
-                ingredient_totals[key] = {
-                    'name': ingredient.name,
-                    'quantity': ingredient.quantity * meal.servings,
-                    'unit': ingredient.unit,
-                    'category': _categorize_ingredient(ingredient.name)
-                }
-    
-    # Create shopping list items
-    for ingredient_data in ingredient_totals.values():
-        ShoppingListItem.objects.create(
-            shopping_list=shopping_list,
-            **ingredient_data
-        )
+    rebuild_shopping_list(meal_plan)
     
     return Response({'message': 'Shopping list generated successfully'}, status=status.HTTP_200_OK)
 
 
-def _categorize_ingredient(ingredient_name):
-    """Categorize ingredient for shopping list organization"""
-    ingredient_lower = ingredient_name.lower()
-    
-    # Define categories
-    produce = ['tomato', 'onion', 'garlic', 'potato', 'carrot', 'celery', 'lettuce', 'spinach', 
-               'bell pepper', 'cucumber', 'avocado', 'banana', 'apple', 'lemon', 'lime']
-    
-    meat_seafood = ['chicken', 'beef', 'pork', 'fish', 'salmon', 'shrimp', 'turkey', 'lamb']
-    
-    dairy = ['milk', 'cheese', 'butter', 'yogurt', 'cream', 'eggs']
-    
-    pantry = ['rice', 'pasta', 'flour', 'sugar', 'salt', 'pepper', 'oil', 'vinegar', 
-              'soy sauce', 'garlic powder', 'onion powder']
-    
-    # Check categories
-    for item in produce:
-        if item in ingredient_lower:
-            return 'Produce'
-    
-    for item in meat_seafood:
-        if item in ingredient_lower:
-            return 'Meat & Seafood'
-    
-    for item in dairy:
-        if item in ingredient_lower:
-            return 'Dairy & Eggs'
-    
-    for item in pantry:
-        if item in ingredient_lower:
-            return 'Pantry'
-    
-    return 'Other'
-
-
 class ShoppingListView(generics.RetrieveAPIView):
     """Get shopping list for a meal plan"""
     serializer_class = ShoppingListSerializer
@@ -192,6 +161,8 @@ class MealRatingListCreateView(generics.ListCreateAPIView):
     """List meal ratings or create a new rating"""
     serializer_class = MealRatingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SwitchablePagination
+    cursor_ordering = ['-created_at', '-id']
     
     def get_queryset(self):
         return MealRating.objects.filter(user=self.request.user).order_by('-created_at')
@@ -231,3 +202,53 @@ def meal_plan_stats(request, meal_plan_id):
     }
     
     return Response(stats)
+
+
+# Longest ?from= .. ?to= range the calendar serves, in days
+CALENDAR_MAX_DAYS = 366
+
+
+def _query_date(request, name, default):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+    return parsed
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def meal_plan_calendar(request, meal_plan_id):
+    """Get a plan's meals as a day-by-day grid from ?from= to ?to= (the plan's dates by default)"""
+    meal_plan = get_object_or_404(MealPlan, id=meal_plan_id, user=request.user)
+    try:
+        start = _query_date(request, 'from', meal_plan.start_date)
+        # By default up to the plan's end, within the longest range served
+        last_day = start + timedelta(days=CALENDAR_MAX_DAYS - 1)
+        end = _query_date(request, 'to', max(start, min(meal_plan.end_date, last_day)))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if end < start:
+        return Response({'error': 'to must not be before from'}, status=status.HTTP_400_BAD_REQUEST)
+    if (end - start).days >= CALENDAR_MAX_DAYS:
+        return Response(
+            {'error': f'The range can span at most {CALENDAR_MAX_DAYS} days'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    meals = (
+        Meal.objects.filter(meal_plan=meal_plan, date__range=(start, end))
+        .select_related('recipe__created_by').prefetch_related('recipe__tags')
+    )
+    serialized = MealSerializer(meals, many=True, context={'request': request}).data
+    dates = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    return Response({
+        'id': meal_plan.id,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'meals_by_date': meals_by_date(serialized, dates),
+    })
@@ -0,0 +1,46 @@
+"""
+Conditional GET support for detail views.
+
+A view mixes in ConditionalRetrieveMixin and implements get_version(), which
+must read only a few change markers (timestamps, counters) rather than the
+object graph. When the client's If-None-Match / If-Modified-Since still
+match, the view answers 304 without loading or serializing anything.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalRetrieveMixin:
+    """ETag / Last-Modified handling around RetrieveModelMixin.retrieve"""
+
+    def get_version(self):
+        """
+        Return (markers, last_modified) for the requested object, or None to
+        skip conditional handling (unknown object, no access, ...).
+
+        markers is any repr-able value that changes whenever the payload does;
+        last_modified is an aware datetime or None.
+        """
+        raise NotImplementedError
+
+    def retrieve(self, request, *args, **kwargs):
+        version = self.get_version()
+        if version is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        markers, last_modified = version
+        etag = quote_etag(hashlib.md5(repr(markers).encode()).hexdigest())
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        # The payload carries per-user state (favorites, own ratings)
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,148 @@
+"""
+Pagination classes shared by the API apps.
+
+List views default to page-number pagination. Views that declare a
+`cursor_ordering` also accept `?pagination=cursor` (or a `cursor` parameter)
+and then page with a keyset cursor, so every page costs the same regardless
+of depth and no COUNT(*) is issued. The cursor follows the client's
+`ordering` when there is one; an order it can't key on, such as search
+relevance, is a 400 rather than silently dropped.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination over the queryset's ordering, or the
+    view's `cursor_ordering` when the queryset has none.
+
+    Every ordering term must be a non-null model field; the id is appended
+    as a tie-breaker unless already present, so the cursor identifies an
+    exact position.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+    invalid_ordering_message = (
+        'Cursor pagination needs an ordering by model fields; '
+        'pass an explicit ordering (search relevance cannot be paged this way) or use page numbers'
+    )
+
+    def get_ordering(self, queryset, view):
+        ordering = list(queryset.query.order_by) or list(view.cursor_ordering)
+        opts = queryset.model._meta
+        keys = []
+        for term in ordering:
+            if not isinstance(term, str):
+                raise ValidationError({'ordering': self.invalid_ordering_message})
+            name = term.lstrip('-')
+            name = opts.pk.name if name == 'pk' else name
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                field = None
+            # NULLs would fall outside the keyset comparisons
+            if field is None or not field.concrete or field.is_relation or field.null:
+                raise ValidationError({'ordering': self.invalid_ordering_message})
+            keys.append((field.attname, term.startswith('-')))
+        if not any(name == opts.pk.attname for name, _ in keys):
+            keys.append((opts.pk.attname, keys[-1][1] if keys else False))
+        return keys
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keys = self.get_ordering(queryset, view)
+        self.fields = [queryset.model._meta.get_field(name) for name, _ in self.keys]
+
+        queryset = queryset.order_by(*[f"{'-' if descending else ''}{name}" for name, descending in self.keys])
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self.position_filter(self.decode_cursor(encoded)))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.last_item = page[-1] if page else None
+        return page
+
+    def position_filter(self, values):
+        """Rows strictly after `values` in keyset order, as OR'ed lexicographic terms"""
+        position = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            term = Q(**{
+                earlier_name: earlier_value
+                for (earlier_name, _), earlier_value in zip(self.keys[:index], values)
+            })
+            term &= Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+            position |= term
+        return position
+
+    def encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, encoded):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (TypeError, ValueError, DjangoValidationError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_item))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SwitchablePagination(PageNumberPagination):
+    """Page-number pagination that switches to keyset pagination on request"""
+    mode_query_param = 'pagination'
+    cursor_paginator_class = KeysetPagination
+
+    def use_cursor(self, request, view):
+        if not getattr(view, 'cursor_ordering', None):
+            return False
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_paginator_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request, view):
+            self.cursor_paginator = self.cursor_paginator_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -168,6 +168,30 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Cache - local memory by default. Switch to the file backend
+# ("django.core.cache.backends.filebased.FileBasedCache" with a LOCATION
+# directory) to share cached recipe listings between worker processes.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "onlypans",
+    }
+}
+
+# Seconds an anonymous recipe listing stays cached (writes invalidate sooner)
+RECIPE_LIST_CACHE_TIMEOUT = 300
+
+# Personalized feeds are rebuilt by `manage.py build_recipe_feeds --loop`
+# when the user's tastes change, and at least this often (seconds) so new
+# recipes reach them
+RECIPE_FEED_MAX_AGE = 6 * 60 * 60
+
+# Uploaded images are resized by `manage.py process_image_derivatives`.
+# Eager mode builds them at the end of the uploading request instead, so
+# development works without the worker.
+IMAGE_DERIVATIVE_FORMAT = "WEBP"
+IMAGE_DERIVATIVES_EAGER = os.getenv("IMAGE_DERIVATIVES_EAGER", "False").lower() == "true"
+
 # Gemini AI Configuration (optional - add your API key)
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '')
 
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Recipe, Ingredient, Instruction, RecipeTag, RecipeRating, RecipeFavorite
+from .models import (
+    Recipe, Ingredient, Instruction, RecipeTag, RecipeRating, RecipeFavorite, RecipeStatistic,
+    ImageDerivativeJob, IngredientCatalog, RecipeFeed, SimilarityBuild
+)
 
 
 class IngredientInline(admin.TabularInline):
@@ -21,7 +24,7 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ['title', 'cuisine', 'difficulty', 'prep_time', 'cook_time', 'servings', 'created_by', 'is_public', 'ai_generated', 'created_at']
     list_filter = ['cuisine', 'difficulty', 'is_public', 'ai_generated', 'created_at']
     search_fields = ['title', 'description', 'created_by__username']
-    readonly_fields = ['created_at', 'updated_at', 'average_rating', 'total_time']
+    readonly_fields = ['created_at', 'updated_at', 'rating_count', 'average_rating', 'total_time']
     # filter_horizontal = ['tags']  # This doesn't work for reverse M2M relationships
     
     fieldsets = (
@@ -38,6 +41,10 @@ class RecipeAdmin(admin.ModelAdmin):
         ('Meta Information', {
             'fields': ('created_by', 'is_public', 'ai_generated', 'source_image', 'tags')
         }),
+        ('Ratings', {
+            'fields': ('rating_count', 'average_rating'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -56,10 +63,7 @@ class RecipeAdmin(admin.ModelAdmin):
 class RecipeTagAdmin(admin.ModelAdmin):
     list_display = ['name', 'recipe_count']
     search_fields = ['name']
-    
-    def recipe_count(self, obj):
-        return obj.recipes.count()
-    recipe_count.short_description = 'Recipe Count'
+    readonly_fields = ['recipe_count']
 
 
 @admin.register(RecipeRating)
@@ -76,3 +80,39 @@ class RecipeFavoriteAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['recipe__title', 'user__username']
     readonly_fields = ['created_at']
+
+
+@admin.register(RecipeStatistic)
+class RecipeStatisticAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value', 'updated_at']
+    search_fields = ['name']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(ImageDerivativeJob)
+class ImageDerivativeJobAdmin(admin.ModelAdmin):
+    list_display = ['model_label', 'object_id', 'field_name', 'status', 'attempts', 'updated_at']
+    list_filter = ['status', 'model_label']
+    search_fields = ['source_name']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(IngredientCatalog)
+class IngredientCatalogAdmin(admin.ModelAdmin):
+    list_display = ['display_name', 'name', 'created_at']
+    search_fields = ['name', 'display_name']
+    readonly_fields = ['created_at']
+
+
+@admin.register(SimilarityBuild)
+class SimilarityBuildAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'full', 'recipes_scored', 'duration_ms']
+    list_filter = ['full']
+    readonly_fields = ['started_at', 'finished_at', 'full', 'recipes_scored', 'duration_ms']
+
+
+@admin.register(RecipeFeed)
+class RecipeFeedAdmin(admin.ModelAdmin):
+    list_display = ['user', 'built_at', 'invalidated_at']
+    search_fields = ['user__username']
+    readonly_fields = ['recipe_ids', 'built_at']
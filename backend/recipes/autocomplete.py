@@ -0,0 +1,104 @@
+"""Prefix autocomplete over tag names and catalog ingredient names, served from process memory"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from django.db.models import Count
+
+from .cache import get_tags_version
+from .models import Ingredient, IngredientCatalog, RecipeTag
+
+
+# Seconds before a reload: tags also reload when the tags version moves, but
+# that version lives in a per-process cache that other workers' writes don't bump
+TAG_REFRESH = 60
+INGREDIENT_REFRESH = 300
+
+
+def normalize_prefix(text):
+    return ' '.join(text.lower().split())
+
+
+class PrefixIndex:
+    """Sorted word-start keys over (name, count) entries, so "bre" finds "chicken breast" too"""
+
+    def __init__(self, entries):
+        # entries: (match name, display name, usage count), most used first
+        self.entries = [(display, count) for _, display, count in entries]
+        pairs = sorted(
+            (name[start:], position)
+            for position, (name, _, _) in enumerate(entries)
+            for start in range(len(name))
+            if start == 0 or name[start - 1] in ' -'
+        )
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, prefix, limit=10):
+        """The limit most used entries with a word starting with prefix, as (name, count)"""
+        prefix = normalize_prefix(prefix)
+        if not prefix:
+            return []
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', start)
+        # Entries are kept most used first, so the best matches have the lowest positions
+        best = heapq.nsmallest(limit, set(self.positions[start:end]))
+        return [self.entries[position] for position in best]
+
+
+class Autocomplete:
+    """The process's tag and ingredient indexes, reloaded when stale (see TAG_REFRESH)"""
+
+    def __init__(self):
+        self.tags = None
+        self.tags_version = None
+        self.tags_loaded = 0
+        self.ingredients = None
+        self.ingredients_loaded = 0
+        self.lock = threading.Lock()
+
+    def _tags_current(self, version):
+        return (
+            self.tags is not None and version == self.tags_version
+            and time.monotonic() - self.tags_loaded < TAG_REFRESH
+        )
+
+    def tag_index(self):
+        version = get_tags_version()
+        if not self._tags_current(version):
+            with self.lock:
+                if not self._tags_current(version):
+                    # Tags used by no recipe are left out
+                    tags = RecipeTag.objects.filter(recipe_count__gt=0).order_by('-recipe_count', 'name')
+                    self.tags = PrefixIndex([
+                        (normalize_prefix(name), name, count)
+                        for name, count in tags.values_list('name', 'recipe_count')
+                    ])
+                    self.tags_version, self.tags_loaded = version, time.monotonic()
+        return self.tags
+
+    def ingredient_index(self):
+        if self.ingredients is None or time.monotonic() - self.ingredients_loaded > INGREDIENT_REFRESH:
+            with self.lock:
+                if self.ingredients is None or time.monotonic() - self.ingredients_loaded > INGREDIENT_REFRESH:
+                    counts = dict(
+                        Ingredient.objects.filter(recipe__is_public=True, catalog__isnull=False).order_by()
+                        .values_list('catalog_id').annotate(count=Count('recipe_id', distinct=True))
+                    )
+                    entries = [
+                        (name, display_name, counts[catalog_id])
+                        for catalog_id, name, display_name in IngredientCatalog.objects.values_list(
+                            'id', 'name', 'display_name'
+                        )
+                        if catalog_id in counts
+                    ]
+                    self.ingredients = PrefixIndex(sorted(entries, key=lambda entry: (-entry[2], entry[0])))
+                    self.ingredients_loaded = time.monotonic()
+        return self.ingredients
+
+
+autocomplete = Autocomplete()
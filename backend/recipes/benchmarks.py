@@ -0,0 +1,99 @@
+"""
+Helpers shared by the benchmark_* management commands.
+
+Benchmarks seed synthetic data inside a transaction that is rolled back at
+the end, so they can be pointed at a development database safely.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+
+from .catalog import link_catalog
+from .models import Ingredient, Recipe, RecipeTag
+from .stats import recount_tags
+
+
+WORDS = [
+    'chicken', 'beef', 'pork', 'salmon', 'shrimp', 'tofu', 'lentil', 'chickpea',
+    'garlic', 'ginger', 'onion', 'tomato', 'potato', 'spinach', 'mushroom', 'pepper',
+    'lemon', 'lime', 'basil', 'cilantro', 'parsley', 'rosemary', 'thyme', 'cumin',
+    'curry', 'noodle', 'rice', 'pasta', 'bread', 'soup', 'salad', 'stew', 'roast',
+    'grilled', 'baked', 'spicy', 'creamy', 'crispy', 'smoky', 'sweet', 'tangy',
+    'quick', 'easy', 'hearty', 'light', 'classic', 'rustic', 'fresh', 'savory', 'zesty',
+]
+
+TAG_NAMES = [
+    'vegan', 'vegetarian', 'gluten-free', 'dairy-free', 'keto', 'paleo', 'quick',
+    'weeknight', 'comfort', 'healthy', 'spicy', 'breakfast', 'lunch', 'dinner',
+    'dessert', 'snack', 'party', 'holiday', 'summer', 'winter', 'one-pot', 'grill',
+    'slow-cooker', 'air-fryer', 'meal-prep', 'kid-friendly', 'budget', 'high-protein',
+    'low-carb', 'low-fat',
+]
+
+UNITS = [unit for unit, _ in Ingredient.UNIT_CHOICES]
+
+
+def timed(fn, repeat=5):
+    """Run fn repeat times and return the median wall time in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def seed_recipes(count, tags_per_recipe=3, ingredients_per_recipe=0, batch_size=2000, seed=42,
+                 ingredient_names=None):
+    """
+    Bulk-create count synthetic public recipes and return their ids.
+    Ingredients are drawn from ingredient_names (25 common words by default).
+    """
+    ingredient_names = ingredient_names or WORDS[:25]
+    rng = random.Random(seed)
+    user, _ = User.objects.get_or_create(username='benchmark-user')
+    tags = [RecipeTag.objects.get_or_create(name=name)[0] for name in TAG_NAMES]
+    cuisines = [cuisine for cuisine, _ in Recipe.CUISINE_CHOICES]
+    difficulties = [difficulty for difficulty, _ in Recipe.DIFFICULTY_CHOICES]
+    tag_link = RecipeTag.recipes.through
+
+    recipe_ids = []
+    for start in range(0, count, batch_size):
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                title=' '.join(rng.sample(WORDS, 3)).title(),
+                description=' '.join(rng.choices(WORDS, k=25)),
+                prep_time=rng.randint(5, 60),
+                cook_time=rng.randint(5, 180),
+                servings=rng.randint(1, 8),
+                difficulty=rng.choice(difficulties),
+                cuisine=rng.choice(cuisines),
+                created_by=user,
+            )
+            for _ in range(min(batch_size, count - start))
+        ])
+        batch_ids = [recipe.id for recipe in recipes]
+        recipe_ids.extend(batch_ids)
+
+        tag_link.objects.bulk_create([
+            tag_link(recipe_id=recipe_id, recipetag_id=tag.id)
+            for recipe_id in batch_ids
+            for tag in rng.sample(tags, tags_per_recipe)
+        ])
+        if ingredients_per_recipe:
+            Ingredient.objects.bulk_create(link_catalog(
+                Ingredient(
+                    recipe_id=recipe_id,
+                    name=name,
+                    quantity=rng.choice([0.25, 0.5, 1, 2, 3]),
+                    unit=rng.choice(UNITS),
+                    order=order,
+                )
+                for recipe_id in batch_ids
+                for order, name in enumerate(rng.sample(ingredient_names, ingredients_per_recipe), start=1)
+            ))
+
+    recount_tags([tag.id for tag in tags])
+    return recipe_ids
@@ -0,0 +1,106 @@
+"""
+Response cache for anonymous public recipe listings.
+
+Entries are keyed on the normalized query string plus a global "public
+recipes" version. Any recipe, tag or rating write bumps the version (see
+recipes.signals), which orphans every older entry at once without scanning
+keys; orphans simply expire. Only the cache API's get/set/add/incr are used,
+so the local-memory and file backends both work.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+PUBLIC_VERSION_KEY = 'recipes:public-version'
+TAGS_VERSION_KEY = 'recipes:tags-version'
+USER_STATE_VERSION_KEY = 'recipes:user-state-version'
+
+
+def _initial_version():
+    # Seeding from the clock means an evicted counter never restarts at a
+    # number that older entries were stored under
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """A cache-held version counter; bump_version(key) retires everything stored under the old one"""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key, _initial_version())
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+
+
+def get_public_version():
+    return get_version(PUBLIC_VERSION_KEY)
+
+
+def bump_public_version():
+    bump_version(PUBLIC_VERSION_KEY)
+
+
+def get_tags_version():
+    """Version of tag names and recipe counts alone, for readers that can ignore other writes"""
+    return get_version(TAGS_VERSION_KEY)
+
+
+def bump_tags_version():
+    bump_version(TAGS_VERSION_KEY)
+
+
+def get_user_state_version(user_id):
+    """Version of one user's favorites and ratings, for cached pages that show them"""
+    return get_version(f'{USER_STATE_VERSION_KEY}:{user_id}')
+
+
+def bump_user_state_version(user_id):
+    bump_version(f'{USER_STATE_VERSION_KEY}:{user_id}')
+
+
+# Parameters that page, order or decorate a listing without changing the set it lists
+NON_FILTER_PARAMS = {'page', 'page_size', 'pagination', 'cursor', 'ordering', 'facets'}
+
+
+def normalize_query(query_params, ignore=()):
+    """A canonical query string: sorted keys and values, tags sorted and lower-cased, page=1 dropped"""
+    items = []
+    for key in sorted(query_params):
+        if key in ignore:
+            continue
+        values = sorted(value.strip() for value in query_params.getlist(key) if value.strip())
+        if key == 'tags':
+            tags = {tag.strip().lower() for value in values for tag in value.split(',') if tag.strip()}
+            values = [','.join(sorted(tags))] if tags else []
+        elif key == 'page' and values == ['1']:
+            values = []
+        items.extend((key, value) for value in values)
+    return urlencode(items)
+
+
+def public_list_cache_key(request, prefix='recipes:list'):
+    # The host is part of the key because paginated payloads embed absolute links
+    query = f'{request.get_host()}?{normalize_query(request.query_params)}'
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return f'{prefix}:{get_public_version()}:{digest}'
+
+
+def facet_cache_key(request):
+    """Key for the facet counts of a listing's filter set, shared by all its pages and orderings"""
+    query = normalize_query(request.query_params, ignore=NON_FILTER_PARAMS)
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return f'recipes:facets:{get_public_version()}:{digest}'
+
+
+def get_cache_timeout():
+    return getattr(settings, 'RECIPE_LIST_CACHE_TIMEOUT', 300)
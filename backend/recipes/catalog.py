@@ -0,0 +1,130 @@
+"""
+Canonical ingredient catalog.
+
+Every Ingredient links to the IngredientCatalog entry for its normalized
+name, so "recipes containing X" is a lookup in the small catalog table
+followed by an index range scan on (catalog, recipe) rather than a LIKE over
+every ingredient row. Write paths call link_catalog() on the rows they are
+about to insert or update; backfill_catalog() links rows written before the
+catalog existed.
+"""
+import re
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import bump_public_version
+from .models import Ingredient, IngredientCatalog, Recipe
+
+
+# Word endings a trailing "s" belongs to rather than marks a plural
+SINGULAR_ENDINGS = ('ss', 'us', 'is')
+PARENTHESES = re.compile(r'\([^)]*\)')
+NON_WORD = re.compile(r'[^\w\s-]+')
+
+
+def singularize(word):
+    if len(word) <= 3 or word.endswith(SINGULAR_ENDINGS) or not word.endswith('s'):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    return word[:-1]
+
+
+def normalize_ingredient_name(name):
+    """
+    The catalog key for a free-text ingredient name: lower-cased, without
+    parenthesised or after-comma notes and punctuation, whitespace collapsed
+    and the last word made singular ("Cherry Tomatoes (ripe), halved" ->
+    "cherry tomato").
+    """
+    name = PARENTHESES.sub(' ', name.lower()).split(',')[0]
+    words = NON_WORD.sub(' ', name).split()
+    if words:
+        words[-1] = singularize(words[-1])
+    return ' '.join(words)[:100]
+
+
+def resolve_catalog(names):
+    """
+    Return {normalized name: IngredientCatalog} for free-text names, creating
+    missing entries. One SELECT when all exist, otherwise one INSERT and one
+    more SELECT.
+    """
+    display_names = {}
+    for name in names:
+        key = normalize_ingredient_name(name)
+        if key:
+            display_names.setdefault(key, name.strip()[:100])
+    if not display_names:
+        return {}
+
+    entries = {entry.name: entry for entry in IngredientCatalog.objects.filter(name__in=display_names)}
+    missing = [key for key in display_names if key not in entries]
+    if missing:
+        # ignore_conflicts lets a concurrent writer win the race for the same name
+        IngredientCatalog.objects.bulk_create(
+            [IngredientCatalog(name=key, display_name=display_names[key]) for key in missing],
+            ignore_conflicts=True
+        )
+        entries.update((entry.name, entry) for entry in IngredientCatalog.objects.filter(name__in=missing))
+    return entries
+
+
+def link_catalog(ingredients):
+    """Point each (usually unsaved) Ingredient at the catalog entry for its name"""
+    ingredients = list(ingredients)
+    entries = resolve_catalog(ingredient.name for ingredient in ingredients)
+    for ingredient in ingredients:
+        ingredient.catalog = entries.get(normalize_ingredient_name(ingredient.name))
+    return ingredients
+
+
+def backfill_catalog(relink=False, batch_size=2000):
+    """
+    Link ingredients to the catalog in batches; only unlinked rows unless
+    relink is set (after a change to the normalization). Returns the number
+    of rows updated.
+    """
+    rows = Ingredient.objects.order_by('id')
+    if not relink:
+        rows = rows.filter(catalog__isnull=True)
+
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(rows.filter(id__gt=last_id).only('id', 'name', 'catalog', 'recipe')[:batch_size])
+        if not batch:
+            if updated:
+                bump_public_version()
+            return updated
+        last_id = batch[-1].id
+        previous = {ingredient.id: ingredient.catalog_id for ingredient in batch}
+        changed = [
+            ingredient for ingredient in link_catalog(batch)
+            if ingredient.catalog_id != previous[ingredient.id]
+        ]
+        Ingredient.objects.bulk_update(changed, ['catalog'])
+        # Moving updated_at lets in-process indexes (recipes.pantry) pick the change up
+        Recipe.objects.filter(id__in={ingredient.recipe_id for ingredient in changed}).update(
+            updated_at=timezone.now()
+        )
+        updated += len(changed)
+
+
+def match_catalog(term):
+    """Catalog entries naming `term` as a whole word or phrase ("chicken" finds "chicken breast")"""
+    key = normalize_ingredient_name(term)
+    if not key:
+        return IngredientCatalog.objects.none()
+    return IngredientCatalog.objects.filter(
+        Q(name=key) | Q(name__startswith=f'{key} ') | Q(name__endswith=f' {key}') | Q(name__contains=f' {key} ')
+    )
+
+
+def recipes_with_ingredient(queryset, term):
+    """Narrow a recipe queryset to recipes using an ingredient matching term"""
+    recipe_ids = Ingredient.objects.filter(catalog__in=match_catalog(term)).values('recipe_id')
+    return queryset.filter(id__in=recipe_ids)
@@ -0,0 +1,79 @@
+"""
+Streaming recipe export as NDJSON or CSV.
+
+Querysets are walked with .iterator(chunk_size=...), which prefetches
+ingredients, instructions and tags per chunk, so an export of the whole
+catalog holds one chunk in memory at a time. Records use the import field
+names (see recipes.importing), so an export can be imported again.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+RECIPE_FIELDS = [
+    'id', 'title', 'description', 'prep_time', 'cook_time', 'servings', 'difficulty',
+    'cuisine', 'is_public', 'calories_per_serving', 'protein_grams', 'carbs_grams',
+    'fat_grams', 'fiber_grams', 'ai_generated', 'average_rating', 'rating_count',
+]
+INGREDIENT_FIELDS = ['name', 'quantity', 'unit', 'notes', 'order']
+INSTRUCTION_FIELDS = ['step_number', 'instruction', 'time_minutes', 'temperature']
+CSV_COLUMNS = RECIPE_FIELDS + [
+    'created_by', 'created_at', 'updated_at', 'ingredients', 'instructions', 'tags',
+]
+
+
+def recipe_record(recipe):
+    record = {field: getattr(recipe, field) for field in RECIPE_FIELDS}
+    record['created_by'] = recipe.created_by.username
+    record['created_at'] = recipe.created_at.isoformat()
+    record['updated_at'] = recipe.updated_at.isoformat()
+    record['ingredients'] = [
+        {field: getattr(ingredient, field) for field in INGREDIENT_FIELDS}
+        for ingredient in recipe.ingredients.all()
+    ]
+    record['instructions'] = [
+        {field: getattr(instruction, field) for field in INSTRUCTION_FIELDS}
+        for instruction in recipe.instructions.all()
+    ]
+    record['tags'] = [tag.name for tag in recipe.tags.all()]
+    return record
+
+
+def iter_records(queryset, chunk_size=500):
+    recipes = queryset.prefetch_related('ingredients', 'instructions', 'tags').iterator(chunk_size=chunk_size)
+    for recipe in recipes:
+        yield recipe_record(recipe)
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def stream_ndjson(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_csv(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for record in records:
+        for column in ('ingredients', 'instructions', 'tags'):
+            record[column] = json.dumps(record[column], cls=DjangoJSONEncoder)
+        yield writer.writerow([record[column] for column in CSV_COLUMNS])
+
+
+def stream_recipes(queryset, output='ndjson', chunk_size=500):
+    """Yield the recipes of queryset as NDJSON lines or CSV rows"""
+    records = iter_records(queryset, chunk_size)
+    return stream_csv(records) if output == 'csv' else stream_ndjson(records)
@@ -0,0 +1,55 @@
+"""
+Facet counts for the recipe browser.
+
+compute_facets() counts a filtered recipe queryset per cuisine, difficulty,
+total-time bucket and tag in one statement: a UNION ALL of one GROUP BY per
+facet over the filtered ids, each yielding (facet, value, count) rows.
+Results are cached under the filter part of the normalized query (see
+recipes.cache.facet_cache_key), so paging or reordering a listing reuses
+them, and the public recipe version retires them on any write.
+"""
+from django.db.models import Case, CharField, Count, F, Value, When
+
+from .models import Recipe
+
+
+# (upper bound in minutes, label); the labels match min_time/max_time ranges
+TIME_BUCKETS = [(15, '0-15'), (30, '16-30'), (60, '31-60'), (None, '61+')]
+
+
+def _time_bucket():
+    return Case(
+        *[When(total_time__lte=limit, then=Value(label)) for limit, label in TIME_BUCKETS if limit is not None],
+        default=Value(TIME_BUCKETS[-1][1]),
+        output_field=CharField(),
+    )
+
+
+def compute_facets(queryset):
+    """{facet: {value: count}} for cuisine, difficulty, total_time and tags over queryset"""
+    # Re-selecting by id keeps the filters' joins (tags in particular) out of the counts
+    recipes = Recipe.objects.filter(id__in=queryset.order_by().values('id')).order_by()
+
+    def grouped(facet, value, queryset=recipes):
+        return queryset.annotate(
+            facet=Value(facet, output_field=CharField()), value=value
+        ).values_list('facet', 'value').annotate(count=Count('id'))
+
+    rows = grouped('cuisine', F('cuisine')).union(
+        grouped('difficulty', F('difficulty')),
+        grouped('total_time', _time_bucket()),
+        grouped('tags', F('tags__name'), recipes.filter(tags__isnull=False)),
+        all=True,
+    )
+
+    facets = {
+        'cuisine': {},
+        'difficulty': {},
+        'total_time': {label: 0 for _, label in TIME_BUCKETS},
+        'tags': {},
+    }
+    for facet, value, count in rows:
+        facets[facet][value] = count
+    for facet in ('cuisine', 'difficulty', 'tags'):
+        facets[facet] = dict(sorted(facets[facet].items(), key=lambda item: (-item[1], item[0])))
+    return facets
@@ -0,0 +1,208 @@
+"""
+Personalized recipe feed.
+
+A user's taste is a vector over the recipe features of recipes.similarity.
+Explicit UserPreference scores and the profile's favourite cuisines weight
+the matching ingredient, cuisine and tag columns directly; recipes the user
+favourited, rated or cooked add their own TF-IDF rows, weighted by how much
+the user liked them. Scoring is one sparse product for a whole batch of
+users against every public recipe, plus a small rating prior, and the best
+FEED_SIZE recipes the user has not written, favourited or rated yet are
+stored in RecipeFeed.
+
+Feeds are built off-request by `manage.py build_recipe_feeds`. A user's
+first feed request creates their (stale) RecipeFeed row; changes to their
+preferences, profile, favourites, ratings or completed meals mark it stale
+again (see recipes.signals). Until the rebuild lands the previous feed, or
+the most popular recipes, are served.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from scipy import sparse
+
+from accounts.models import UserPreference, UserProfile
+from meals.models import Meal
+
+from .catalog import match_catalog
+from .models import Recipe, RecipeFavorite, RecipeFeed, RecipeRating, RecipeTag
+from .similarity import BLOCK_CELLS, RecipeVectors, top_k
+
+
+FEED_SIZE = 200
+FAVORITE_WEIGHT = 1.0
+COMPLETED_MEAL_WEIGHT = 0.5
+FAVORITE_CUISINE_WEIGHT = 1.0
+# Preference scores are free-form; clipping keeps one entry from drowning the rest
+PREFERENCE_LIMIT = 1.0
+# Weight of the (smoothed) average rating, enough to order recipes the
+# user's taste says nothing about
+POPULARITY_WEIGHT = 0.05
+PRIOR_RATINGS = 5
+
+
+def get_max_age():
+    return timedelta(seconds=getattr(settings, 'RECIPE_FEED_MAX_AGE', 6 * 60 * 60))
+
+
+def stale_feeds():
+    return RecipeFeed.objects.filter(
+        Q(built_at__isnull=True) | Q(invalidated_at__gte=F('built_at')) |
+        Q(built_at__lt=timezone.now() - get_max_age())
+    )
+
+
+def popularity(vectors):
+    """Rating prior per matrix row: the average rating shrunk towards 3 stars, scaled to 0-1"""
+    prior = np.full(len(vectors), 3 / 5, dtype=np.float32)
+    rated = np.array(list(Recipe.objects.filter(is_public=True, rating_count__gt=0).values_list(
+        'id', 'average_rating', 'rating_count'
+    )), dtype=np.float64).reshape(-1, 3)
+    positions, found = vectors.locate(rated[:, 0].astype(np.int64))
+    average, count = rated[found, 1], rated[found, 2]
+    prior[positions[found]] = (average * count + 3 * PRIOR_RATINGS) / (count + PRIOR_RATINGS) / 5
+    return prior
+
+
+class _Catalog:
+    """Memoized preference name -> feature columns lookups for one build"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.ingredients = {}
+        self.tags = {
+            name.lower(): tag_id for tag_id, name in RecipeTag.objects.values_list('id', 'name')
+        }
+
+    def columns(self, preference_type, name):
+        columns = self.vectors.columns
+        name = name.strip().lower()
+        if preference_type == 'cuisine':
+            column = columns.get('cuisine', {}).get(name)
+            return [] if column is None else [column]
+        if preference_type == 'ingredient':
+            if name not in self.ingredients:
+                self.ingredients[name] = list(match_catalog(name).values_list('id', flat=True))
+            ingredient_columns = columns.get('ingredient', {})
+            return [ingredient_columns[i] for i in self.ingredients[name] if i in ingredient_columns]
+        # Dish types and cooking methods are expressed as tags
+        column = columns.get('tag', {}).get(self.tags.get(name))
+        return [] if column is None else [column]
+
+
+def taste_vectors(vectors, user_ids, catalog=None):
+    """
+    (users x features taste matrix, users x recipes sparse mask of recipes
+    to leave out) for a list of user ids, in that order.
+    """
+    catalog = catalog or _Catalog(vectors)
+    user_rows = {user_id: row for row, user_id in enumerate(user_ids)}
+    shape = (len(user_ids), vectors.matrix.shape[1])
+
+    # Explicit preferences set feature weights directly
+    explicit_rows, explicit_columns, explicit_weights = [], [], []
+
+    def weigh(user_id, preference_type, name, weight):
+        for column in catalog.columns(preference_type, name):
+            explicit_rows.append(user_rows[user_id])
+            explicit_columns.append(column)
+            explicit_weights.append(weight)
+
+    for user_id, preference_type, name, score in UserPreference.objects.filter(user__in=user_ids).values_list(
+        'user_id', 'preference_type', 'name', 'preference_score'
+    ):
+        weigh(user_id, preference_type, name, float(np.clip(score, -PREFERENCE_LIMIT, PREFERENCE_LIMIT)))
+    for user_id, cuisines in UserProfile.objects.filter(user__in=user_ids).values_list('user_id', 'favorite_cuisines'):
+        for cuisine in cuisines or []:
+            if isinstance(cuisine, str):
+                weigh(user_id, 'cuisine', cuisine, FAVORITE_CUISINE_WEIGHT)
+
+    explicit = sparse.csr_matrix(
+        (np.array(explicit_weights, dtype=np.float32), (explicit_rows, explicit_columns)), shape=shape
+    )
+
+    # Interactions weight whole recipe rows
+    interactions = [
+        (user_id, recipe_id, FAVORITE_WEIGHT)
+        for user_id, recipe_id in RecipeFavorite.objects.filter(user__in=user_ids).values_list('user_id', 'recipe_id')
+    ]
+    interactions += [
+        (user_id, recipe_id, (rating - 3) / 2)
+        for user_id, recipe_id, rating in RecipeRating.objects.filter(user__in=user_ids).values_list(
+            'user_id', 'recipe_id', 'rating'
+        )
+    ]
+    seen = [(user_id, recipe_id) for user_id, recipe_id, _ in interactions]
+    interactions += [
+        (user_id, recipe_id, COMPLETED_MEAL_WEIGHT)
+        for user_id, recipe_id in Meal.objects.filter(
+            meal_plan__user__in=user_ids, completed=True
+        ).values_list('meal_plan__user_id', 'recipe_id')
+    ]
+    seen += list(Recipe.objects.filter(created_by__in=user_ids).values_list('created_by_id', 'id'))
+
+    def user_by_recipe(pairs, weights=None):
+        if not pairs:
+            return sparse.csr_matrix((len(user_ids), len(vectors)), dtype=np.float32)
+        pairs = np.array(pairs, dtype=np.int64)
+        positions, found = vectors.locate(pairs[:, 1])
+        weights = np.ones(len(pairs), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+        return sparse.csr_matrix(
+            (weights[found], ([user_rows[user_id] for user_id in pairs[found, 0].tolist()], positions[found])),
+            shape=(len(user_ids), len(vectors)),
+        )
+
+    liked = user_by_recipe([pair[:2] for pair in interactions], [weight for *_, weight in interactions])
+    # Averaged, so a long history doesn't outweigh what the user told us directly
+    counts = np.maximum(np.diff(liked.indptr), 1).astype(np.float32)
+    implicit = sparse.diags(1 / counts) @ liked @ vectors.matrix
+
+    return (explicit + implicit).tocsr(), user_by_recipe(seen)
+
+
+def score_feeds(vectors, user_ids, prior=None, size=FEED_SIZE, catalog=None):
+    """{user id: ranked recipe ids} for a batch of users"""
+    if not len(vectors):
+        return {user_id: [] for user_id in user_ids}
+    prior = popularity(vectors) if prior is None else prior
+    tastes, seen = taste_vectors(vectors, user_ids, catalog)
+    scores = np.asarray((vectors.matrix @ tastes.T.toarray()).T) + POPULARITY_WEIGHT * prior
+    scores[seen.nonzero()] = -np.inf
+
+    columns, best = top_k(scores, size)
+    return {
+        user_id: vectors.ids[row_columns[np.isfinite(row_scores)]].tolist()
+        for user_id, row_columns, row_scores in zip(user_ids, columns, best)
+    }
+
+
+def build_feeds(feeds=None, vectors=None, block_cells=BLOCK_CELLS):
+    """
+    Rebuild the given RecipeFeed queryset (default: every stale feed) in
+    batches sized so one batch's score matrix holds block_cells values.
+    Returns the number of feeds written.
+    """
+    feeds = stale_feeds() if feeds is None else feeds
+    user_ids = list(feeds.order_by('user_id').values_list('user_id', flat=True))
+    if not user_ids:
+        return 0
+
+    vectors = vectors or RecipeVectors.load()
+    prior = popularity(vectors)
+    catalog = _Catalog(vectors)
+    batch_size = max(1, block_cells // max(len(vectors), 1))
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        # Invalidations from here on land after built_at and keep the feed stale
+        built_at = timezone.now()
+        ranked = score_feeds(vectors, batch, prior, catalog=catalog)
+        written = RecipeFeed.objects.filter(user__in=batch).in_bulk(field_name='user_id')
+        for user_id, feed in written.items():
+            feed.recipe_ids = ranked[user_id]
+            feed.built_at = built_at
+        RecipeFeed.objects.bulk_update(written.values(), ['recipe_ids', 'built_at'])
+    return len(user_ids)
+
@@ -0,0 +1,28 @@
+"""
+Set-based recipe filters shared by the list views and their benchmarks.
+
+Tag filters select recipe ids from the tag link table and hand them to the
+recipe query as an IN subquery, instead of joining tags into it: the join
+repeats a recipe once per matching tag and needs a DISTINCT over the whole
+result to undo that.
+"""
+from django.db.models import Count
+
+from .models import RecipeTag
+
+
+def tagged_recipe_ids(tag_names, match_all=False):
+    """
+    Subquery of ids of recipes with any of tag_names, or with every one of
+    them when match_all is set (GROUP BY recipe HAVING COUNT = len(tag_names)).
+    """
+    tag_names = set(tag_names)
+    links = RecipeTag.recipes.through.objects.filter(recipetag__name__in=tag_names).order_by()
+    if match_all:
+        links = links.values('recipe_id').annotate(matched=Count('recipetag_id')).filter(matched=len(tag_names))
+    return links.values('recipe_id')
+
+
+def recipes_with_tags(queryset, tag_names, match_all=False):
+    """Narrow a recipe queryset to recipes tagged with any (or all) of tag_names"""
+    return queryset.filter(id__in=tagged_recipe_ids(tag_names, match_all))
@@ -0,0 +1,265 @@
+"""
+Off-request image derivatives for recipe images and profile avatars.
+
+Uploads are stored untouched. Saving a model whose image changed queues an
+ImageDerivativeJob (see recipes.signals); the process_image_derivatives
+worker turns each job into thumbnail / card / full copies, re-encoded as
+WebP (JPEG where Pillow lacks WebP), and records them in the model's
+derivatives JSON. Serializers read their URLs from that JSON and fall back
+to the original until the worker has caught up, so requests never resize.
+"""
+import logging
+import posixpath
+from datetime import timedelta
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .cache import bump_public_version
+from .models import ImageDerivativeJob
+
+
+logger = logging.getLogger(__name__)
+
+# model label -> (derivatives JSON field, image fields). Every model listed
+# here also has an auto_now updated_at, bumped when derivatives land.
+IMAGE_FIELDS = {
+    'recipes.recipe': ('image_derivatives', ('image', 'source_image')),
+    'accounts.userprofile': ('avatar_derivatives', ('avatar',)),
+}
+
+# name -> (width, height, crop to exactly that box)
+SIZES = {
+    'thumbnail': (160, 160, True),
+    'card': (640, 400, True),
+    'full': (1600, 1600, False),
+}
+
+QUALITY = 82
+MAX_ATTEMPTS = 3
+STALE_AFTER = timedelta(minutes=15)
+
+
+def get_output_format():
+    output_format = getattr(settings, 'IMAGE_DERIVATIVE_FORMAT', 'WEBP').upper()
+    if output_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return output_format
+
+
+def _file_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+def remember_image_names(instance):
+    """Record the current file names so a later save can tell which images changed"""
+    _, fields = IMAGE_FIELDS[instance._meta.label_lower]
+    instance._image_names = {
+        field: _file_name(instance.__dict__[field]) for field in fields if field in instance.__dict__
+    }
+
+
+def queue_changed_images(instance, created=False):
+    """Queue a job for every image field whose file changed since load / the last save"""
+    label = instance._meta.label_lower
+    _, fields = IMAGE_FIELDS[label]
+    previous = {} if created else getattr(instance, '_image_names', {})
+    jobs = []
+    for field in fields:
+        if field not in instance.__dict__:
+            # Deferred, so it cannot have been assigned
+            continue
+        name = _file_name(getattr(instance, field))
+        if name and name != previous.get(field):
+            jobs.append(ImageDerivativeJob(
+                model_label=label, object_id=instance.pk, field_name=field, source_name=name
+            ))
+    remember_image_names(instance)
+    if jobs:
+        enqueue(jobs)
+
+
+def _queue(jobs):
+    # A job for the same file that already ran (or failed) goes back to pending
+    ImageDerivativeJob.objects.bulk_create(
+        jobs, update_conflicts=True,
+        unique_fields=['model_label', 'object_id', 'field_name', 'source_name'],
+        update_fields=['status', 'attempts', 'error', 'updated_at'],
+    )
+
+
+def enqueue(jobs):
+    _queue(jobs)
+    if getattr(settings, 'IMAGE_DERIVATIVES_EAGER', False):
+        # Development convenience: no worker to run, at the cost of doing
+        # the work at the end of the uploading request
+        transaction.on_commit(process_pending)
+
+
+def queue_missing(labels=None):
+    """Queue jobs for every stored image without current derivatives; returns the number queued"""
+    queued = 0
+    for label in labels or IMAGE_FIELDS:
+        derivatives_field, fields = IMAGE_FIELDS[label]
+        model = apps.get_model(label)
+        rows = model.objects.values_list('pk', derivatives_field, *fields)
+        jobs = []
+        for pk, derivatives, *names in rows.iterator(chunk_size=2000):
+            for field, name in zip(fields, names):
+                if name and (derivatives or {}).get(field, {}).get('source') != name:
+                    jobs.append(ImageDerivativeJob(
+                        model_label=label, object_id=pk, field_name=field, source_name=name
+                    ))
+            if len(jobs) >= 1000:
+                _queue(jobs)
+                queued += len(jobs)
+                jobs = []
+        _queue(jobs)
+        queued += len(jobs)
+    return queued
+
+
+def _prepare(image, output_format):
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if output_format == 'WEBP' and has_alpha:
+        return image.convert('RGBA')
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+
+def build_derivatives(source_name, storage=default_storage):
+    """Write every size of one stored image and return its derivatives entry"""
+    output_format = get_output_format()
+    extension = 'webp' if output_format == 'WEBP' else 'jpg'
+    with storage.open(source_name, 'rb') as source:
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original)
+            image.load()
+
+    stem = posixpath.splitext(source_name)[0]
+    entry = {'source': source_name}
+    for size, (width, height, crop) in SIZES.items():
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+        resized = _prepare(resized, output_format)
+
+        buffer = BytesIO()
+        resized.save(buffer, output_format, quality=QUALITY, optimize=True)
+        name = storage.save(f'derivatives/{stem}/{size}.{extension}', ContentFile(buffer.getvalue()))
+        entry[size] = {'name': name, 'width': resized.width, 'height': resized.height}
+    return entry
+
+
+def delete_derivative_files(entry, storage=default_storage):
+    for size in SIZES:
+        if entry and size in entry:
+            storage.delete(entry[size]['name'])
+
+
+def claim_jobs(limit):
+    """Move up to `limit` pending jobs to processing; safe with several workers"""
+    candidates = ImageDerivativeJob.objects.filter(status='pending').values_list('id', flat=True)[:limit]
+    claimed = [
+        job_id for job_id in list(candidates)
+        if ImageDerivativeJob.objects.filter(id=job_id, status='pending').update(
+            status='processing', attempts=F('attempts') + 1, updated_at=timezone.now()
+        )
+    ]
+    return list(ImageDerivativeJob.objects.filter(id__in=claimed))
+
+
+def requeue_stale():
+    """Hand jobs left in processing by a worker that died back to the queue"""
+    return ImageDerivativeJob.objects.filter(
+        status='processing', updated_at__lt=timezone.now() - STALE_AFTER
+    ).update(status='pending', updated_at=timezone.now())
+
+
+def _is_current(model, job):
+    return model.objects.filter(pk=job.object_id, **{job.field_name: job.source_name}).exists()
+
+
+def process_job(job, storage=default_storage):
+    model = apps.get_model(job.model_label)
+    derivatives_field, _ = IMAGE_FIELDS[job.model_label]
+
+    if not _is_current(model, job):
+        # Deleted, or replaced again since; a newer job covers the new file
+        job.status = 'done'
+        job.save(update_fields=['status', 'updated_at'])
+        return
+
+    try:
+        entry = build_derivatives(job.source_name, storage)
+    except Exception as exc:
+        logger.warning('Building derivatives for %s failed: %s', job, exc)
+        job.status = 'failed' if job.attempts >= MAX_ATTEMPTS else 'pending'
+        job.error = str(exc)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        return
+
+    replaced = None
+    with transaction.atomic():
+        row = (
+            model.objects.select_for_update()
+            .filter(pk=job.object_id, **{job.field_name: job.source_name})
+            .values_list(derivatives_field, flat=True).first()
+        )
+        if row is None:
+            replaced = entry
+        else:
+            derivatives = dict(row or {})
+            replaced = derivatives.get(job.field_name)
+            derivatives[job.field_name] = entry
+            model.objects.filter(pk=job.object_id).update(
+                **{derivatives_field: derivatives, 'updated_at': timezone.now()}
+            )
+        job.status = 'done'
+        job.error = ''
+        job.save(update_fields=['status', 'error', 'updated_at'])
+
+    delete_derivative_files(replaced, storage)
+    if row is not None and job.model_label == 'recipes.recipe':
+        bump_public_version()
+
+
+def process_pending(limit=None, batch_size=20, storage=default_storage):
+    """Process queued jobs until the queue is empty or `limit` jobs are done"""
+    processed = 0
+    while limit is None or processed < limit:
+        jobs = claim_jobs(batch_size if limit is None else min(batch_size, limit - processed))
+        if not jobs:
+            break
+        for job in jobs:
+            process_job(job, storage)
+        processed += len(jobs)
+    return processed
+
+
+def derivative_urls(instance, field_name, storage=default_storage):
+    """
+    {'original', 'thumbnail', 'card', 'full'} URLs for one image field, or None
+    without an image. Sizes not built yet for the current file fall back to
+    the original.
+    """
+    image = getattr(instance, field_name)
+    if not image:
+        return None
+    derivatives_field, _ = IMAGE_FIELDS[instance._meta.label_lower]
+    entry = (getattr(instance, derivatives_field) or {}).get(field_name) or {}
+    if entry.get('source') != image.name:
+        entry = {}
+
+    urls = {'original': image.url}
+    for size in SIZES:
+        urls[size] = storage.url(entry[size]['name']) if size in entry else urls['original']
+    return urls
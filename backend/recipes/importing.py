@@ -0,0 +1,185 @@
+"""
+Streaming recipe import from JSON Lines or CSV.
+
+Records are read one at a time, validated with RecipeCreateUpdateSerializer
+(the rules the API applies) and written in batches through
+services.bulk_create_recipes, so memory holds one batch however large the
+file is. A record that fails is reported by line number and skipped; the
+rest of the run carries on.
+
+JSON Lines records look like the API's create payload. CSV rows use the
+same column names, with `ingredients` and `instructions` cells holding JSON
+arrays and `tags` either a JSON array or a comma-separated list.
+"""
+import csv
+import json
+import posixpath
+
+from django.db import DatabaseError
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from .serializers import RecipeCreateUpdateSerializer
+from .services import bulk_create_recipes
+
+
+FORMATS = ('jsonl', 'csv')
+CSV_JSON_COLUMNS = ('ingredients', 'instructions')
+
+
+class ImportReport:
+    """Counts and the first max_errors per-record errors of an import run"""
+
+    def __init__(self, max_errors=100):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'failed': self.failed, 'errors': self.errors}
+
+
+def detect_format(filename):
+    return 'csv' if posixpath.splitext(filename or '')[1].lower() == '.csv' else 'jsonl'
+
+
+def _parse_csv_row(row):
+    # Empty cells mean "not given", so optional numbers fall back to their defaults
+    record = {key: value for key, value in row.items() if key and value not in ('', None)}
+    for column in CSV_JSON_COLUMNS:
+        if column in record:
+            record[column] = json.loads(record[column])
+    tags = record.get('tags')
+    if tags is not None:
+        record['tags'] = json.loads(tags) if tags.lstrip().startswith('[') else tags.split(',')
+    return record
+
+
+def _undecodable(text):
+    # Bytes that weren't UTF-8 come through errors='surrogateescape' as lone surrogates
+    try:
+        text.encode('utf-8')
+    except UnicodeEncodeError as exc:
+        return {'non_field_errors': [f'Invalid UTF-8 at character {exc.start + 1}']}
+    return None
+
+
+def _read_csv(stream):
+    reader = csv.DictReader(stream)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            # The reader has consumed the bad line and carries on after it
+            yield reader.line_num, None, {'non_field_errors': [f'Invalid CSV: {exc}']}
+            continue
+        error = _undecodable(''.join(str(value) for value in row.values() if value))
+        if error is not None:
+            yield reader.line_num, None, error
+            continue
+        try:
+            yield reader.line_num, _parse_csv_row(row), None
+        except ValueError as exc:
+            yield reader.line_num, None, {'non_field_errors': [f'Invalid JSON cell: {exc}']}
+
+
+def read_records(stream, file_format='jsonl'):
+    """
+    Yield (line_number, record, error) for each record in a text stream, with
+    exactly one of record / error set. Blank JSON lines are skipped.
+
+    Open the stream with errors='surrogateescape': a strict decoder fails
+    the whole stream at the first bad byte, while escaped bytes fail only
+    their own record.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f'Unknown import format {file_format!r}')
+
+    if file_format == 'csv':
+        yield from _read_csv(stream)
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        error = _undecodable(line)
+        if error is not None:
+            yield line_number, None, error
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, {'non_field_errors': ['Expected a JSON object']}
+            continue
+        yield line_number, record, None
+
+
+def _validate(serializer, record):
+    # One unbound serializer validates every record: DRF builds a
+    # ModelSerializer's fields per instance, which would dominate the run
+    try:
+        data = dict(serializer.run_validation(record))
+    except ValidationError as exc:
+        return None, as_serializer_error(exc)
+    ingredients = [dict(item) for item in data.pop('ingredients')]
+    instructions = [dict(item) for item in data.pop('instructions')]
+    tags = data.pop('tags', [])
+    for item in ingredients + instructions:
+        item.pop('id', None)
+    return (data, ingredients, instructions, tags), None
+
+
+def _flush(batch, report, fail):
+    if not batch:
+        return
+    try:
+        bulk_create_recipes([item for _, item in batch])
+    except DatabaseError as exc:
+        for line_number, _ in batch:
+            fail(line_number, {'non_field_errors': [f'Database error: {exc}']})
+        return
+    report.created += len(batch)
+
+
+def import_recipes(stream, owner, file_format='jsonl', batch_size=500, max_errors=100, on_error=None):
+    """
+    Import every record of a text stream as a recipe owned by `owner`.
+
+    Each batch of batch_size valid records is committed on its own, so a
+    database error loses that batch only. on_error(line, errors) is called
+    for every failed record, including those past max_errors.
+    """
+    report = ImportReport(max_errors)
+
+    def fail(line_number, errors):
+        report.add_error(line_number, errors)
+        if on_error is not None:
+            on_error(line_number, errors)
+
+    serializer = RecipeCreateUpdateSerializer()
+    batch = []
+    for line_number, record, error in read_records(stream, file_format):
+        if error is None:
+            item, error = _validate(serializer, record)
+        if error is not None:
+            fail(line_number, error)
+            continue
+
+        item[0]['created_by'] = owner
+        batch.append((line_number, item))
+        if len(batch) >= batch_size:
+            _flush(batch, report, fail)
+            batch = []
+    _flush(batch, report, fail)
+    return report
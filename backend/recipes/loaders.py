@@ -0,0 +1,53 @@
+"""
+Request-scoped batch loading of per-user recipe state.
+
+Serializers ask a RecipeUserState for `is_favorited` / `user_rating` instead
+of querying per recipe. List serializers prime it with every recipe on the
+page first, so a page costs two queries however many recipes it shows.
+"""
+from .models import RecipeFavorite, RecipeRating
+
+
+class RecipeUserState:
+    """The current user's favorites and ratings for the recipes seen in this request"""
+
+    def __init__(self, user=None):
+        self.user = user if user is not None and user.is_authenticated else None
+        self.loaded_ids = set()
+        self.favorite_ids = set()
+        self.ratings = {}
+
+    @classmethod
+    def for_context(cls, context):
+        """Return the state cached on the context's request, creating it on first use"""
+        request = context.get('request')
+        if request is None:
+            return cls()
+        state = getattr(request, '_recipe_user_state', None)
+        if state is None:
+            state = cls(request.user)
+            request._recipe_user_state = state
+        return state
+
+    def prime(self, recipe_ids):
+        """Load state for every recipe id not loaded yet, in one query per table"""
+        if self.user is None:
+            return
+        missing = set(recipe_ids) - self.loaded_ids
+        if not missing:
+            return
+
+        self.favorite_ids.update(
+            RecipeFavorite.objects.filter(user=self.user, recipe_id__in=missing).values_list('recipe_id', flat=True)
+        )
+        ratings = RecipeRating.objects.filter(user=self.user, recipe_id__in=missing).select_related('user')
+        self.ratings.update((rating.recipe_id, rating) for rating in ratings)
+        self.loaded_ids |= missing
+
+    def is_favorited(self, recipe_id):
+        self.prime([recipe_id])
+        return recipe_id in self.favorite_ids
+
+    def get_rating(self, recipe_id):
+        self.prime([recipe_id])
+        return self.ratings.get(recipe_id)
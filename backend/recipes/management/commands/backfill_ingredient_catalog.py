@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.catalog import backfill_catalog
+
+
+class Command(BaseCommand):
+    help = 'Link recipe ingredients to their canonical IngredientCatalog entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--relink', action='store_true',
+                            help='Re-normalize every ingredient, not only unlinked ones')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        updated = backfill_catalog(relink=options['relink'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Linked {updated} ingredients to the catalog'))
@@ -0,0 +1,44 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.benchmarks import WORDS, seed_recipes, timed
+from recipes.catalog import resolve_catalog
+from recipes.pantry import PantryIndex
+
+
+class Command(BaseCommand):
+    help = 'Measure pantry-match search latency over the in-memory ingredient index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000, help='Synthetic recipes to seed')
+        parser.add_argument('--ingredients', type=int, default=8, help='Ingredients per recipe')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (median is reported)')
+
+    def handle(self, *args, **options):
+        # 500 distinct ingredients, so postings have a realistic spread
+        vocabulary = [f'{a} {b}' for a in WORDS[25:45] for b in WORDS[:25]]
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['recipes']} recipes...")
+            seed_recipes(options['recipes'], ingredients_per_recipe=options['ingredients'],
+                         ingredient_names=vocabulary)
+            self.run_benchmark(vocabulary, options['repeat'])
+            # Throw the synthetic data away
+            transaction.set_rollback(True)
+
+    def run_benchmark(self, vocabulary, repeat):
+        index = PantryIndex()
+        build_ms = timed(index.rebuild, 1)
+        self.stdout.write(f'Index built in {build_ms:.0f} ms ({len(index.recipes)} recipes, '
+                          f'{len(index.postings)} ingredients)')
+
+        catalog = resolve_catalog(vocabulary)
+        rng = random.Random(7)
+        self.stdout.write(f"{'pantry size':<14}{'search ms':>12}{'top coverage':>14}")
+        for size in (3, 10, 30, 100):
+            pantry = [catalog[name].id for name in rng.sample(sorted(catalog), size)]
+            search_ms = timed(lambda: index.search(pantry), repeat)
+            results = index.search(pantry)
+            top = results[0][1] if results else 0
+            self.stdout.write(f'{size:<14}{search_ms:>12.1f}{top:>14.2f}')
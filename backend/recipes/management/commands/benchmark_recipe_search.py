@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.benchmarks import seed_recipes, timed
+from recipes.models import Recipe
+from recipes.search import RecipeSearchFilter, get_search_backend
+
+
+QUERIES = ['chicken', 'spicy noodle', 'garlic lemon salmon', 'vegan', 'mush', 'zzzz']
+
+
+class LegacySearchView:
+    search_fields = ['title', 'description', 'tags__name']
+
+
+class Command(BaseCommand):
+    help = 'Compare recipe search latency of the full-text index against the old SearchFilter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000, help='Synthetic recipes to seed')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (median is reported)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['recipes']} recipes...")
+            seed_recipes(options['recipes'])
+            get_search_backend().rebuild()
+            self.run_benchmark(options['repeat'])
+            # Throw the synthetic data away
+            transaction.set_rollback(True)
+
+    def run_benchmark(self, repeat):
+        factory = APIRequestFactory()
+        base_queryset = Recipe.objects.filter(is_public=True).select_related('created_by')
+
+        self.stdout.write(f"{'query':<22}{'SearchFilter ms':>18}{'index ms':>12}{'speedup':>10}{'hits':>8}")
+        for query in QUERIES:
+            request = Request(factory.get('/api/recipes/', {'search': query}))
+
+            def legacy():
+                queryset = filters.SearchFilter().filter_queryset(request, base_queryset, LegacySearchView())
+                queryset = queryset.order_by('-created_at')
+                return queryset.count(), list(queryset[:20])
+
+            def indexed():
+                queryset = RecipeSearchFilter().filter_queryset(request, base_queryset, None)
+                return queryset.count(), list(queryset[:20])
+
+            legacy_ms = timed(legacy, repeat)
+            indexed_ms = timed(indexed, repeat)
+            hits = indexed()[0]
+            self.stdout.write(
+                f"{query:<22}{legacy_ms:>18.1f}{indexed_ms:>12.1f}{legacy_ms / indexed_ms:>9.1f}x{hits:>8}"
+            )
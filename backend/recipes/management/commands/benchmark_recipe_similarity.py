@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.benchmarks import WORDS, seed_recipes, timed
+from recipes.models import Recipe
+from recipes.similarity import RecipeVectors, build_similarities
+
+
+class Command(BaseCommand):
+    help = 'Measure full and incremental similarity build times at several catalog sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[50000, 200000],
+                            help='Synthetic catalog sizes to benchmark')
+        parser.add_argument('--ingredients', type=int, default=8, help='Ingredients per recipe')
+
+    def handle(self, *args, **options):
+        vocabulary = [f'{a} {b}' for a in WORDS[25:45] for b in WORDS[:25]]
+        self.stdout.write(f"{'recipes':>10}{'load ms':>12}{'full build ms':>16}{'100 edits ms':>16}")
+        for size in options['sizes']:
+            with transaction.atomic():
+                seed_recipes(size, ingredients_per_recipe=options['ingredients'], ingredient_names=vocabulary)
+                # Seeded rows would otherwise all look freshly edited to the incremental build
+                Recipe.objects.update(updated_at=timezone.now() - timedelta(days=1))
+                load_ms = timed(RecipeVectors.load, 1)
+                full = build_similarities(full=True)
+
+                # Touch 100 recipes, as a burst of edits would
+                edited = list(Recipe.objects.values_list('id', flat=True)[:100])
+                Recipe.objects.filter(id__in=edited).update(cuisine='thai', updated_at=timezone.now())
+                incremental = build_similarities()
+
+                self.stdout.write(
+                    f'{size:>10}{load_ms:>12.0f}{full.duration_ms:>16}{incremental.duration_ms:>16}'
+                )
+                # Throw the synthetic data away
+                transaction.set_rollback(True)
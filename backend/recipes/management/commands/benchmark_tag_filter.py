@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.benchmarks import TAG_NAMES, seed_recipes, timed
+from recipes.filters import recipes_with_tags
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Compare the join-and-DISTINCT tag filter with the grouped id-subquery filter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000, help='Synthetic recipes to seed')
+        parser.add_argument('--tags-per-recipe', type=int, default=10, help='Tags linked to each recipe')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (median is reported)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['recipes']} recipes with {options['tags_per_recipe']} tags each...")
+            seed_recipes(options['recipes'], tags_per_recipe=options['tags_per_recipe'])
+            self.run_benchmark(options['repeat'])
+            # Throw the synthetic data away
+            transaction.set_rollback(True)
+
+    def run_benchmark(self, repeat):
+        public = Recipe.objects.filter(is_public=True).order_by('-created_at')
+        variants = [
+            ('join + distinct (any)', lambda names: public.filter(tags__name__in=names).distinct()),
+            ('subquery (any)', lambda names: recipes_with_tags(public, names)),
+            ('group/having (all)', lambda names: recipes_with_tags(public, names, match_all=True)),
+        ]
+
+        def list_page(queryset):
+            # What a page-number listing runs: COUNT(*) and the first page
+            return queryset.count(), list(queryset.values_list('id', flat=True)[:20])
+
+        self.stdout.write(f"{'tags':>5}  {'filter':<24}{'matches':>9}{'ms':>10}")
+        for size in (1, 2, 3, 5):
+            names = TAG_NAMES[:size]
+            for label, build in variants:
+                queryset = build(names)
+                matches = list_page(queryset)[0]
+                elapsed = timed(lambda: list_page(queryset), repeat)
+                self.stdout.write(f'{size:>5}  {label:<24}{matches:>9}{elapsed:>10.1f}')
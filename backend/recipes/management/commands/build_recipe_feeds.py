@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.cache import get_public_version
+from recipes.feed import build_feeds, stale_feeds
+from recipes.models import RecipeFeed
+from recipes.similarity import RecipeVectors
+
+
+class Command(BaseCommand):
+    help = 'Rebuild stale personalized recipe feeds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every feed, stale or not')
+        parser.add_argument('--loop', action='store_true', help='Keep rebuilding feeds as they go stale')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        feeds = RecipeFeed.objects.all() if options['all'] else None
+        vectors, version = None, None
+        while True:
+            if (feeds if feeds is not None else stale_feeds()).exists():
+                # Recipe vectors are reused between passes until a recipe changes
+                current = get_public_version()
+                if vectors is None or current != version:
+                    vectors, version = RecipeVectors.load(), current
+                clock = time.perf_counter()
+                built = build_feeds(feeds, vectors=vectors)
+                self.stdout.write(f'Built {built} feeds in {(time.perf_counter() - clock) * 1000:.0f} ms')
+            if not options['loop']:
+                break
+            feeds = None
+            time.sleep(options['interval'])
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import DEFAULT_K, build_similarities
+
+
+class Command(BaseCommand):
+    help = 'Compute "more like this" neighbour lists for public recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rescore every recipe instead of only those changed since the last build')
+        parser.add_argument('--k', type=int, default=DEFAULT_K, help='Neighbours stored per recipe')
+        parser.add_argument('--loop', action='store_true', help='Keep running incremental builds')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between builds with --loop')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            build = build_similarities(k=options['k'], full=full)
+            self.stdout.write(f'{build}, {build.duration_ms} ms')
+            if not options['loop']:
+                break
+            full = False
+            time.sleep(options['interval'])
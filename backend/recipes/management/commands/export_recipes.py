@@ -0,0 +1,47 @@
+import sys
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+
+from recipes.exporting import EXPORT_FORMATS, stream_recipes
+from recipes.views import RecipeExportView
+
+
+class Command(BaseCommand):
+    help = 'Stream public recipes, or one user\'s own, to a NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='File to write; defaults to stdout')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--user', help='Export this user\'s own recipes, private ones included')
+        parser.add_argument('--query', default='',
+                            help='List view filters as a query string, e.g. "cuisine=italian&tags=vegan"')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        params = QueryDict(options['query'], mutable=True)
+        user = AnonymousUser()
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}")
+            params['scope'] = 'mine'
+
+        # Run the query through the export view so filtering matches the API exactly
+        http_request = HttpRequest()
+        http_request.GET = params
+        request = Request(http_request)
+        request.user = user
+        view = RecipeExportView(request=request, args=(), kwargs={}, format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())
+
+        stream = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in stream_recipes(queryset, options['format'], options['chunk_size']):
+                stream.write(chunk)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
@@ -0,0 +1,37 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.importing import FORMATS, detect_format, import_recipes
+
+
+class Command(BaseCommand):
+    help = 'Stream recipes from a JSON Lines or CSV file into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Username that will own the imported recipes')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}")
+
+        def report_error(line_number, errors):
+            self.stderr.write(f'line {line_number}: {json.dumps(errors)}')
+
+        with open(options['path'], newline='', encoding='utf-8', errors='surrogateescape') as stream:
+            report = import_recipes(
+                stream, owner,
+                file_format=options['format'] or detect_format(options['path']),
+                batch_size=options['batch_size'],
+                on_error=report_error,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.created} recipes, {report.failed} records failed'
+        ))
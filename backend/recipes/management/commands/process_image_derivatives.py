@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.images import process_pending, queue_missing, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Build resized derivatives for uploaded recipe images and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help='First queue every stored image without current derivatives')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new jobs instead of exiting once the queue is empty')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between polls with --loop')
+        parser.add_argument('--batch-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.stdout.write(f'Queued {queue_missing()} images')
+
+        while True:
+            requeue_stale()
+            processed = process_pending(batch_size=options['batch_size'])
+            if processed:
+                self.stdout.write(f'Processed {processed} image jobs')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Image derivative queue drained'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized rating count, sum and average on every recipe'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipe', type=int, action='append', dest='recipe_ids',
+            help='Only rebuild the given recipe id (may be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.all()
+        if options['recipe_ids']:
+            queryset = queryset.filter(id__in=options['recipe_ids'])
+
+        with transaction.atomic():
+            updated = Recipe.rebuild_rating_aggregates(queryset)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {updated} recipes'))
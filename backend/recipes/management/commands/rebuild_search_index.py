@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the recipe full-text search index from the recipe tables'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+
+        with transaction.atomic():
+            backend.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {backend.__class__.__name__} index for {Recipe.objects.count()} recipes'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.stats import get_stats_snapshot, recompute_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized recipe statistics from scratch'
+
+    def handle(self, *args, **options):
+        recompute_stats()
+        snapshot = get_stats_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed stats: {snapshot['total_recipes']} public recipes, "
+            f"{snapshot['total_ratings']} ratings"
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeRating = apps.get_model("recipes", "RecipeRating")
+
+    ratings = RecipeRating.objects.filter(recipe=OuterRef("pk")).values("recipe")
+    Recipe.objects.update(
+        rating_count=Coalesce(Subquery(ratings.annotate(c=Count("id")).values("c")), 0),
+        rating_sum=Coalesce(Subquery(ratings.annotate(s=Sum("rating")).values("s")), 0),
+    )
+    for recipe in Recipe.objects.filter(rating_count__gt=0).only("rating_count", "rating_sum"):
+        recipe.average_rating = recipe.rating_sum / recipe.rating_count
+        recipe.save(update_fields=["average_rating"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="average_rating",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
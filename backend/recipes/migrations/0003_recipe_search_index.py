@@ -0,0 +1,71 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:30
+
+import django.db.models.deletion
+import recipes.models
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5("
+        "title, description, tags, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    # Weight title and tag hits above description hits when ranking
+    schema_editor.execute(
+        "INSERT INTO recipes_recipe_fts (recipes_recipe_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0)')"
+    )
+    schema_editor.execute(
+        "INSERT INTO recipes_recipe_fts (rowid, title, description, tags) "
+        "SELECT r.id, r.title, r.description, COALESCE(("
+        "SELECT group_concat(t.name, ' ') FROM recipes_recipetag_recipes rt "
+        "JOIN recipes_recipetag t ON t.id = rt.recipetag_id WHERE rt.recipe_id = r.id"
+        "), '') FROM recipes_recipe r"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS recipes_recipe_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0002_recipe_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeSearchIndex",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_index",
+                        serialize=False,
+                        to="recipes.recipe",
+                    ),
+                ),
+                ("title", models.TextField()),
+                ("description", models.TextField()),
+                ("tags", models.TextField()),
+                (
+                    "document",
+                    recipes.models.FullTextDocumentField(db_column="recipes_recipe_fts"),
+                ),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "recipes_recipe_fts",
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
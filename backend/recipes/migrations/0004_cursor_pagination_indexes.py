@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0003_recipe_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["is_public", "-created_at", "-id"], name="recipe_public_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["created_by", "-created_at", "-id"], name="recipe_owner_created_idx"),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_statistics(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeRating = apps.get_model("recipes", "RecipeRating")
+    RecipeStatistic = apps.get_model("recipes", "RecipeStatistic")
+    RecipeTag = apps.get_model("recipes", "RecipeTag")
+
+    public = Recipe.objects.filter(is_public=True)
+    ratings = RecipeRating.objects.aggregate(count=Count("id"), total=Sum("rating"))
+    counters = {
+        "public_recipes": public.count(),
+        "ratings": ratings["count"] or 0,
+        "rating_sum": ratings["total"] or 0,
+    }
+    for cuisine, count in public.order_by().values_list("cuisine").annotate(count=Count("id")):
+        counters[f"cuisine:{cuisine}"] = count
+    RecipeStatistic.objects.bulk_create(
+        [RecipeStatistic(name=name, value=value) for name, value in counters.items()]
+    )
+
+    links = (
+        RecipeTag.recipes.through.objects.filter(recipetag_id=OuterRef("pk"))
+        .order_by()
+        .values("recipetag_id")
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    RecipeTag.objects.update(recipe_count=Coalesce(Subquery(links), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_cursor_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeStatistic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("value", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="recipetag",
+            name="recipe_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_recipe_statistics"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reciperating",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
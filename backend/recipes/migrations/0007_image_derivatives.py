@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0006_reciperating_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="image_derivatives",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.CreateModel(
+            name="ImageDerivativeJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("model_label", models.CharField(max_length=100)),
+                ("object_id", models.PositiveBigIntegerField()),
+                ("field_name", models.CharField(max_length=50)),
+                ("source_name", models.CharField(max_length=255)),
+                ("status", models.CharField(choices=[("pending", "Pending"), ("processing", "Processing"), ("done", "Done"), ("failed", "Failed")], default="pending", max_length=10)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["created_at"],
+                "indexes": [models.Index(fields=["status", "created_at"], name="imagejob_status_created_idx")],
+                "constraints": [models.UniqueConstraint(fields=("model_label", "object_id", "field_name", "source_name"), name="unique_image_derivative_job")],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-16 23:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0007_image_derivatives"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngredientCatalog",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(help_text="Normalized name, see recipes.catalog", max_length=100, unique=True)),
+                ("display_name", models.CharField(max_length=100)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name_plural": "ingredient catalog",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="ingredient",
+            name="catalog",
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="ingredients", to="recipes.ingredientcatalog"),
+        ),
+        migrations.AddIndex(
+            model_name="ingredient",
+            index=models.Index(fields=["catalog", "recipe"], name="ingredient_catalog_recipe_idx"),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0009_recipe_updated_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarityBuild",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("started_at", models.DateTimeField()),
+                ("finished_at", models.DateTimeField(auto_now_add=True)),
+                ("full", models.BooleanField(default=False)),
+                ("recipes_scored", models.PositiveIntegerField(default=0)),
+                ("duration_ms", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["-started_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="RecipeSimilarity",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("score", models.FloatField()),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("recipe", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="similar_entries", to="recipes.recipe")),
+                ("similar", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="recipes.recipe")),
+            ],
+            options={
+                "verbose_name_plural": "recipe similarities",
+                "ordering": ["recipe", "rank"],
+                "constraints": [models.UniqueConstraint(fields=("recipe", "rank"), name="unique_recipe_similarity_rank")],
+            },
+        ),
+    ]
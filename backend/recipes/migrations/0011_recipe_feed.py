@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0010_recipe_similarity"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeFeed",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("recipe_ids", models.JSONField(blank=True, default=list)),
+                ("built_at", models.DateTimeField(blank=True, null=True)),
+                ("invalidated_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["is_public", "-average_rating", "-rating_count"], name="recipe_public_rating_idx"),
+        ),
+        migrations.AddField(
+            model_name="recipefeed",
+            name="user",
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name="recipe_feed", to=settings.AUTH_USER_MODEL),
+        ),
+    ]
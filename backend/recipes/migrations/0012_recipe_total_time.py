@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-17 00:40
+
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0011_recipe_feed"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="total_time",
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F("prep_time"), "+", models.F("cook_time")), output_field=models.PositiveIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(condition=models.Q(("is_public", True)), fields=["total_time"], name="recipe_public_total_time_idx"),
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -28,6 +31,12 @@ class Recipe(models.Model):
     image = models.ImageField(upload_to='recipes/', blank=True, null=True)
     prep_time = models.PositiveIntegerField(help_text="Preparation time in minutes")
     cook_time = models.PositiveIntegerField(help_text="Cooking time in minutes")
+    # Stored by the database, so time filters and ordering can use an index
+    total_time = models.GeneratedField(
+        expression=F('prep_time') + F('cook_time'),
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+    )
     servings = models.PositiveIntegerField(default=4)
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='medium')
     cuisine = models.CharField(max_length=20, choices=CUISINE_CHOICES, default='other')
@@ -47,22 +56,95 @@ class Recipe(models.Model):
     ai_generated = models.BooleanField(default=False)
     source_image = models.ImageField(upload_to='ai_source/', blank=True, null=True)
     
+    # Resized copies of image / source_image, written by recipes.images
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    
+    # Denormalized rating aggregates, maintained by apply_rating_change()
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.FloatField(default=0)
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the public and per-user recipe lists
+            models.Index(fields=['is_public', '-created_at', '-id'], name='recipe_public_created_idx'),
+            models.Index(fields=['created_by', '-created_at', '-id'], name='recipe_owner_created_idx'),
+            # Incremental refresh of in-process indexes (recipes.pantry)
+            models.Index(fields=['updated_at'], name='recipe_updated_idx'),
+            # Total-time range filters and ordering of the public list. Partial,
+            # because SQLite can't seek on a bare boolean column
+            models.Index(fields=['total_time'], condition=models.Q(is_public=True), name='recipe_public_total_time_idx'),
+            # Best-rated recipes, the feed of a user whose feed isn't built yet
+            models.Index(fields=['is_public', '-average_rating', '-rating_count'], name='recipe_public_rating_idx'),
+        ]
         
     def __str__(self):
         return self.title
     
-    @property
-    def total_time(self):
-        return self.prep_time + self.cook_time
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the statistics counters saw, so saves can post deltas.
+        # Unknown (None) when either field was deferred: recipes.signals then
+        # reads the stored values before a save or delete.
+        instance._stats_state = instance.get_stats_state()
+        return instance
+    
+    def get_stats_state(self, default=(None, None)):
+        """
+        (is_public, cuisine) as the statistics counters see them, or None if
+        either is unknown. Read from __dict__ so deferred fields cost no
+        query; those take their value from default.
+        """
+        state = (self.__dict__.get('is_public', default[0]), self.__dict__.get('cuisine', default[1]))
+        return None if None in state else state
+    
+    @classmethod
+    def apply_rating_change(cls, recipe_id, count_delta, sum_delta):
+        """Shift a recipe's rating aggregates in a single UPDATE statement"""
+        new_count = F('rating_count') + count_delta
+        new_sum = F('rating_sum') + sum_delta
+        cls.objects.filter(pk=recipe_id).update(
+            rating_count=new_count,
+            rating_sum=new_sum,
+            average_rating=Case(
+                When(rating_count__lte=-count_delta, then=Value(0.0)),
+                default=Cast(new_sum, FloatField()) / new_count,
+                output_field=FloatField(),
+            ),
+        )
+        RecipeStatistic.bump({'ratings': count_delta, 'rating_sum': sum_delta})
     
-    @property
-    def average_rating(self):
-        ratings = self.ratings.all()
-        if ratings:
-            return sum(r.rating for r in ratings) / len(ratings)
-        return 0
+    @classmethod
+    def rebuild_rating_aggregates(cls, queryset=None):
+        """Recompute rating aggregates from the RecipeRating table"""
+        if queryset is None:
+            queryset = cls.objects.all()
+        ratings = RecipeRating.objects.filter(recipe=OuterRef('pk')).values('recipe')
+        rating_count = Coalesce(Subquery(ratings.annotate(c=Count('id')).values('c')), 0)
+        rating_sum = Coalesce(Subquery(ratings.annotate(s=Sum('rating')).values('s')), 0)
+        updated = queryset.update(rating_count=rating_count, rating_sum=rating_sum)
+        queryset.update(average_rating=Case(
+            When(rating_count=0, then=Value(0.0)),
+            default=Cast(F('rating_sum'), FloatField()) / F('rating_count'),
+            output_field=FloatField(),
+        ))
+        return updated
+
+
+class IngredientCatalog(models.Model):
+    """Canonical ingredient that recipe ingredients link to by normalized name"""
+    name = models.CharField(max_length=100, unique=True, help_text="Normalized name, see recipes.catalog")
+    display_name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'ingredient catalog'
+    
+    def __str__(self):
+        return self.display_name
 
 
 class Ingredient(models.Model):
@@ -87,6 +169,11 @@ class Ingredient(models.Model):
     
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ingredients')
     name = models.CharField(max_length=100)
+    # Set from name by recipes.catalog on every write path
+    catalog = models.ForeignKey(
+        IngredientCatalog, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='ingredients', db_index=False
+    )
     quantity = models.FloatField()
     unit = models.CharField(max_length=20, choices=UNIT_CHOICES)
     notes = models.CharField(max_length=200, blank=True)
@@ -94,9 +181,23 @@ class Ingredient(models.Model):
     
     class Meta:
         ordering = ['order', 'id']
+        indexes = [
+            # Catalog entry -> recipes without touching the table
+            models.Index(fields=['catalog', 'recipe'], name='ingredient_catalog_recipe_idx'),
+        ]
         
     def __str__(self):
         return f"{self.quantity} {self.unit} {self.name}"
+    
+    def save(self, *args, **kwargs):
+        # Bulk write paths link in sets (recipes.catalog.link_catalog); this
+        # covers one-off saves such as the admin inline
+        from .catalog import link_catalog
+        link_catalog([self])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'catalog'}
+        super().save(*args, **kwargs)
 
 
 class Instruction(models.Model):
@@ -117,6 +218,8 @@ class Instruction(models.Model):
 class RecipeTag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     recipes = models.ManyToManyField(Recipe, related_name='tags', blank=True)
+    # Denormalized len(recipes), kept exact by recipes.stats.recount_tags()
+    recipe_count = models.PositiveIntegerField(default=0, db_index=True)
     
     def __str__(self):
         return self.name
@@ -128,6 +231,7 @@ class RecipeRating(models.Model):
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     review = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['recipe', 'user']
@@ -136,6 +240,145 @@ class RecipeRating(models.Model):
         return f"{self.user.username} rated {self.recipe.title}: {self.rating}/5"
 
 
+class RecipeStatistic(models.Model):
+    """Named counter behind the recipe_stats endpoint, maintained incrementally"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+    
+    @classmethod
+    def bump(cls, deltas):
+        """Add each delta to its named counter, creating counters on first use"""
+        now = timezone.now()
+        for name, delta in deltas.items():
+            if not delta:
+                continue
+            counter = cls.objects.filter(name=name)
+            if not counter.update(value=F('value') + delta, updated_at=now):
+                cls.objects.bulk_create([cls(name=name)], ignore_conflicts=True)
+                counter.update(value=F('value') + delta, updated_at=now)
+
+
+class RecipeFeed(models.Model):
+    """A user's precomputed personalized feed, written by recipes.feed"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='recipe_feed')
+    recipe_ids = models.JSONField(default=list, blank=True)
+    # Null until the first build; a feed is stale once invalidated_at passes built_at
+    built_at = models.DateTimeField(null=True, blank=True)
+    invalidated_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Feed for user {self.user_id} ({len(self.recipe_ids)} recipes)"
+    
+    @classmethod
+    def invalidate(cls, users):
+        """Mark the feeds of a user queryset (or list of ids) for rebuilding"""
+        return cls.objects.filter(user__in=users).update(invalidated_at=timezone.now())
+
+
+class FullTextDocumentField(models.TextField):
+    """The hidden column an FTS5 table shares its name with, used as the MATCH target"""
+
+
+@FullTextDocumentField.register_lookup
+class FullTextMatch(models.Lookup):
+    lookup_name = 'match'
+    
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+class RecipeSearchIndex(models.Model):
+    """Read-only view of the SQLite FTS5 table maintained by recipes.search"""
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_index'
+    )
+    title = models.TextField()
+    description = models.TextField()
+    tags = models.TextField()
+    document = FullTextDocumentField(db_column='recipes_recipe_fts')
+    rank = models.FloatField()
+    
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_fts'
+
+
+class ImageDerivativeJob(models.Model):
+    """Queued request to (re)build the derivatives of one uploaded image"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    model_label = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    field_name = models.CharField(max_length=50)
+    source_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model_label', 'object_id', 'field_name', 'source_name'],
+                name='unique_image_derivative_job'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='imagejob_status_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.model_label}#{self.object_id}.{self.field_name}: {self.status}"
+
+
+class RecipeSimilarity(models.Model):
+    """One of a recipe's precomputed nearest neighbours, written by recipes.similarity"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='similar_entries')
+    similar = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        ordering = ['recipe', 'rank']
+        verbose_name_plural = 'recipe similarities'
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'rank'], name='unique_recipe_similarity_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.similar_id}: {self.score:.3f}"
+
+
+class SimilarityBuild(models.Model):
+    """A run of the similarity job; the latest one bounds the next incremental run"""
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(auto_now_add=True)
+    full = models.BooleanField(default=False)
+    recipes_scored = models.PositiveIntegerField(default=0)
+    duration_ms = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        kind = 'full' if self.full else 'incremental'
+        return f"{kind} build at {self.started_at:%Y-%m-%d %H:%M}: {self.recipes_scored} recipes"
+
+
 class RecipeFavorite(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='favorites')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
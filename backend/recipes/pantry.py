@@ -0,0 +1,175 @@
+"""
+"Cook with what I have" search over an in-memory inverted index.
+
+The index maps every catalog ingredient (see recipes.catalog) to the set of
+public recipes using it, and every recipe to its ingredient set and size.
+A query counts, per candidate recipe, how many of its ingredients the user
+has (one Counter pass over the postings of the user's ingredients), then
+ranks by coverage (have / total) and by how few are missing.
+
+Each process keeps its own index. It is loaded once, then kept current
+incrementally: whenever the public recipe cache version moves (every recipe
+write bumps it, see recipes.signals), or at the latest every
+REFRESH_INTERVAL seconds, only recipes whose updated_at is newer than the
+last sync are reloaded, and deletions are reconciled when the public count
+no longer matches. The interval covers writes served by other processes,
+whose version bumps a per-process cache (LocMemCache) never shows here.
+"""
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import Max
+
+from .cache import get_public_version
+from .catalog import match_catalog
+from .models import Ingredient, Recipe
+
+
+# Rows committed by a transaction that started before the last sync can
+# carry an older updated_at, so each refresh looks back this far
+SYNC_OVERLAP = timedelta(seconds=60)
+REFRESH_INTERVAL = 60
+
+
+class PantryIndex:
+    """Inverted index of catalog ingredient -> public recipe ids"""
+
+    def __init__(self):
+        self.postings = {}
+        self.recipes = {}
+        self.version = None
+        self.synced_at = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def _load(self, recipe_ids=None):
+        """Read (recipe id, catalog ids, ingredient count) for public recipes"""
+        recipes = Recipe.objects.filter(is_public=True)
+        ingredients = Ingredient.objects.filter(recipe__is_public=True)
+        if recipe_ids is not None:
+            recipes = recipes.filter(id__in=recipe_ids)
+            ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+
+        catalog_ids = {recipe_id: set() for recipe_id in recipes.values_list('id', flat=True)}
+        totals = Counter()
+        for recipe_id, catalog_id in ingredients.values_list('recipe_id', 'catalog_id').iterator(chunk_size=10000):
+            if recipe_id not in catalog_ids:
+                continue
+            if catalog_id is None:
+                # Not linked yet: counts against coverage, can never match
+                totals[recipe_id] += 1
+            else:
+                catalog_ids[recipe_id].add(catalog_id)
+        return {
+            recipe_id: (frozenset(ids), len(ids) + totals[recipe_id])
+            for recipe_id, ids in catalog_ids.items()
+        }
+
+    def _remove(self, recipe_id):
+        entry = self.recipes.pop(recipe_id, None)
+        if entry is None:
+            return
+        for catalog_id in entry[0]:
+            posting = self.postings.get(catalog_id)
+            if posting is not None:
+                posting.discard(recipe_id)
+                if not posting:
+                    del self.postings[catalog_id]
+
+    def _add(self, recipe_id, entry):
+        self.recipes[recipe_id] = entry
+        for catalog_id in entry[0]:
+            self.postings.setdefault(catalog_id, set()).add(recipe_id)
+
+    def rebuild(self):
+        version = get_public_version()
+        synced_at = Recipe.objects.aggregate(latest=Max('updated_at'))['latest']
+        recipes = self._load()
+        postings = {}
+        for recipe_id, (catalog_ids, _) in recipes.items():
+            for catalog_id in catalog_ids:
+                postings.setdefault(catalog_id, set()).add(recipe_id)
+        self.recipes, self.postings = recipes, postings
+        self.version, self.synced_at = version, synced_at
+        self.checked_at = time.monotonic()
+
+    def _current(self, version):
+        return (
+            version == self.version and self.checked_at is not None
+            and time.monotonic() - self.checked_at < REFRESH_INTERVAL
+        )
+
+    def refresh(self):
+        """Bring the index up to date; a no-op while the public version is unchanged and the interval hasn't passed"""
+        version = get_public_version()
+        if self._current(version):
+            return
+        with self.lock:
+            if self._current(version):
+                return
+            if self.synced_at is None:
+                self.rebuild()
+                return
+
+            changed = Recipe.objects.filter(updated_at__gte=self.synced_at - SYNC_OVERLAP)
+            changed_ids = list(changed.values_list('id', flat=True))
+            synced_at = changed.aggregate(latest=Max('updated_at'))['latest'] or self.synced_at
+            fresh = self._load(changed_ids)
+            for recipe_id in changed_ids:
+                self._remove(recipe_id)
+                if recipe_id in fresh:
+                    self._add(recipe_id, fresh[recipe_id])
+
+            # Deleted recipes leave no updated_at behind
+            if Recipe.objects.filter(is_public=True).count() != len(self.recipes):
+                live = set(Recipe.objects.filter(is_public=True).values_list('id', flat=True))
+                for recipe_id in set(self.recipes) - live:
+                    self._remove(recipe_id)
+
+            self.version, self.synced_at = version, synced_at
+            self.checked_at = time.monotonic()
+
+    def search(self, catalog_ids, limit=20, max_missing=None, min_matches=1):
+        """
+        Rank recipes for a pantry of catalog ids. Returns up to limit
+        (recipe_id, coverage, matched, missing) tuples, best first.
+        """
+        self.refresh()
+        counts = Counter()
+        with self.lock:
+            for catalog_id in set(catalog_ids):
+                counts.update(self.postings.get(catalog_id, ()))
+            totals = {recipe_id: self.recipes[recipe_id][1] for recipe_id in counts}
+
+        def candidates():
+            for recipe_id, matched in counts.items():
+                if matched < min_matches:
+                    continue
+                total = totals[recipe_id]
+                missing = total - matched
+                if max_missing is not None and missing > max_missing:
+                    continue
+                yield matched / total, -missing, matched, -recipe_id
+
+        best = heapq.nlargest(limit, candidates())
+        return [(-recipe_id, coverage, matched, -missing) for coverage, missing, matched, recipe_id in best]
+
+    def missing_ingredients(self, recipe_id, catalog_ids):
+        """Catalog ids the recipe uses that are not in catalog_ids"""
+        entry = self.recipes.get(recipe_id)
+        return entry[0] - set(catalog_ids) if entry else frozenset()
+
+
+pantry_index = PantryIndex()
+
+
+def resolve_pantry(terms):
+    """Catalog ids covered by free-text pantry terms ("chicken" covers "chicken breast")"""
+    catalog_ids = set()
+    for term in terms:
+        if term.strip():
+            catalog_ids.update(match_catalog(term).values_list('id', flat=True))
+    return catalog_ids
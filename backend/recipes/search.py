@@ -0,0 +1,143 @@
+"""
+Full-text search for recipes.
+
+The backend is picked with the RECIPE_SEARCH_BACKEND setting (a dotted path).
+When it is not set, SQLite databases use an FTS5 index and every other
+database falls back to icontains matching, which mirrors DRF's SearchFilter.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from .models import Recipe, RecipeSearchIndex, RecipeTag
+
+
+SEARCH_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def get_search_terms(query):
+    return SEARCH_TERM_RE.findall(query or '')
+
+
+class BaseSearchBackend:
+    """Interface every recipe search backend implements"""
+
+    def index_recipes(self, recipe_ids):
+        """(Re)index the given recipes"""
+
+    def remove_recipes(self, recipe_ids):
+        """Drop the given recipes from the index"""
+
+    def rebuild(self):
+        """Rebuild the whole index from the recipe tables"""
+
+    def search(self, queryset, query):
+        """Filter queryset to matches and annotate `search_rank` (lower ranks first)"""
+        raise NotImplementedError
+
+
+class IContainsSearchBackend(BaseSearchBackend):
+    """Substring matching over title, description and tag names"""
+
+    def search(self, queryset, query):
+        for term in get_search_terms(query):
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term) | Q(tags__name__icontains=term)
+            )
+        return queryset.distinct().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """SQLite FTS5 index ranked by bm25 with title and tags weighted above description"""
+
+    table = RecipeSearchIndex._meta.db_table
+    batch_size = 500
+
+    def index_recipes(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        for start in range(0, len(recipe_ids), self.batch_size):
+            self._index_batch(recipe_ids[start:start + self.batch_size])
+
+    def _index_batch(self, recipe_ids):
+        tags = {}
+        tag_links = RecipeTag.recipes.through.objects.filter(recipe_id__in=recipe_ids)
+        for recipe_id, tag_name in tag_links.values_list('recipe_id', 'recipetag__name'):
+            tags.setdefault(recipe_id, []).append(tag_name)
+
+        rows = [
+            (recipe_id, title, description, ' '.join(tags.get(recipe_id, [])))
+            for recipe_id, title, description in Recipe.objects.filter(id__in=recipe_ids).values_list(
+                'id', 'title', 'description'
+            )
+        ]
+
+        self.remove_recipes(recipe_ids)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, description, tags) VALUES (%s, %s, %s, %s)',
+                rows
+            )
+
+    def remove_recipes(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(recipe_ids), self.batch_size):
+                batch = recipe_ids[start:start + self.batch_size]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN ({placeholders})', batch)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, description, tags) "
+                f"SELECT r.id, r.title, r.description, COALESCE(("
+                f"SELECT group_concat(t.name, ' ') FROM {RecipeTag.recipes.through._meta.db_table} rt "
+                f"JOIN {RecipeTag._meta.db_table} t ON t.id = rt.recipetag_id WHERE rt.recipe_id = r.id"
+                f"), '') FROM {Recipe._meta.db_table} r"
+            )
+
+    def search(self, queryset, query):
+        terms = get_search_terms(query)
+        if not terms:
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        # Every term must match, the last one as a prefix so partial words still hit
+        expression = ' '.join(f'"{term}"' for term in terms[:-1])
+        expression = f'{expression} "{terms[-1]}"*'.strip()
+        return queryset.filter(search_index__document__match=expression).annotate(
+            search_rank=F('search_index__rank')
+        )
+
+
+def get_search_backend():
+    backend_path = getattr(settings, 'RECIPE_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSSearchBackend()
+    return IContainsSearchBackend()
+
+
+class RecipeSearchFilter(filters.BaseFilterBackend):
+    """
+    Drop-in replacement for SearchFilter backed by the recipe search index.
+
+    Results are ordered by relevance unless the client asks for an explicit
+    ordering, so list it after OrderingFilter in filter_backends.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not get_search_terms(query):
+            return queryset
+
+        queryset = get_search_backend().search(queryset, query)
+        if not request.query_params.get(filters.OrderingFilter.ordering_param):
+            queryset = queryset.order_by('search_rank', '-created_at')
+        return queryset
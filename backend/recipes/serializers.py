@@ -1,5 +1,9 @@
+from django.db import models
 from rest_framework import serializers
 from .models import Recipe, Ingredient, Instruction, RecipeTag, RecipeRating, RecipeFavorite
+from .images import derivative_urls
+from .loaders import RecipeUserState
+from .services import create_recipe, update_recipe
 from django.contrib.auth.models import User
 
 
@@ -30,25 +34,75 @@ class RecipeRatingSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at']
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class ImageDerivativesField(serializers.ReadOnlyField):
+    """
+    URLs of an image field's derivatives, as an {'original', 'thumbnail',
+    'card', 'full'} map. Absolute when a request is in context.
+    """
+    
+    def __init__(self, image_field, **kwargs):
+        kwargs.setdefault('source', '*')
+        super().__init__(**kwargs)
+        self.image_field = image_field
+    
+    def to_representation(self, instance):
+        urls = derivative_urls(instance, self.image_field)
+        if urls is None:
+            return None
+        request = self.context.get('request')
+        if request is not None:
+            urls = {size: request.build_absolute_uri(url) for size, url in urls.items()}
+        return urls
+
+
+class UserStateListSerializer(serializers.ListSerializer):
+    """Primes RecipeUserState with every recipe in the list before rendering it"""
+    recipe_id_attr = 'id'
+    
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        RecipeUserState.for_context(self.context).prime(
+            getattr(item, self.recipe_id_attr) for item in items
+        )
+        return super().to_representation(items)
+
+
+class UserStateMixin:
+    """is_favorited / user_rating read from the request's RecipeUserState"""
+    
+    def get_is_favorited(self, obj):
+        return RecipeUserState.for_context(self.context).is_favorited(obj.id)
+    
+    def get_user_rating(self, obj):
+        rating = RecipeUserState.for_context(self.context).get_rating(obj.id)
+        return RecipeRatingSerializer(rating).data if rating else None
+
+
+class RecipeListSerializer(UserStateMixin, serializers.ModelSerializer):
     """Serializer for recipe list view (minimal data)"""
+    images = ImageDerivativesField('image')
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
     average_rating = serializers.ReadOnlyField()
     total_time = serializers.ReadOnlyField()
     tags = RecipeTagSerializer(many=True, read_only=True)
+    is_favorited = serializers.SerializerMethodField()
+    user_rating = serializers.SerializerMethodField()
     
     class Meta:
         model = Recipe
         fields = [
-            'id', 'title', 'description', 'image', 'prep_time', 'cook_time', 
+            'id', 'title', 'description', 'image', 'images', 'prep_time', 'cook_time',
             'total_time', 'servings', 'difficulty', 'cuisine', 'created_by_name',
             'average_rating', 'tags', 'calories_per_serving', 'ai_generated',
-            'created_at'
+            'created_at', 'is_favorited', 'user_rating'
         ]
+        list_serializer_class = UserStateListSerializer
 
 
-class RecipeDetailSerializer(serializers.ModelSerializer):
+class RecipeDetailSerializer(UserStateMixin, serializers.ModelSerializer):
     """Serializer for recipe detail view (full data)"""
+    images = ImageDerivativesField('image')
+    source_images = ImageDerivativesField('source_image')
     ingredients = IngredientSerializer(many=True, read_only=True)
     instructions = InstructionSerializer(many=True, read_only=True)
     tags = RecipeTagSerializer(many=True, read_only=True)
@@ -62,38 +116,32 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = [
-            'id', 'title', 'description', 'image', 'prep_time', 'cook_time',
+            'id', 'title', 'description', 'image', 'images', 'prep_time', 'cook_time',
             'total_time', 'servings', 'difficulty', 'cuisine', 'created_by',
             'created_by_name', 'created_at', 'updated_at', 'is_public',
             'calories_per_serving', 'protein_grams', 'carbs_grams', 'fat_grams',
-            'fiber_grams', 'ai_generated', 'source_image', 'ingredients',
+            'fiber_grams', 'ai_generated', 'source_image', 'source_images', 'ingredients',
             'instructions', 'tags', 'ratings', 'average_rating', 'is_favorited',
             'user_rating'
         ]
         read_only_fields = ['created_by', 'created_at', 'updated_at']
-    
-    def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return RecipeFavorite.objects.filter(recipe=obj, user=request.user).exists()
-        return False
-    
-    def get_user_rating(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                rating = RecipeRating.objects.get(recipe=obj, user=request.user)
-                return RecipeRatingSerializer(rating).data
-            except RecipeRating.DoesNotExist:
-                return None
-        return None
+
+
+class IngredientWriteSerializer(IngredientSerializer):
+    """Nested ingredient input; an id targets an existing row on update"""
+    id = serializers.IntegerField(required=False)
+
+
+class InstructionWriteSerializer(InstructionSerializer):
+    """Nested instruction input; an id targets an existing row on update"""
+    id = serializers.IntegerField(required=False)
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating and updating recipes"""
-    ingredients = IngredientSerializer(many=True)
-    instructions = InstructionSerializer(many=True)
-    tags = serializers.ListField(child=serializers.CharField(), required=False)
+    ingredients = IngredientWriteSerializer(many=True)
+    instructions = InstructionWriteSerializer(many=True)
+    tags = serializers.ListField(child=serializers.CharField(), required=False, write_only=True)
     
     class Meta:
         model = Recipe
@@ -104,65 +152,42 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             'fiber_grams', 'ingredients', 'instructions', 'tags'
         ]
     
+    def validate_instructions(self, value):
+        step_numbers = [item['step_number'] for item in value]
+        if len(step_numbers) != len(set(step_numbers)):
+            raise serializers.ValidationError('Step numbers must be unique.')
+        return value
+    
     def create(self, validated_data):
-        ingredients_data = validated_data.pop('ingredients')
-        instructions_data = validated_data.pop('instructions')
+        ingredients_data = self._strip_ids(validated_data.pop('ingredients'))
+        instructions_data = self._strip_ids(validated_data.pop('instructions'))
         tags_data = validated_data.pop('tags', [])
         
-        recipe = Recipe.objects.create(**validated_data)
-        
-        # Create ingredients
-        for ingredient_data in ingredients_data:
-            Ingredient.objects.create(recipe=recipe, **ingredient_data)
-        
-        # Create instructions
-        for instruction_data in instructions_data:
-            Instruction.objects.create(recipe=recipe, **instruction_data)
-        
-        # Create or get tags
-        for tag_name in tags_data:
-            tag, created = RecipeTag.objects.get_or_create(name=tag_name.lower())
-            recipe.tags.add(tag)
-        
-        return recipe
+        return create_recipe(validated_data, ingredients_data, instructions_data, tags_data)
     
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', None)
         instructions_data = validated_data.pop('instructions', None)
         tags_data = validated_data.pop('tags', None)
         
-        # Update recipe fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        # Update ingredients
-        if ingredients_data is not None:
-            instance.ingredients.all().delete()
-            for ingredient_data in ingredients_data:
-                Ingredient.objects.create(recipe=instance, **ingredient_data)
-        
-        # Update instructions
-        if instructions_data is not None:
-            instance.instructions.all().delete()
-            for instruction_data in instructions_data:
-                Instruction.objects.create(recipe=instance, **instruction_data)
-        
-        # Update tags
-        if tags_data is not None:
-            instance.tags.clear()
-            for tag_name in tags_data:
-                tag, created = RecipeTag.objects.get_or_create(name=tag_name.lower())
-                instance.tags.add(tag)
-        
-        return instance
+        return update_recipe(instance, validated_data, ingredients_data, instructions_data, tags_data)
+    
+    @staticmethod
+    def _strip_ids(items):
+        return [{key: value for key, value in item.items() if key != 'id'} for item in items]
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['tags'] = [tag.name for tag in instance.tags.all()]
+        return data
 
 
 class RecipeFavoriteSerializer(serializers.ModelSerializer):
     recipe_title = serializers.CharField(source='recipe.title', read_only=True)
     recipe_image = serializers.ImageField(source='recipe.image', read_only=True)
+    recipe_images = ImageDerivativesField('image', source='recipe')
     
     class Meta:
         model = RecipeFavorite
-        fields = ['id', 'recipe', 'recipe_title', 'recipe_image', 'created_at']
+        fields = ['id', 'recipe', 'recipe_title', 'recipe_image', 'recipe_images', 'created_at']
         read_only_fields = ['user', 'created_at']
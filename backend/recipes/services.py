@@ -0,0 +1,238 @@
+"""
+Write paths shared by the recipe serializers, the AI assistant and bulk tooling.
+
+Every helper here works in sets: one query per table rather than one per
+ingredient, instruction or tag.
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from .cache import bump_public_version
+from .catalog import link_catalog
+from .models import Recipe, Ingredient, Instruction, RecipeTag
+from .search import get_search_backend
+from .stats import recount_tags, track_recipe_changes
+
+
+def normalize_tag_names(tag_names):
+    """Lower-case, strip and de-duplicate tag names, keeping their first-seen order"""
+    names = []
+    seen = set()
+    for name in tag_names:
+        name = name.strip().lower()
+        if name and name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def resolve_tags(tag_names):
+    """
+    Return RecipeTag rows for tag_names, creating the missing ones.
+
+    Costs one SELECT when every tag exists, otherwise one bulk INSERT and one
+    more SELECT for the rows that were just created.
+    """
+    names = normalize_tag_names(tag_names)
+    if not names:
+        return []
+
+    tags = {tag.name: tag for tag in RecipeTag.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        # ignore_conflicts lets a concurrent writer win the race for the same name
+        RecipeTag.objects.bulk_create([RecipeTag(name=name) for name in missing], ignore_conflicts=True)
+        tags.update((tag.name, tag) for tag in RecipeTag.objects.filter(name__in=missing))
+    return [tags[name] for name in names]
+
+
+def create_recipe(recipe_data, ingredients_data=(), instructions_data=(), tag_names=()):
+    """Create a recipe with its ingredients, instructions and tags in one transaction"""
+    with transaction.atomic():
+        recipe = Recipe.objects.create(**recipe_data)
+
+        Ingredient.objects.bulk_create(link_catalog(
+            Ingredient(recipe=recipe, **ingredient_data) for ingredient_data in ingredients_data
+        ))
+        Instruction.objects.bulk_create([
+            Instruction(recipe=recipe, **instruction_data) for instruction_data in instructions_data
+        ])
+
+        tags = resolve_tags(tag_names)
+        if tags:
+            recipe.tags.add(*tags)
+
+    return recipe
+
+
+def bulk_create_recipes(items, batch_size=1000):
+    """
+    Create many recipes in one transaction.
+
+    items are (recipe_data, ingredients_data, instructions_data, tag_names)
+    tuples. Rows go in with bulk_create, one INSERT per table and batch, so
+    no model signals fire; the statistics counters, tag counts, search index
+    and list cache version they would have maintained are updated here once
+    for the whole set.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    with transaction.atomic():
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(**recipe_data) for recipe_data, *_ in items], batch_size=batch_size
+        )
+
+        ingredients = []
+        instructions = []
+        tag_names = []
+        for recipe, (_, ingredients_data, instructions_data, names) in zip(recipes, items):
+            ingredients.extend(Ingredient(recipe=recipe, **data) for data in ingredients_data)
+            instructions.extend(Instruction(recipe=recipe, **data) for data in instructions_data)
+            tag_names.extend(names)
+        Ingredient.objects.bulk_create(link_catalog(ingredients), batch_size=batch_size)
+        Instruction.objects.bulk_create(instructions, batch_size=batch_size)
+
+        tags = {tag.name: tag for tag in resolve_tags(tag_names)}
+        TagLink = RecipeTag.recipes.through
+        TagLink.objects.bulk_create([
+            TagLink(recipe_id=recipe.pk, recipetag_id=tags[name].pk)
+            for recipe, (*_, names) in zip(recipes, items)
+            for name in normalize_tag_names(names)
+        ], batch_size=batch_size)
+
+        track_recipe_changes((None, (recipe.is_public, recipe.cuisine)) for recipe in recipes)
+        recount_tags(tag.pk for tag in tags.values())
+        get_search_backend().index_recipes(recipe.pk for recipe in recipes)
+        bump_public_version()
+
+    return recipes
+
+
+INGREDIENT_FIELDS = ['name', 'quantity', 'unit', 'notes', 'order']
+INSTRUCTION_FIELDS = ['step_number', 'instruction', 'time_minutes', 'temperature']
+
+
+def diff_children(model, existing, incoming, fields, match_field=None):
+    """
+    Pair incoming child dicts with existing rows of model.
+
+    Items carrying the id of an existing row are matched to it. The rest are
+    matched to the remaining rows by match_field when given, otherwise by
+    position. Fields an item omits fall back to the model default, the same
+    values a delete-and-recreate would have produced.
+
+    Returns (changed_rows, changed_fields, new_rows, removed_ids).
+    """
+    by_id = {row.id: row for row in existing}
+    claimed = {item['id'] for item in incoming if item.get('id') in by_id}
+    unclaimed = [row for row in existing if row.id not in claimed]
+    if match_field:
+        pool = {getattr(row, match_field): row for row in unclaimed}
+    else:
+        pool = iter(unclaimed)
+    defaults = {field: model._meta.get_field(field).get_default() for field in fields}
+
+    changed_rows = []
+    changed_fields = set()
+    new_rows = []
+    kept_ids = set()
+    for item in incoming:
+        values = {field: item.get(field, defaults[field]) for field in fields}
+        if item.get('id') in by_id:
+            row = by_id[item['id']]
+        elif match_field:
+            row = pool.pop(values[match_field], None)
+        else:
+            row = next(pool, None)
+
+        if row is None:
+            new_rows.append(model(**values))
+            continue
+
+        kept_ids.add(row.id)
+        row_changes = [field for field, value in values.items() if getattr(row, field) != value]
+        if row_changes:
+            for field in row_changes:
+                setattr(row, field, values[field])
+            changed_rows.append(row)
+            changed_fields.update(row_changes)
+
+    removed_ids = [row.id for row in existing if row.id not in kept_ids]
+    return changed_rows, sorted(changed_fields), new_rows, removed_ids
+
+
+def _apply_children(model, recipe, changed_rows, changed_fields, new_rows, removed_ids):
+    if removed_ids:
+        model.objects.filter(id__in=removed_ids).delete()
+    if changed_rows:
+        model.objects.bulk_update(changed_rows, changed_fields)
+    if new_rows:
+        for row in new_rows:
+            row.recipe = recipe
+        model.objects.bulk_create(new_rows)
+    return bool(removed_ids or changed_rows or new_rows)
+
+
+def update_recipe(recipe, recipe_data, ingredients_data=None, instructions_data=None, tag_names=None):
+    """
+    Apply an edit to a recipe, writing only what changed.
+
+    Nested lists that are None are left alone. Otherwise children are
+    diffed against the stored rows: changed rows are bulk-updated, new rows
+    bulk-inserted and missing rows bulk-deleted, and only the tag links that
+    differ are added or removed.
+    """
+    with transaction.atomic():
+        changed = [
+            field for field, value in recipe_data.items() if getattr(recipe, field) != value
+        ]
+        for field in changed:
+            setattr(recipe, field, recipe_data[field])
+        children_changed = False
+
+        if ingredients_data is not None:
+            changed_rows, changed_fields, new_rows, removed_ids = diff_children(
+                Ingredient, list(recipe.ingredients.all()), ingredients_data, INGREDIENT_FIELDS
+            )
+            if 'name' in changed_fields:
+                changed_fields.append('catalog')
+            # Renamed and new rows share one catalog lookup
+            link_catalog(
+                [row for row in changed_rows if 'catalog' in changed_fields] + new_rows
+            )
+            children_changed |= _apply_children(
+                Ingredient, recipe, changed_rows, changed_fields, new_rows, removed_ids
+            )
+
+        if instructions_data is not None:
+            changed_rows, changed_fields, new_rows, removed_ids = diff_children(
+                Instruction, list(recipe.instructions.all()), instructions_data, INSTRUCTION_FIELDS,
+                match_field='step_number'
+            )
+            if 'step_number' in changed_fields:
+                # Reordered steps would trip (recipe, step_number) uniqueness mid-update,
+                # so park them above every current step number first
+                offset = (recipe.instructions.aggregate(top=Max('step_number'))['top'] or 0) + 1
+                parked = [Instruction(id=row.id, step_number=row.step_number + offset) for row in changed_rows]
+                Instruction.objects.bulk_update(parked, ['step_number'])
+            children_changed |= _apply_children(
+                Instruction, recipe, changed_rows, changed_fields, new_rows, removed_ids
+            )
+
+        if tag_names is not None:
+            current = {tag.name: tag for tag in recipe.tags.all()}
+            wanted = normalize_tag_names(tag_names)
+            removed = [tag for name, tag in current.items() if name not in wanted]
+            added = resolve_tags([name for name in wanted if name not in current])
+            if removed:
+                recipe.tags.remove(*removed)
+            if added:
+                recipe.tags.add(*added)
+            children_changed |= bool(removed or added)
+
+        if changed or children_changed:
+            recipe.save(update_fields=changed + ['updated_at'])
+
+    return recipe
@@ -0,0 +1,174 @@
+from accounts.models import UserPreference, UserProfile
+from meals.models import Meal
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_public_version, bump_tags_version, bump_user_state_version
+from .images import IMAGE_FIELDS, delete_derivative_files, queue_changed_images, remember_image_names
+from .models import Recipe, RecipeFavorite, RecipeFeed, RecipeRating, RecipeTag
+from .search import get_search_backend
+from .stats import recount_tags, track_recipe_change
+
+
+SEARCHABLE_FIELDS = {'title', 'description'}
+
+
+def _load_stats_state(recipe):
+    # A recipe loaded with is_public or cuisine deferred: read the stored values
+    if getattr(recipe, '_stats_state', None) is None:
+        recipe._stats_state = Recipe.objects.filter(pk=recipe.pk).values_list('is_public', 'cuisine').first()
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_saving(sender, instance, **kwargs):
+    if not instance._state.adding:
+        _load_stats_state(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, update_fields=None, **kwargs):
+    old_state = None if created else getattr(instance, '_stats_state', None)
+    # Fields a deferred save didn't write keep their stored values
+    new_state = instance.get_stats_state(old_state or (None, None))
+    track_recipe_change(old_state, new_state)
+    instance._stats_state = new_state
+    bump_public_version()
+
+    if update_fields is not None and not SEARCHABLE_FIELDS.intersection(update_fields):
+        return
+    get_search_backend().index_recipes([instance.pk])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    _load_stats_state(instance)
+    # The tag links go with the recipe without an m2m_changed signal
+    instance._deleted_tag_ids = list(instance.tags.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    track_recipe_change(getattr(instance, '_stats_state', None), None)
+    recount_tags(getattr(instance, '_deleted_tag_ids', []))
+    get_search_backend().remove_recipes([instance.pk])
+    bump_public_version()
+
+
+@receiver(m2m_changed, sender=RecipeTag.recipes.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('post_'):
+        bump_public_version()
+    if reverse:
+        # recipe.tags.add(...) and friends: one recipe, pk_set holds tag ids
+        if action == 'pre_clear':
+            instance._cleared_tag_ids = list(instance.tags.values_list('id', flat=True))
+        elif action in ('post_add', 'post_remove', 'post_clear'):
+            tag_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_tag_ids', [])
+            recount_tags(tag_ids or [])
+            get_search_backend().index_recipes([instance.pk])
+        return
+
+    # tag.recipes.add(...) and friends: one tag, pk_set holds recipe ids.
+    # Capture the members before a clear empties them.
+    if action == 'pre_clear':
+        instance._cleared_recipe_ids = list(instance.recipes.values_list('id', flat=True))
+    elif action == 'post_clear':
+        recount_tags([instance.pk])
+        get_search_backend().index_recipes(getattr(instance, '_cleared_recipe_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        recount_tags([instance.pk])
+        get_search_backend().index_recipes(pk_set)
+
+
+@receiver(post_save, sender=RecipeTag)
+def tag_saved(sender, instance, **kwargs):
+    bump_public_version()
+    bump_tags_version()
+
+
+@receiver(pre_delete, sender=RecipeTag)
+def remember_deleted_tag_recipes(sender, instance, **kwargs):
+    instance._cleared_recipe_ids = list(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=RecipeTag)
+def reindex_untagged_recipes(sender, instance, **kwargs):
+    get_search_backend().index_recipes(getattr(instance, '_cleared_recipe_ids', []))
+    bump_public_version()
+    bump_tags_version()
+
+
+@receiver(post_delete, sender=RecipeRating)
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    Recipe.apply_rating_change(instance.recipe_id, -1, -instance.rating)
+
+
+@receiver(post_save, sender=RecipeRating)
+@receiver(post_delete, sender=RecipeRating)
+def rating_changed(sender, instance, **kwargs):
+    bump_public_version()
+    bump_user_state_version(instance.user_id)
+    RecipeFeed.invalidate([instance.user_id])
+
+
+@receiver(post_save, sender=RecipeFavorite)
+@receiver(post_delete, sender=RecipeFavorite)
+def favorite_changed(sender, instance, **kwargs):
+    bump_user_state_version(instance.user_id)
+    RecipeFeed.invalidate([instance.user_id])
+
+
+@receiver(post_save, sender=UserPreference)
+@receiver(post_delete, sender=UserPreference)
+def taste_changed(sender, instance, **kwargs):
+    RecipeFeed.invalidate([instance.user_id])
+
+
+@receiver(post_init, sender=UserProfile)
+def profile_loaded(sender, instance, **kwargs):
+    instance._feed_cuisines = list(instance.favorite_cuisines or [])
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, created, **kwargs):
+    # The profile is saved along with every User save (logins included)
+    if not created and list(instance.favorite_cuisines or []) != instance._feed_cuisines:
+        RecipeFeed.invalidate([instance.user_id])
+    instance._feed_cuisines = list(instance.favorite_cuisines or [])
+
+
+@receiver(post_save, sender=Meal)
+def meal_saved(sender, instance, **kwargs):
+    if instance.completed:
+        RecipeFeed.invalidate(User.objects.filter(meal_plans=instance.meal_plan_id))
+
+
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=UserProfile)
+def image_owner_loaded(sender, instance, **kwargs):
+    remember_image_names(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=UserProfile)
+def image_owner_saved(sender, instance, created, **kwargs):
+    queue_changed_images(instance, created)
+
+
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=UserProfile)
+def image_owner_deleting(sender, instance, **kwargs):
+    # A deferred derivatives map can't be loaded once the row is gone
+    derivatives_field, _ = IMAGE_FIELDS[instance._meta.label_lower]
+    if derivatives_field in instance.get_deferred_fields():
+        instance.refresh_from_db(fields=[derivatives_field])
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=UserProfile)
+def image_owner_deleted(sender, instance, **kwargs):
+    derivatives_field, _ = IMAGE_FIELDS[instance._meta.label_lower]
+    for entry in (getattr(instance, derivatives_field) or {}).values():
+        transaction.on_commit(lambda entry=entry: delete_derivative_files(entry))
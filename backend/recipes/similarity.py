@@ -0,0 +1,215 @@
+"""
+"More like this": precomputed TF-IDF nearest neighbours.
+
+Each public recipe is a sparse binary vector over its catalog ingredients,
+tags, cuisine and difficulty, weighted by smoothed IDF and L2-normalized,
+so a dot product is a cosine similarity. Neighbours are found in blocks of
+rows: one sparse-by-dense product scores the block against every recipe,
+argpartition picks each row's top k, and the block is written before the
+next one is scored, so memory holds one block of scores at a time.
+
+An incremental build re-scores the recipes changed since the last build,
+plus every recipe whose stored list they appeared in or would now enter.
+IDF weights are recomputed on every run; a periodic full build keeps the
+untouched lists in step with them. Deleted recipes simply drop out of the
+lists that held them until then.
+"""
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Ingredient, Recipe, RecipeSimilarity, RecipeTag, SimilarityBuild
+
+
+DEFAULT_K = 10
+# Scores held in memory per block: 25M float32 is about 100 MB
+BLOCK_CELLS = 25_000_000
+# Rows committed by a transaction that started before the last build can
+# carry an older updated_at, so incremental builds look back this far
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def _pairs(queryset):
+    return np.array(list(queryset), dtype=np.int64).reshape(-1, 2)
+
+
+class RecipeVectors:
+    """TF-IDF matrix of the public recipes; row i belongs to recipe ids[i]"""
+
+    def __init__(self, ids, matrix, columns=None):
+        self.ids = ids
+        self.matrix = matrix
+        # {family: {value: column}} for 'ingredient' (catalog id), 'tag' (tag id), 'cuisine' and 'difficulty'
+        self.columns = columns or {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls):
+        recipes = Recipe.objects.filter(is_public=True).order_by('id').values_list('id', 'cuisine', 'difficulty')
+        ids, cuisines, difficulties = [], [], []
+        for recipe_id, cuisine, difficulty in recipes.iterator(chunk_size=10000):
+            ids.append(recipe_id)
+            cuisines.append(cuisine)
+            difficulties.append(difficulty)
+        ids = np.array(ids, dtype=np.int64)
+
+        ingredients = _pairs(Ingredient.objects.filter(
+            recipe__is_public=True, catalog__isnull=False
+        ).values_list('recipe_id', 'catalog_id'))
+        tags = _pairs(RecipeTag.recipes.through.objects.filter(
+            recipe__is_public=True
+        ).values_list('recipe_id', 'recipetag_id'))
+
+        # Each feature family gets its own block of columns
+        rows, columns, offset = [], [], 0
+        labels_by_family = {}
+        all_rows = np.arange(len(ids))
+        for family, row_ids, values in (
+            ('ingredient', ingredients[:, 0], ingredients[:, 1]),
+            ('tag', tags[:, 0], tags[:, 1]),
+            ('cuisine', ids, np.array(cuisines, dtype=object)),
+            ('difficulty', ids, np.array(difficulties, dtype=object)),
+        ):
+            if not len(values):
+                continue
+            labels, codes = np.unique(values, return_inverse=True)
+            rows.append(all_rows if row_ids is ids else np.searchsorted(ids, row_ids))
+            columns.append(codes.ravel() + offset)
+            labels_by_family[family] = {label: offset + code for code, label in enumerate(labels.tolist())}
+            offset += len(labels)
+
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        columns = np.concatenate(columns) if columns else np.empty(0, dtype=np.int64)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(ids), offset)
+        )
+        # Repeated ingredients count once
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+
+        document_frequency = np.bincount(matrix.indices, minlength=offset)
+        idf = np.log((1 + len(ids)) / (1 + document_frequency)) + 1
+        matrix = matrix @ sparse.diags(idf.astype(np.float32))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix = (sparse.diags((1 / norms).astype(np.float32)) @ matrix).tocsr()
+        return cls(ids, matrix, labels_by_family)
+
+    def locate(self, recipe_ids):
+        """(row numbers, found mask) for an array of recipe ids"""
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.zeros(len(recipe_ids), dtype=np.int64), np.zeros(len(recipe_ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.ids, recipe_ids), len(self.ids) - 1)
+        return positions, self.ids[positions] == recipe_ids
+
+    def rows_for(self, recipe_ids):
+        """Sorted row numbers of those recipe ids that are in the matrix"""
+        positions, found = self.locate(list(recipe_ids))
+        return np.unique(positions[found])
+
+    def score_blocks(self, rows, block_cells=BLOCK_CELLS):
+        """Yield (row numbers, scores against every recipe) blocks for the given rows"""
+        block_size = max(1, block_cells // max(len(self), 1))
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            scores = np.asarray((self.matrix @ self.matrix[block].T.toarray()).T)
+            # A recipe is not its own neighbour
+            scores[np.arange(len(block)), block] = -1
+            yield block, scores
+
+
+def top_k(scores, k):
+    """Column indices and scores of each row's k best entries, best first"""
+    k = min(k, scores.shape[1] - 1)
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def _write_block(vectors, block, neighbours, scores):
+    recipe_ids = vectors.ids[block]
+    entries = [
+        RecipeSimilarity(recipe_id=int(recipe_id), similar_id=int(vectors.ids[column]), score=float(score), rank=rank)
+        for recipe_id, columns, row_scores in zip(recipe_ids, neighbours, scores)
+        for rank, (column, score) in enumerate(zip(columns, row_scores), start=1)
+        if score > 0
+    ]
+    with transaction.atomic():
+        RecipeSimilarity.objects.filter(recipe_id__in=recipe_ids.tolist()).delete()
+        RecipeSimilarity.objects.bulk_create(entries, batch_size=2000)
+
+
+def _rescore(vectors, rows, k, block_cells, thresholds=None):
+    """
+    Replace the stored lists of rows. With thresholds (each recipe's lowest
+    stored score), also return the rows some rescored recipe now beats.
+    """
+    entering = np.zeros(len(vectors), dtype=bool)
+    for block, scores in vectors.score_blocks(rows, block_cells):
+        _write_block(vectors, block, *top_k(scores, k))
+        if thresholds is not None:
+            entering |= (scores > thresholds).any(axis=0)
+    return entering
+
+
+def _rescore_changed(changed, k, block_cells):
+    # Lists that mention a changed recipe may drop or reorder it
+    listing = set(RecipeSimilarity.objects.filter(similar_id__in=changed).values_list('recipe_id', flat=True))
+    RecipeSimilarity.objects.filter(recipe_id__in=changed).exclude(recipe__is_public=True).delete()
+    vectors = RecipeVectors.load()
+
+    # A changed recipe enters a list by beating its weakest entry, or with
+    # any positive score while the list is short
+    thresholds = np.zeros(len(vectors), dtype=np.float32)
+    full_lists = RecipeSimilarity.objects.order_by().values('recipe_id').annotate(
+        lowest=Min('score'), count=Count('id')
+    ).filter(count__gte=k).values_list('recipe_id', 'lowest')
+    full_lists = np.array(list(full_lists), dtype=np.float64).reshape(-1, 2)
+    positions, found = vectors.locate(full_lists[:, 0])
+    thresholds[positions[found]] = full_lists[found, 1]
+
+    changed_rows = vectors.rows_for(changed)
+    entering = _rescore(vectors, changed_rows, k, block_cells, thresholds)
+    entering[changed_rows] = False
+    follow_up = np.union1d(np.flatnonzero(entering), vectors.rows_for(listing - changed))
+    _rescore(vectors, follow_up, k, block_cells)
+    return len(changed_rows) + len(follow_up)
+
+
+def build_similarities(k=DEFAULT_K, full=False, block_cells=BLOCK_CELLS):
+    """Compute and store neighbour lists; returns the SimilarityBuild recorded"""
+    started_at = timezone.now()
+    clock = time.perf_counter()
+    last_build = SimilarityBuild.objects.first()
+    full = full or last_build is None
+
+    if full:
+        vectors = RecipeVectors.load()
+        rows = np.arange(len(vectors))
+        _rescore(vectors, rows, k, block_cells)
+        RecipeSimilarity.objects.exclude(recipe__is_public=True).delete()
+        scored = len(rows)
+    else:
+        changed = set(Recipe.objects.filter(
+            updated_at__gte=last_build.started_at - SYNC_OVERLAP
+        ).values_list('id', flat=True))
+        scored = 0
+        if changed:
+            scored = _rescore_changed(changed, k, block_cells)
+
+    return SimilarityBuild.objects.create(
+        started_at=started_at, full=full, recipes_scored=scored,
+        duration_ms=int((time.perf_counter() - clock) * 1000),
+    )
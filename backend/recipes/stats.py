@@ -0,0 +1,107 @@
+"""
+Materialized statistics for the public recipe_stats endpoint.
+
+Totals live in RecipeStatistic counters and per-tag usage in
+RecipeTag.recipe_count. Both are updated incrementally by recipe, rating and
+tag writes (see recipes.signals and Recipe.apply_rating_change), so serving
+the endpoint reads a handful of tiny rows. recompute_stats() rebuilds
+everything from the source tables.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .cache import bump_tags_version
+from .models import Recipe, RecipeRating, RecipeStatistic, RecipeTag
+
+
+PUBLIC_RECIPES = 'public_recipes'
+RATINGS = 'ratings'
+RATING_SUM = 'rating_sum'
+CUISINE_PREFIX = 'cuisine:'
+
+
+def track_recipe_changes(changes):
+    """Post the summed counter deltas for (old_state, new_state) pairs of (is_public, cuisine)"""
+    deltas = Counter()
+    for old_state, new_state in changes:
+        if old_state == new_state:
+            continue
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state and state[0]:
+                deltas[PUBLIC_RECIPES] += sign
+                deltas[f'{CUISINE_PREFIX}{state[1]}'] += sign
+    RecipeStatistic.bump(deltas)
+
+
+def track_recipe_change(old_state, new_state):
+    """Post the counter deltas for a recipe moving from old to new (is_public, cuisine)"""
+    track_recipe_changes([(old_state, new_state)])
+
+
+def recount_tags(tag_ids=None):
+    """Set recipe_count on the given tags (all tags when None) from the link table"""
+    links = (
+        RecipeTag.recipes.through.objects.filter(recipetag_id=OuterRef('pk'))
+        .order_by().values('recipetag_id').annotate(count=Count('*')).values('count')
+    )
+    tags = RecipeTag.objects.all()
+    if tag_ids is not None:
+        tag_ids = list(tag_ids)
+        if not tag_ids:
+            return
+        tags = tags.filter(id__in=tag_ids)
+    tags.update(recipe_count=Coalesce(Subquery(links), 0))
+    bump_tags_version()
+
+
+def recompute_stats():
+    """Rebuild every counter and tag count from the recipe and rating tables"""
+    public = Recipe.objects.filter(is_public=True)
+    ratings = RecipeRating.objects.aggregate(count=Count('id'), total=Sum('rating'))
+    counters = {
+        PUBLIC_RECIPES: public.count(),
+        RATINGS: ratings['count'] or 0,
+        RATING_SUM: ratings['total'] or 0,
+    }
+    for cuisine, count in public.order_by().values_list('cuisine').annotate(count=Count('id')):
+        counters[f'{CUISINE_PREFIX}{cuisine}'] = count
+
+    with transaction.atomic():
+        RecipeStatistic.objects.all().delete()
+        RecipeStatistic.objects.bulk_create([
+            RecipeStatistic(name=name, value=value) for name, value in counters.items()
+        ])
+        recount_tags()
+
+
+def get_stats_snapshot():
+    """The recipe_stats payload, read from the materialized counters"""
+    counters = {}
+    computed_at = None
+    for name, value, updated_at in RecipeStatistic.objects.values_list('name', 'value', 'updated_at'):
+        counters[name] = value
+        computed_at = max(computed_at, updated_at) if computed_at else updated_at
+
+    total_ratings = counters.get(RATINGS, 0)
+    cuisines = sorted(
+        (
+            {'cuisine': name[len(CUISINE_PREFIX):], 'count': value}
+            for name, value in counters.items()
+            if name.startswith(CUISINE_PREFIX) and value > 0
+        ),
+        key=lambda item: (-item['count'], item['cuisine'])
+    )
+
+    return {
+        'total_recipes': counters.get(PUBLIC_RECIPES, 0),
+        'total_ratings': total_ratings,
+        'average_rating': counters.get(RATING_SUM, 0) / total_ratings if total_ratings else 0,
+        'popular_cuisines': cuisines[:5],
+        'popular_tags': list(
+            RecipeTag.objects.order_by('-recipe_count', 'name').values('name', 'recipe_count')[:10]
+        ),
+        'computed_at': computed_at,
+    }
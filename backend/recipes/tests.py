@@ -1,3 +1,871 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .autocomplete import Autocomplete
+from .catalog import backfill_catalog
+from .exporting import stream_recipes
+from .feed import build_feeds
+from .images import process_pending
+from .importing import import_recipes
+from .models import (
+    ImageDerivativeJob, Ingredient, IngredientCatalog, Recipe, RecipeFavorite, RecipeRating, RecipeSimilarity,
+    RecipeStatistic, RecipeTag,
+)
+from .pantry import PantryIndex
+from .serializers import RecipeCreateUpdateSerializer, IngredientSerializer, InstructionSerializer
+from .services import create_recipe, update_recipe
+from .similarity import build_similarities
+from .stats import CUISINE_PREFIX, PUBLIC_RECIPES
+
+
+def make_recipe(user, title, ingredients=(), tags=(), **fields):
+    """A recipe through the regular write path; ingredients are names, or (name, quantity, unit)"""
+    fields = {'description': title, 'prep_time': 5, 'cook_time': 5, **fields}
+    ingredients = [(item, 1, 'cup') if isinstance(item, str) else item for item in ingredients]
+    return create_recipe(
+        {'title': title, 'created_by': user, **fields},
+        [{'name': name, 'quantity': quantity, 'unit': unit, 'order': order}
+         for order, (name, quantity, unit) in enumerate(ingredients)],
+        [],
+        tags,
+    )
+
+
+class RecipeDiffUpdateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.recipe = create_recipe(
+            {
+                'title': 'Tomato Soup', 'description': 'Simple soup', 'prep_time': 10,
+                'cook_time': 20, 'created_by': self.user,
+            },
+            [
+                {'name': 'Tomato', 'quantity': 4, 'unit': 'piece', 'order': 1},
+                {'name': 'Onion', 'quantity': 1, 'unit': 'piece', 'order': 2},
+                {'name': 'Stock', 'quantity': 2, 'unit': 'cup', 'order': 3},
+            ],
+            [
+                {'step_number': 1, 'instruction': 'Chop everything'},
+                {'step_number': 2, 'instruction': 'Simmer'},
+            ],
+            ['soup', 'vegan'],
+        )
+
+    def payload(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        return {
+            'ingredients': IngredientSerializer(recipe.ingredients.all(), many=True).data,
+            'instructions': InstructionSerializer(recipe.instructions.all(), many=True).data,
+            'tags': ['soup', 'vegan'],
+        }
+
+    def update(self, data, queries=None):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        serializer = RecipeCreateUpdateSerializer(recipe, data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        if queries is None:
+            return serializer.save()
+        with self.assertNumQueries(queries):
+            return serializer.save()
+
+    def test_single_ingredient_edit_updates_one_row(self):
+        data = self.payload()
+        ingredient_ids = [item['id'] for item in data['ingredients']]
+        data['ingredients'][1]['quantity'] = 2
+
+        # SAVEPOINT, 3 reads (ingredients, instructions, tags),
+        # 1 bulk UPDATE, 1 recipe UPDATE of updated_at, RELEASE
+        self.update(data, queries=7)
+
+        ingredients = list(self.recipe.ingredients.all())
+        self.assertEqual([i.id for i in ingredients], ingredient_ids)
+        self.assertEqual(ingredients[1].quantity, 2)
+
+    def test_single_recipe_field_edit_skips_children(self):
+        # SAVEPOINT, recipe UPDATE, RELEASE (servings is not indexed for search)
+        self.update({'servings': 6}, queries=3)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.servings, 6)
+
+    def test_unchanged_payload_writes_nothing(self):
+        # SAVEPOINT, 3 reads, RELEASE
+        self.update(self.payload(), queries=5)
+
+    def test_rows_matched_by_position_without_ids(self):
+        data = self.payload()
+        ingredient_ids = [item['id'] for item in data['ingredients']]
+        for item in data['ingredients']:
+            del item['id']
+        data['ingredients'] = data['ingredients'][:2] + [{'name': 'Basil', 'quantity': 1, 'unit': 'bunch', 'order': 3}]
+
+        self.update(data)
+
+        ingredients = list(self.recipe.ingredients.all())
+        self.assertEqual([i.id for i in ingredients], ingredient_ids)
+        self.assertEqual(ingredients[2].name, 'Basil')
+
+    def test_added_and_removed_rows(self):
+        data = self.payload()
+        kept_id = data['ingredients'][0]['id']
+        data['ingredients'] = [data['ingredients'][0], {'name': 'Cream', 'quantity': 1, 'unit': 'cup', 'order': 2}]
+
+        self.update(data)
+
+        names = list(self.recipe.ingredients.values_list('name', flat=True))
+        self.assertEqual(names, ['Tomato', 'Cream'])
+        self.assertTrue(self.recipe.ingredients.filter(id=kept_id).exists())
+
+    def test_reordered_instructions_keep_their_ids(self):
+        data = self.payload()
+        first, second = data['instructions']
+        first['step_number'], second['step_number'] = 2, 1
+
+        self.update(data)
+
+        steps = {i.id: i.step_number for i in self.recipe.instructions.all()}
+        self.assertEqual(steps, {first['id']: 2, second['id']: 1})
+
+    def test_only_changed_tag_links_are_written(self):
+        data = self.payload()
+        data['tags'] = ['soup', 'Quick']
+
+        self.update(data)
+
+        self.assertEqual(sorted(self.recipe.tags.values_list('name', flat=True)), ['quick', 'soup'])
+
+
+class RecipeTotalTimeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        for title, prep_time, cook_time in [('Salad', 10, 0), ('Stew', 20, 100), ('Pasta', 10, 15)]:
+            Recipe.objects.create(
+                title=title, description=title, prep_time=prep_time, cook_time=cook_time, created_by=self.user
+            )
+
+    def titles(self, query):
+        response = APIClient().get(f'/api/recipes/?{query}')
+        return [recipe['title'] for recipe in response.data['results']]
+
+    def test_total_time_follows_prep_and_cook_time(self):
+        Recipe.objects.filter(title='Salad').update(cook_time=5)
+        self.assertEqual(Recipe.objects.get(title='Salad').total_time, 15)
+
+    def test_time_range_filters_on_the_total(self):
+        # Pasta's prep and cook times are each under 20 minutes, its total is not
+        self.assertEqual(self.titles('max_time=20'), ['Salad'])
+        self.assertEqual(self.titles('min_time=20&max_time=60&ordering=total_time'), ['Pasta'])
+
+    def test_ordering_by_total_time(self):
+        self.assertEqual(self.titles('ordering=-total_time'), ['Stew', 'Pasta', 'Salad'])
+
+    def test_time_range_uses_the_total_time_index(self):
+        plan = Recipe.objects.filter(is_public=True, total_time__gte=15, total_time__lte=60).explain()
+        self.assertIn('recipe_public_total_time_idx', plan)
+
+        plan = Recipe.objects.filter(is_public=True).order_by('total_time').explain()
+        self.assertIn('recipe_public_total_time_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class RecipeFeedCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        author = User.objects.create_user('author', password='secret')
+        self.recipe = Recipe.objects.create(
+            title='Stew', description='Stew', prep_time=10, cook_time=60, created_by=author
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def feed_state(self):
+        recipe = self.client.get('/api/recipes/feed/').data['results'][0]
+        return recipe['is_favorited'], recipe['user_rating'] and recipe['user_rating']['rating']
+
+    def test_cached_pages_follow_favorite_and_rating_writes(self):
+        self.assertEqual(self.feed_state(), (False, None))
+
+        favorite = RecipeFavorite.objects.create(user=self.user, recipe=self.recipe)
+        self.assertEqual(self.feed_state(), (True, None))
+
+        RecipeRating.objects.create(user=self.user, recipe=self.recipe, rating=4)
+        self.assertEqual(self.feed_state(), (True, 4))
+
+        favorite.delete()
+        self.assertEqual(self.feed_state(), (False, 4))
+
+
+class RecipeCursorPaginationTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('cook', password='secret')
+        for number in range(25):
+            Recipe.objects.create(
+                title=f'Soup {number % 7} {number}', description='tomato soup' if number % 2 else 'bread',
+                prep_time=number % 5, cook_time=number % 3, created_by=user
+            )
+
+    def walk(self, url):
+        titles = []
+        while url:
+            response = APIClient().get(url)
+            self.assertEqual(response.status_code, 200)
+            titles += [recipe['title'] for recipe in response.data['results']]
+            url = response.data['next']
+        return titles
+
+    def test_cursor_follows_the_requested_ordering(self):
+        for ordering in ('title', '-total_time', 'prep_time,-title'):
+            self.assertEqual(
+                self.walk(f'/api/recipes/?pagination=cursor&ordering={ordering}'),
+                self.walk(f'/api/recipes/?ordering={ordering}'),
+            )
+
+    def test_pages_stay_put_when_rows_are_added_and_removed(self):
+        user = User.objects.get(username='cook')
+        expected = self.walk('/api/recipes/?ordering=title')
+        first = APIClient().get('/api/recipes/?pagination=cursor&ordering=title').data
+        seen = [recipe['title'] for recipe in first['results']]
+
+        # Rows before the cursor would shift an offset page; rows after it show up in place
+        Recipe.objects.create(title='Aaa', description='', prep_time=1, cook_time=1, created_by=user)
+        Recipe.objects.filter(title=seen[0]).delete()
+        Recipe.objects.create(title='Zzz', description='', prep_time=1, cook_time=1, created_by=user)
+
+        self.assertEqual(seen + self.walk(first['next']), expected + ['Zzz'])
+
+    def test_cursor_rejects_search_relevance_order(self):
+        response = APIClient().get('/api/recipes/?pagination=cursor&search=tomato')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.walk('/api/recipes/?pagination=cursor&search=tomato&ordering=title')), 12)
+
+
+class RecipeImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+
+    def record(self, title):
+        return json.dumps({
+            'title': title, 'description': title, 'prep_time': 5, 'cook_time': 5,
+            'ingredients': [{'name': 'Salt', 'quantity': 1, 'unit': 'tsp'}],
+            'instructions': [{'step_number': 1, 'instruction': 'Mix'}],
+        }).encode()
+
+    def run_import(self, data, file_format):
+        stream = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='surrogateescape', newline='')
+        return import_recipes(stream, self.user, file_format=file_format)
+
+    def test_undecodable_line_fails_alone(self):
+        data = b'\n'.join([self.record('Soup'), self.record('Cafe').replace(b'Cafe', b'Caf\xe9'), self.record('Stew')])
+        report = self.run_import(data, 'jsonl')
+        self.assertEqual((report.created, report.failed), (2, 1))
+        self.assertEqual(report.errors[0]['line'], 2)
+
+    def test_csv_error_fails_alone(self):
+        header = 'title,description,prep_time,cook_time,ingredients,instructions\r\n'
+        cells = ',1,1,"[{""name"":""Salt"",""quantity"":1,""unit"":""tsp""}]","[{""step_number"":1,""instruction"":""Mix""}]"\r\n'
+        oversized = '"' + 'x' * (csv.field_size_limit() + 1) + '"'
+        data = header + 'Soup,Soup' + cells + f'Stew,{oversized}' + cells + 'Salad,Salad' + cells
+        report = self.run_import(data.encode(), 'csv')
+        self.assertEqual((report.created, report.failed), (2, 1))
+        self.assertIn('Invalid CSV', report.errors[0]['errors']['non_field_errors'][0])
+
+
+class RecipeStatsStateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.recipe = Recipe.objects.create(
+            title='Stew', description='Stew', prep_time=10, cook_time=60, cuisine='french', created_by=self.user
+        )
+
+    def counters(self):
+        return {name: value for name, value in RecipeStatistic.objects.values_list('name', 'value') if value}
+
+    def test_saving_a_recipe_loaded_without_the_tracked_fields(self):
+        before = self.counters()
+        recipe = Recipe.objects.only('id', 'title').get(pk=self.recipe.pk)
+        recipe.title = 'Beef stew'
+        recipe.save()
+        self.assertEqual(self.counters(), before)
+
+    def test_deferred_fields_changes_are_still_counted(self):
+        recipe = Recipe.objects.only('id', 'cuisine').get(pk=self.recipe.pk)
+        recipe.cuisine = 'italian'
+        recipe.save()
+        self.assertEqual(self.counters(), {PUBLIC_RECIPES: 1, f'{CUISINE_PREFIX}italian': 1})
+
+        Recipe.objects.only('id').get(pk=self.recipe.pk).delete()
+        self.assertEqual(self.counters(), {})
+
+
+class RecipeRatingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.recipe = Recipe.objects.create(
+            title='Stew', description='Stew', prep_time=10, cook_time=60, created_by=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/recipes/{self.recipe.pk}/rate/'
+
+    def aggregates(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        return recipe.rating_count, recipe.rating_sum
+
+    def test_invalid_ratings_are_rejected(self):
+        for payload in ({}, {'rating': 'great'}, {'rating': 0}, {'rating': 6}, {'review': 'Lovely'}):
+            self.assertEqual(self.client.post(self.url, payload, format='json').status_code, 400)
+        self.assertEqual(self.aggregates(), (0, 0))
+
+    def test_rating_and_updating(self):
+        self.assertEqual(self.client.post(self.url, {'rating': 4}, format='json').status_code, 201)
+        self.assertEqual(self.client.post(self.url, {'review': 'Lovely'}, format='json').status_code, 200)
+        self.assertEqual(self.client.post(self.url, {'rating': 2}, format='json').status_code, 200)
+        self.assertEqual(self.aggregates(), (1, 2))
+        self.assertEqual(RecipeRating.objects.get().review, 'Lovely')
+
+        RecipeRating.objects.get().delete()
+        self.assertEqual(self.aggregates(), (0, 0))
+
+
+class RecipeAutocompleteTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('cook', password='secret')
+        make_recipe(user, 'Loaf', ['Bread flour', 'Chicken breast'], ['bread', 'gluten-free'])
+        make_recipe(user, 'Wings', ['chicken breasts', 'Salt'], ['bread'])
+        # Each test starts from freshly loaded indexes
+        patcher = mock.patch('recipes.views.autocomplete', Autocomplete())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def complete(self, query):
+        return APIClient().get(f'/api/recipes/autocomplete/?{query}').data
+
+    def test_prefixes_match_word_starts_most_used_first(self):
+        self.assertEqual(self.complete('q=BRE'), {
+            'tags': [{'name': 'bread', 'count': 2}],
+            'ingredients': [{'name': 'Chicken breast', 'count': 2}, {'name': 'Bread flour', 'count': 1}],
+        })
+        self.assertEqual(self.complete('q=free&type=tag'), {'tags': [{'name': 'gluten-free', 'count': 1}]})
+        self.assertEqual(self.complete('q=bre&type=ingredient&limit=1')['ingredients'][0]['name'], 'Chicken breast')
+
+    def test_tag_edits_from_other_processes_show_after_the_interval(self):
+        self.assertEqual(self.complete('q=bri&type=tag')['tags'], [])
+        # An update() bumps no version, like a rename served by another process
+        RecipeTag.objects.filter(name='bread').update(name='brioche')
+        self.assertEqual(self.complete('q=bri&type=tag')['tags'], [])
+        with mock.patch('recipes.autocomplete.TAG_REFRESH', 0):
+            self.assertEqual(self.complete('q=bri&type=tag')['tags'], [{'name': 'brioche', 'count': 2}])
+
+
+class RecipeImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, IMAGE_DERIVATIVES_EAGER=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('cook', password='secret')
+        self.recipe = Recipe.objects.create(
+            title='Stew', description='Stew', prep_time=10, cook_time=60, created_by=self.user,
+            image=self.upload('stew.png'),
+        )
+
+    def upload(self, name):
+        buffer = io.BytesIO()
+        Image.new('RGB', (2000, 1000), 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def derivative_names(self):
+        entry = Recipe.objects.get(pk=self.recipe.pk).image_derivatives['image']
+        return [entry[size]['name'] for size in ('thumbnail', 'card', 'full')]
+
+    def test_saving_an_image_queues_a_job_the_worker_turns_into_derivatives(self):
+        self.assertEqual(ImageDerivativeJob.objects.get().status, 'pending')
+        self.assertEqual(process_pending(), 1)
+        self.assertEqual(ImageDerivativeJob.objects.get().status, 'done')
+
+        entry = Recipe.objects.get(pk=self.recipe.pk).image_derivatives['image']
+        self.assertEqual(entry['source'], self.recipe.image.name)
+        self.assertEqual((entry['card']['width'], entry['card']['height']), (640, 400))
+        self.assertEqual((entry['full']['width'], entry['full']['height']), (1600, 800))
+        self.assertTrue(all(default_storage.exists(name) for name in self.derivative_names()))
+
+    def test_image_stays_the_original_and_images_lists_the_derivatives(self):
+        recipe = APIClient().get(f'/api/recipes/{self.recipe.pk}/').data
+        self.assertTrue(recipe['image'].endswith(self.recipe.image.url))
+        self.assertEqual(set(recipe['images'].values()), {recipe['image']})
+
+        process_pending()
+        recipe = APIClient().get(f'/api/recipes/{self.recipe.pk}/').data
+        self.assertTrue(recipe['image'].endswith(self.recipe.image.url))
+        self.assertIn('/derivatives/', recipe['images']['card'])
+
+    def test_replaced_and_deleted_images_take_their_derivatives_along(self):
+        process_pending()
+        first = self.derivative_names()
+
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.image = self.upload('curry.png')
+        recipe.save()
+        process_pending()
+        self.assertFalse(any(default_storage.exists(name) for name in first))
+        second = self.derivative_names()
+        self.assertTrue(all(default_storage.exists(name) for name in second))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.get(pk=self.recipe.pk).delete()
+        self.assertFalse(any(default_storage.exists(name) for name in second))
+
+
+class RecipeSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        make_recipe(self.user, 'Garlic bread', description='Good with tomato soup')
+        make_recipe(self.user, 'Tomato soup', description='Warm and simple')
+        make_recipe(self.user, 'Pasta', tags=['tomato'], description='Quick dinner')
+        make_recipe(self.user, 'Salad', description='Fresh')
+
+    def titles(self, query):
+        response = APIClient().get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['title'] for recipe in response.data['results']]
+
+    def test_title_and_tag_matches_rank_above_description_matches(self):
+        titles = self.titles('tomato')
+        self.assertEqual(titles[-1], 'Garlic bread')
+        self.assertEqual(set(titles), {'Tomato soup', 'Pasta', 'Garlic bread'})
+
+    def test_every_term_must_match_and_the_last_one_as_a_prefix(self):
+        self.assertEqual(self.titles('soup tom'), ['Tomato soup', 'Garlic bread'])
+        self.assertEqual(self.titles('tom soup'), [])
+
+    def test_query_syntax_is_matched_as_plain_words(self):
+        for query in ['tomato"', '"soup" OR salad', 'NEAR(soup', 'soup -bread', 'title:salad', '*', '^soup']:
+            self.titles(query)
+        self.assertEqual(self.titles('salad OR soup'), [])
+        self.assertEqual(self.titles('"fresh"*'), ['Salad'])
+
+    def test_index_follows_recipe_and_tag_writes(self):
+        salad = Recipe.objects.get(title='Salad')
+        salad.title = 'Caprese'
+        salad.save()
+        self.assertEqual(self.titles('caprese'), ['Caprese'])
+
+        salad.tags.add(RecipeTag.objects.create(name='summer'))
+        self.assertEqual(self.titles('summer'), ['Caprese'])
+
+        salad.delete()
+        self.assertEqual(self.titles('caprese'), [])
+
+
+class RecipeCreateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def payload(self, ingredient_count):
+        return {
+            'title': 'Stew', 'description': 'Stew', 'prep_time': 10, 'cook_time': 60,
+            'ingredients': [
+                {'name': f'Ingredient {ingredient_count}-{number}', 'quantity': 1, 'unit': 'cup', 'order': number}
+                for number in range(ingredient_count)
+            ],
+            'instructions': [{'step_number': 1, 'instruction': 'Simmer'}],
+            'tags': [f'Soup {ingredient_count}', f'quick {ingredient_count}'],
+        }
+
+    def create(self, ingredient_count):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/recipes/', self.payload(ingredient_count), format='json')
+        self.assertEqual(response.status_code, 201)
+        return response, len(queries)
+
+    def test_statement_count_does_not_grow_with_the_ingredients(self):
+        # Each call brings new ingredient and tag names, and the first one seeds
+        # the statistics counters, so the compared calls take the same paths
+        self.create(1)
+        _, few = self.create(2)
+        response, many = self.create(20)
+        self.assertEqual(many, few)
+        self.assertEqual(response.data['tags'], ['soup 20', 'quick 20'])
+        recipe = Recipe.objects.latest('id')
+        self.assertEqual(recipe.ingredients.count(), 20)
+        self.assertEqual(sorted(recipe.tags.values_list('name', flat=True)), ['quick 20', 'soup 20'])
+
+    def test_a_failed_child_insert_leaves_nothing_behind(self):
+        instructions = [{'step_number': 1, 'instruction': 'Chop'}, {'step_number': 1, 'instruction': 'Simmer'}]
+        with self.assertRaises(IntegrityError):
+            create_recipe(
+                {'title': 'Stew', 'description': 'Stew', 'prep_time': 10, 'cook_time': 60, 'created_by': self.user},
+                [{'name': 'Beef', 'quantity': 1, 'unit': 'lb'}],
+                instructions,
+                ['soup'],
+            )
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Ingredient.objects.exists())
+
+
+class RecipeUserStateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_recipes(self, count):
+        for _ in range(count):
+            recipe = make_recipe(self.user, f'Recipe {Recipe.objects.count()}', tags=['dinner'])
+            if recipe.pk % 2:
+                RecipeFavorite.objects.create(user=self.user, recipe=recipe)
+            if recipe.pk % 3 == 0:
+                RecipeRating.objects.create(user=self.user, recipe=recipe, rating=recipe.pk % 5 + 1)
+
+    def list_recipes(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/', {'page_size': 50})
+        return response.data['results'], len(queries)
+
+    def test_favorite_and_rating_state_cost_the_same_for_any_page_size(self):
+        self.add_recipes(3)
+        _, few = self.list_recipes()
+        self.add_recipes(12)
+        recipes, many = self.list_recipes()
+        self.assertEqual(many, few)
+
+        self.assertEqual(len(recipes), 15)
+        for recipe in recipes:
+            self.assertEqual(recipe['is_favorited'], bool(recipe['id'] % 2))
+            rating = recipe['user_rating'] and recipe['user_rating']['rating']
+            self.assertEqual(rating, recipe['id'] % 5 + 1 if recipe['id'] % 3 == 0 else None)
+
+
+class RecipeListCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.recipe = make_recipe(self.user, 'Stew', tags=['dinner'])
+
+    def listing(self, query=''):
+        return APIClient().get(f'/api/recipes/?{query}').data['results']
+
+    def test_repeated_listings_are_served_from_the_cache(self):
+        self.listing('tags=Dinner&page=1')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.listing('tags=dinner')), 1)
+
+    def test_recipe_tag_and_rating_writes_show_at_once(self):
+        self.assertEqual([recipe['title'] for recipe in self.listing()], ['Stew'])
+
+        make_recipe(self.user, 'Soup')
+        self.assertEqual([recipe['title'] for recipe in self.listing()], ['Soup', 'Stew'])
+
+        tag = RecipeTag.objects.get(name='dinner')
+        tag.name = 'supper'
+        tag.save()
+        self.assertEqual([tag['name'] for tag in self.listing()[1]['tags']], ['supper'])
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('rater', password='secret'))
+        client.post(f'/api/recipes/{self.recipe.pk}/rate/', {'rating': 4}, format='json')
+        self.assertEqual(self.listing()[1]['average_rating'], 4)
+
+    def test_signed_in_listings_are_not_cached(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.get('/api/recipes/')
+        RecipeFavorite.objects.create(user=self.user, recipe=self.recipe)
+        self.assertTrue(client.get('/api/recipes/').data['results'][0]['is_favorited'])
+
+
+class RecipeExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        other = User.objects.create_user('other', password='secret')
+        for number in range(5):
+            make_recipe(self.user, f'Soup {number}', [('Leek', number + 1, 'piece')], ['soup'])
+        make_recipe(self.user, 'Bread', ['Flour'], ['baking'])
+        make_recipe(self.user, 'Secret soup', ['Leek'], ['soup'], is_public=False)
+        make_recipe(other, 'Other secret', ['Leek'], is_public=False)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, query):
+        response = self.client.get(f'/api/recipes/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_streams_one_record_per_line_through_the_list_filters(self):
+        records = [json.loads(line) for line in self.export('tags=soup&ordering=title').splitlines()]
+        self.assertEqual([record['title'] for record in records], [f'Soup {number}' for number in range(5)])
+        self.assertEqual(records[2]['ingredients'], [
+            {'name': 'Leek', 'quantity': 3.0, 'unit': 'piece', 'notes': '', 'order': 0},
+        ])
+        self.assertEqual(records[2]['tags'], ['soup'])
+
+        titles = {json.loads(line)['title'] for line in self.export('scope=mine').splitlines()}
+        self.assertIn('Secret soup', titles)
+        self.assertNotIn('Other secret', titles)
+
+    def test_csv_exports_import_again(self):
+        data = self.export('output=csv&tags=soup')
+        stream = io.StringIO(data, newline='')
+        report = import_recipes(stream, self.user, file_format='csv')
+        self.assertEqual((report.created, report.failed), (5, 0))
+        copy = Recipe.objects.filter(title='Soup 4').latest('id')
+        self.assertEqual(list(copy.ingredients.values_list('name', 'quantity')), [('Leek', 5.0)])
+
+    def test_small_chunks_stream_every_recipe_with_its_children(self):
+        lines = list(stream_recipes(Recipe.objects.filter(is_public=True).order_by('id'), chunk_size=2))
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(all(json.loads(line)['ingredients'] for line in lines))
+
+
+class IngredientCatalogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.recipe = make_recipe(self.user, 'Salad', ['Cherry Tomatoes (ripe), halved', 'Basil'])
+
+    def catalog_names(self, recipe):
+        return sorted(recipe.ingredients.values_list('catalog__name', flat=True))
+
+    def test_bulk_created_rows_share_entries_for_one_normalized_name(self):
+        other = make_recipe(self.user, 'Pasta', ['cherry tomato', 'Spaghetti'])
+        self.assertEqual(self.catalog_names(self.recipe), ['basil', 'cherry tomato'])
+        self.assertEqual(IngredientCatalog.objects.get(name='cherry tomato').ingredients.count(), 2)
+        self.assertEqual(self.catalog_names(other), ['cherry tomato', 'spaghetti'])
+
+    def test_single_saves_link_and_relink(self):
+        ingredient = Ingredient.objects.create(recipe=self.recipe, name='Red Onions', quantity=1, unit='piece')
+        self.assertEqual(ingredient.catalog.name, 'red onion')
+
+        ingredient.name = 'Shallots'
+        ingredient.save(update_fields=['name'])
+        self.assertEqual(Ingredient.objects.get(pk=ingredient.pk).catalog.name, 'shallot')
+
+    def test_renames_through_the_update_path_relink(self):
+        data = IngredientSerializer(self.recipe.ingredients.all(), many=True).data
+        data[1]['name'] = 'Fresh mint'
+        update_recipe(Recipe.objects.get(pk=self.recipe.pk), {}, data)
+        self.assertEqual(self.catalog_names(self.recipe), ['cherry tomato', 'fresh mint'])
+
+    def test_ingredient_filter_matches_whole_words_of_catalog_names(self):
+        make_recipe(self.user, 'Tomatillo salsa', ['Tomatillos'])
+        titles = [recipe['title'] for recipe in APIClient().get('/api/recipes/?ingredients=tomatoes').data['results']]
+        self.assertEqual(titles, ['Salad'])
+
+    def test_backfill_links_rows_written_without_a_catalog(self):
+        Ingredient.objects.filter(recipe=self.recipe).update(catalog=None)
+        self.assertEqual(backfill_catalog(), 2)
+        self.assertEqual(self.catalog_names(self.recipe), ['basil', 'cherry tomato'])
+
+
+class PantrySearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.omelette = make_recipe(self.user, 'Omelette', ['Eggs', 'Butter'])
+        self.pancakes = make_recipe(self.user, 'Pancakes', ['Egg', 'Flour', 'Milk', 'Butter'])
+        make_recipe(self.user, 'Bread', ['Flour', 'Water', 'Yeast'])
+        # Each test starts from a freshly loaded index
+        patcher = mock.patch('recipes.views.pantry_index', PantryIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, query='ingredients=eggs,butter'):
+        return [
+            (recipe['title'], recipe['coverage'], recipe['missing_ingredients'])
+            for recipe in APIClient().get(f'/api/recipes/pantry/?{query}').data['results']
+        ]
+
+    def test_recipes_rank_by_coverage(self):
+        self.assertEqual(self.search(), [('Omelette', 1.0, []), ('Pancakes', 0.5, ['Flour', 'Milk'])])
+        self.assertEqual(self.search('ingredients=eggs,butter&max_missing=1'), [('Omelette', 1.0, [])])
+
+    def test_recipe_writes_reach_the_index(self):
+        self.search()
+        make_recipe(self.user, 'Fried egg', ['Egg'])
+        self.omelette.delete()
+        self.assertEqual(self.search(), [('Fried egg', 1.0, []), ('Pancakes', 0.5, ['Flour', 'Milk'])])
+
+    def test_writes_from_other_processes_show_after_the_interval(self):
+        self.search()
+        # Bumps no version here, like an edit served by another process
+        Ingredient.objects.filter(recipe=self.pancakes, name='Milk').delete()
+        Recipe.objects.filter(pk=self.pancakes.pk).update(updated_at=timezone.now())
+        self.assertEqual(self.search()[1], ('Pancakes', 0.5, ['Flour', 'Milk']))
+        with mock.patch('recipes.pantry.REFRESH_INTERVAL', 0):
+            self.assertEqual(self.search()[1], ('Pancakes', 0.667, ['Flour']))
+
+
+class RecipeSimilarityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.curry = make_recipe(self.user, 'Curry', ['Chicken', 'Garlic', 'Rice'], ['asian'])
+        self.stir_fry = make_recipe(self.user, 'Stir fry', ['Chicken', 'Garlic', 'Rice', 'Soy sauce'], ['asian'])
+        self.roast = make_recipe(self.user, 'Roast', ['Chicken', 'Garlic'])
+        self.cake = make_recipe(self.user, 'Cake', ['Flour', 'Sugar'], ['dessert'])
+        build_similarities()
+
+    def similar(self, recipe):
+        return [item['title'] for item in APIClient().get(f'/api/recipes/{recipe.pk}/similar/').data['results']]
+
+    def stored_lists(self):
+        return list(RecipeSimilarity.objects.values_list('recipe_id', 'similar_id', 'rank'))
+
+    def test_neighbours_rank_by_shared_features(self):
+        self.assertEqual(self.similar(self.curry), ['Stir fry', 'Roast', 'Cake'])
+        self.assertEqual(self.similar(self.cake)[-1], 'Stir fry')
+
+    def test_incremental_builds_match_a_full_build(self):
+        update_recipe(Recipe.objects.get(pk=self.cake.pk), {'title': 'Rice bowl'}, [
+            {'name': name, 'quantity': 1, 'unit': 'cup', 'order': order}
+            for order, name in enumerate(['Chicken', 'Garlic', 'Rice'])
+        ], tag_names=['asian'])
+        Recipe.objects.filter(pk=self.stir_fry.pk).update(is_public=False)
+        build_similarities()
+        self.assertEqual(self.similar(self.curry), ['Rice bowl', 'Roast'])
+        self.assertFalse(RecipeSimilarity.objects.filter(recipe=self.stir_fry).exists())
+
+        incremental = self.stored_lists()
+        build_similarities(full=True)
+        self.assertEqual(self.stored_lists(), incremental)
+
+
+class RecipeFeedBuildTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        author = User.objects.create_user('author', password='secret')
+        self.curry = make_recipe(author, 'Curry', ['Chicken', 'Garlic', 'Rice'], ['asian'])
+        make_recipe(author, 'Stir fry', ['Chicken', 'Garlic', 'Rice', 'Soy sauce'], ['asian'])
+        make_recipe(author, 'Cake', ['Flour', 'Sugar'], ['dessert'])
+        make_recipe(self.user, 'My curry', ['Chicken', 'Garlic', 'Rice'], ['asian'])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def feed(self):
+        return [recipe['title'] for recipe in self.client.get('/api/recipes/feed/').data['results']]
+
+    def test_feeds_follow_taste_and_skip_seen_and_own_recipes(self):
+        self.feed()
+        RecipeFavorite.objects.create(user=self.user, recipe=self.curry)
+        self.assertEqual(build_feeds(), 1)
+        self.assertEqual(self.feed(), ['Stir fry', 'Cake'])
+
+    def test_only_stale_feeds_are_rebuilt(self):
+        self.feed()
+        self.assertEqual(build_feeds(), 1)
+        self.assertEqual(build_feeds(), 0)
+        RecipeFavorite.objects.create(user=self.user, recipe=self.curry)
+        self.assertEqual(build_feeds(), 1)
+        self.assertNotIn('Curry', self.feed())
+
+
+class RecipeFacetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        for title, cuisine, difficulty, cook_time, tags in [
+            ('Minestrone', 'italian', 'easy', 5, ['soup', 'vegan']),
+            ('Ribollita', 'italian', 'medium', 40, ['soup']),
+            ('Pho', 'other', 'hard', 120, ['soup', 'noodles']),
+            ('Lasagne', 'italian', 'hard', 60, ['pasta']),
+        ]:
+            make_recipe(self.user, title, tags=tags, cuisine=cuisine, difficulty=difficulty, cook_time=cook_time)
+
+    def facets(self, query):
+        response = APIClient().get(f'/api/recipes/?facets=1&{query}')
+        return response.data['facets']
+
+    def test_counts_cover_the_filtered_set_once_per_recipe(self):
+        facets = self.facets('tags=soup,vegan&page_size=1')
+        self.assertEqual(facets['cuisine'], {'italian': 2, 'other': 1})
+        self.assertEqual(facets['difficulty'], {'easy': 1, 'hard': 1, 'medium': 1})
+        self.assertEqual(facets['total_time'], {'0-15': 1, '16-30': 0, '31-60': 1, '61+': 1})
+        self.assertEqual(facets['tags'], {'soup': 3, 'noodles': 1, 'vegan': 1})
+
+        self.assertEqual(self.facets('cuisine=italian&max_time=60')['tags'], {'soup': 2, 'vegan': 1})
+
+    def test_pages_share_counts_that_follow_writes(self):
+        self.assertEqual(self.facets('tags=soup&page_size=1')['cuisine'], {'italian': 2, 'other': 1})
+        Recipe.objects.filter(title='Pho').update(cuisine='chinese')
+        # The cached counts are shared by every page and ordering of the listing
+        self.assertEqual(self.facets('tags=soup&page_size=2&ordering=title')['cuisine'], {'italian': 2, 'other': 1})
+
+        make_recipe(self.user, 'Miso', tags=['soup'], cuisine='japanese')
+        self.assertEqual(
+            self.facets('tags=soup&page_size=1')['cuisine'], {'italian': 2, 'chinese': 1, 'japanese': 1}
+        )
+
+
+class RecipeTagFilterTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('cook', password='secret')
+        make_recipe(user, 'Minestrone', tags=['soup', 'vegan', 'quick'])
+        make_recipe(user, 'Ribollita', tags=['soup', 'vegan'])
+        make_recipe(user, 'Pho', tags=['soup'])
+        make_recipe(user, 'Salad', tags=['vegan', 'quick'])
+
+    def titles(self, query):
+        response = APIClient().get(f'/api/recipes/?ordering=title&{query}')
+        return [recipe['title'] for recipe in response.data['results']]
+
+    def test_any_tag_lists_each_recipe_once(self):
+        self.assertEqual(self.titles('tags=soup,vegan'), ['Minestrone', 'Pho', 'Ribollita', 'Salad'])
+        self.assertEqual(self.titles('tags=soup,vegan&match=any'), self.titles('tags=soup,vegan'))
+
+    def test_all_tags_needs_every_one(self):
+        self.assertEqual(self.titles('tags=Soup,vegan&match=all'), ['Minestrone', 'Ribollita'])
+        self.assertEqual(self.titles('tags=soup,vegan,quick&match=all'), ['Minestrone'])
+        # Repeated or unknown names don't change what "every" means
+        self.assertEqual(self.titles('tags=soup,SOUP,vegan&match=all'), ['Minestrone', 'Ribollita'])
+        self.assertEqual(self.titles('tags=soup,unknown&match=all'), [])
+
+
+class RecipeConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cook', password='secret')
+        self.recipe = make_recipe(self.user, 'Stew', ['Beef'])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, **headers)
+
+    def test_matching_etag_gets_a_304_without_loading_the_recipe(self):
+        etag = self.get()['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(etag).status_code, 304)
+        self.assertEqual(self.get('"something-else"').status_code, 200)
+
+    def test_edits_favorites_and_ratings_change_the_etag(self):
+        etag = self.get()['ETag']
+        update_recipe(Recipe.objects.get(pk=self.recipe.pk), {'servings': 6})
+        response = self.get(etag)
+        self.assertEqual((response.status_code, response.data['servings']), (200, 6))
+
+        etag = response['ETag']
+        favorite = RecipeFavorite.objects.create(user=self.user, recipe=self.recipe)
+        response = self.get(etag)
+        self.assertEqual((response.status_code, response.data['is_favorited']), (200, True))
+
+        etag = response['ETag']
+        favorite.delete()
+        self.assertEqual(self.get(etag).status_code, 200)
+
+    def test_etags_are_per_user(self):
+        etag = self.get()['ETag']
+        self.client.force_authenticate(User.objects.create_user('other', password='secret'))
+        self.assertEqual(self.get(etag).status_code, 200)
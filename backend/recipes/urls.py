@@ -5,7 +5,12 @@ urlpatterns = [
     # Recipe CRUD
     path('', views.RecipeListCreateView.as_view(), name='recipe-list-create'),
     path('<int:pk>/', views.RecipeDetailView.as_view(), name='recipe-detail'),
+    path('<int:recipe_id>/similar/', views.similar_recipes, name='similar-recipes'),
     path('my-recipes/', views.MyRecipesView.as_view(), name='my-recipes'),
+    path('import/', views.recipe_import, name='recipe-import'),
+    path('export/', views.RecipeExportView.as_view(), name='recipe-export'),
+    path('pantry/', views.pantry_search, name='pantry-search'),
+    path('feed/', views.RecipeFeedView.as_view(), name='recipe-feed'),
     
     # Recipe Ratings
     path('<int:recipe_id>/rate/', views.rate_recipe, name='rate-recipe'),
@@ -16,6 +21,7 @@ urlpatterns = [
     
     # Recipe Tags
     path('tags/', views.RecipeTagsView.as_view(), name='recipe-tags'),
+    path('autocomplete/', views.recipe_autocomplete, name='recipe-autocomplete'),
     
     # Recipe Statistics
     path('stats/', views.recipe_stats, name='recipe-stats'),
@@ -1,45 +1,70 @@
+import io
+
 from rest_framework import generics, filters, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Avg, Count
+from django.db.models import Exists, OuterRef, Subquery
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db import models
+from django.db import transaction
+
+from onlypans_backend.conditional import ConditionalRetrieveMixin
+from onlypans_backend.pagination import SwitchablePagination
 
-from .models import Recipe, RecipeRating, RecipeFavorite, RecipeTag
+from .models import IngredientCatalog, Recipe, RecipeFeed, RecipeRating, RecipeFavorite, RecipeSimilarity, RecipeTag
+from .autocomplete import autocomplete
+from .cache import facet_cache_key, get_cache_timeout, get_user_state_version, public_list_cache_key
+from .catalog import recipes_with_ingredient
+from .exporting import EXPORT_FORMATS, stream_recipes
+from .facets import compute_facets
+from .filters import recipes_with_tags
+from .feed import FEED_SIZE
+from .importing import FORMATS, detect_format, import_recipes
+from .pantry import pantry_index, resolve_pantry
+from .search import RecipeSearchFilter
+from .stats import get_stats_snapshot
 from .serializers import (
     RecipeListSerializer, RecipeDetailSerializer, RecipeCreateUpdateSerializer,
     RecipeRatingSerializer, RecipeFavoriteSerializer, RecipeTagSerializer
 )
 
 
-class RecipeListCreateView(generics.ListCreateAPIView):
-    """List all recipes or create a new recipe"""
-    permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+class RecipeFilterMixin:
+    """The recipe list's filters, searching and ordering, shared with the export"""
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RecipeSearchFilter]
     filterset_fields = ['difficulty', 'cuisine', 'ai_generated']
-    search_fields = ['title', 'description', 'tags__name']
-    ordering_fields = ['created_at', 'prep_time', 'cook_time', 'title']
+    ordering_fields = ['created_at', 'prep_time', 'cook_time', 'total_time', 'title']
     ordering = ['-created_at']
     
-    def get_queryset(self):
-        queryset = Recipe.objects.filter(is_public=True).select_related('created_by').prefetch_related('tags', 'ratings')
+    def filter_by_params(self, queryset):
+        """Apply the query parameters the filter backends don't handle"""
+        # Filter by tags: any of them by default, every one with match=all
+        tags = self.request.query_params.get('tags', '')
+        tag_list = {tag.strip().lower() for tag in tags.split(',') if tag.strip()}
+        if tag_list:
+            match_all = self.request.query_params.get('match') == 'all'
+            queryset = recipes_with_tags(queryset, tag_list, match_all)
         
-        # Filter by tags
-        tags = self.request.query_params.get('tags')
-        if tags:
-            tag_list = [tag.strip() for tag in tags.split(',')]
-            queryset = queryset.filter(tags__name__in=tag_list).distinct()
+        # Filter by ingredients, all of which must be used
+        ingredients = self.request.query_params.get('ingredients')
+        if ingredients:
+            for term in ingredients.split(','):
+                if term.strip():
+                    queryset = recipes_with_ingredient(queryset, term)
         
-        # Filter by max cooking time
-        max_time = self.request.query_params.get('max_time')
-        if max_time:
-            try:
-                max_time = int(max_time)
-                queryset = queryset.filter(prep_time__lte=max_time, cook_time__lte=max_time)
-            except ValueError:
-                pass
+        # Filter by total (prep + cook) time range
+        for param, lookup in (('min_time', 'total_time__gte'), ('max_time', 'total_time__lte')):
+            value = self.request.query_params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{lookup: int(value)})
+                except ValueError:
+                    pass
         
         # Filter by favorites (for authenticated users)
         favorites_only = self.request.query_params.get('favorites')
@@ -48,6 +73,47 @@ class RecipeListCreateView(generics.ListCreateAPIView):
             queryset = queryset.filter(id__in=favorited_recipes)
         
         return queryset
+
+
+class RecipeListCreateView(RecipeFilterMixin, generics.ListCreateAPIView):
+    """List all recipes or create a new recipe"""
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = SwitchablePagination
+    cursor_ordering = ['-created_at', '-id']
+    
+    def get_queryset(self):
+        queryset = Recipe.objects.filter(is_public=True).select_related('created_by').prefetch_related('tags')
+        return self.filter_by_params(queryset)
+    
+    def list(self, request, *args, **kwargs):
+        # Anonymous listings carry no per-user state, so they can be shared
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        
+        cache_key = public_list_cache_key(request)
+        data = cache.get(cache_key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            cache.set(cache_key, response.data, get_cache_timeout())
+            return response
+        return Response(data)
+    
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.request.query_params.get('facets', '').lower() in ('1', 'true', 'yes'):
+            response.data['facets'] = self.get_facets()
+        return response
+    
+    def get_facets(self):
+        """Facet counts over the filtered set, cached unless they depend on the user's favorites"""
+        per_user = self.request.user.is_authenticated and self.request.query_params.get('favorites')
+        cache_key = None if per_user else facet_cache_key(self.request)
+        facets = cache.get(cache_key) if cache_key else None
+        if facets is None:
+            facets = compute_facets(self.filter_queryset(self.get_queryset()))
+            if cache_key:
+                cache.set(cache_key, facets, get_cache_timeout())
+        return facets
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -58,7 +124,7 @@ class RecipeListCreateView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 
-class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
+class RecipeDetailView(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete a recipe"""
     queryset = Recipe.objects.all().select_related('created_by').prefetch_related(
         'ingredients', 'instructions', 'tags', 'ratings__user'
@@ -70,6 +136,24 @@ class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
             return RecipeCreateUpdateSerializer
         return RecipeDetailSerializer
     
+    def get_version(self):
+        user_id = self.request.user.id
+        latest_rating = RecipeRating.objects.filter(recipe=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1]
+        marks = Recipe.objects.filter(pk=self.kwargs['pk']).values(
+            'id', 'is_public', 'created_by_id', 'updated_at', 'rating_count', 'rating_sum'
+        ).annotate(
+            ratings_changed_at=Subquery(latest_rating),
+            favorited=Exists(RecipeFavorite.objects.filter(recipe=OuterRef('pk'), user_id=user_id)),
+        ).first()
+        
+        # Let the regular path produce the 404/403
+        if marks is None or (not marks['is_public'] and marks['created_by_id'] != user_id):
+            return None
+        
+        # No Last-Modified: unfavoriting or deleting a rating leaves no newer
+        # timestamp behind, so If-Modified-Since alone would get a stale 304
+        return (user_id, sorted(marks.items())), None
+    
     def get_object(self):
         obj = super().get_object()
         
@@ -95,6 +179,32 @@ class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 
+class RecipeExportView(RecipeFilterMixin, generics.GenericAPIView):
+    """Stream public recipes, or the caller's own with ?scope=mine, as NDJSON or CSV"""
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        if self.request.query_params.get('scope') == 'mine':
+            queryset = Recipe.objects.filter(created_by=self.request.user)
+        else:
+            queryset = Recipe.objects.filter(is_public=True)
+        return self.filter_by_params(queryset.select_related('created_by'))
+    
+    def get(self, request, *args, **kwargs):
+        # Not `format`: DRF reserves that for renderer negotiation
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'error': f'output must be one of {", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(stream_recipes(queryset, output), content_type=EXPORT_FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="recipes.{output}"'
+        return response
+
+
 class MyRecipesView(generics.ListAPIView):
     """List current user's recipes"""
     serializer_class = RecipeListSerializer
@@ -103,9 +213,11 @@ class MyRecipesView(generics.ListAPIView):
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'title']
     ordering = ['-created_at']
+    pagination_class = SwitchablePagination
+    cursor_ordering = ['-created_at', '-id']
     
     def get_queryset(self):
-        return Recipe.objects.filter(created_by=self.request.user).prefetch_related('tags', 'ratings')
+        return Recipe.objects.filter(created_by=self.request.user).prefetch_related('tags')
 
 
 @api_view(['POST'])
@@ -113,22 +225,33 @@ class MyRecipesView(generics.ListAPIView):
 def rate_recipe(request, recipe_id):
     """Rate a recipe"""
     recipe = get_object_or_404(Recipe, id=recipe_id)
+    # A score of 1-5 is required for a new rating; an update may change only the review
+    serializer = RecipeRatingSerializer(data=request.data, partial=True)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
     
-    # Check if user has already rated this recipe
-    rating, created = RecipeRating.objects.get_or_create(
-        recipe=recipe,
-        user=request.user,
-        defaults={
-            'rating': request.data.get('rating'),
-            'review': request.data.get('review', '')
-        }
-    )
-    
-    if not created:
-        # Update existing rating
-        rating.rating = request.data.get('rating', rating.rating)
-        rating.review = request.data.get('review', rating.review)
-        rating.save()
+    with transaction.atomic():
+        ratings = RecipeRating.objects.select_for_update()
+        if 'rating' in data:
+            rating, created = ratings.get_or_create(
+                recipe=recipe,
+                user=request.user,
+                defaults={'rating': data['rating'], 'review': data.get('review', '')}
+            )
+        else:
+            rating, created = ratings.filter(recipe=recipe, user=request.user).first(), False
+            if rating is None:
+                return Response({'rating': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        previous_rating = 0 if created else rating.rating
+        
+        if not created:
+            # Update existing rating
+            rating.rating = data.get('rating', rating.rating)
+            rating.review = data.get('review', rating.review)
+            rating.save()
+        
+        # Keep the denormalized aggregates on Recipe in step
+        Recipe.apply_rating_change(recipe.id, 1 if created else 0, rating.rating - previous_rating)
     
     serializer = RecipeRatingSerializer(rating)
     return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
@@ -168,6 +291,42 @@ class FavoritesView(generics.ListAPIView):
         return RecipeFavorite.objects.filter(user=self.request.user).select_related('recipe')
 
 
+class RecipeFeedView(generics.ListAPIView):
+    """The user's personalized recipe feed"""
+    serializer_class = RecipeListSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def list(self, request, *args, **kwargs):
+        feed, _ = RecipeFeed.objects.get_or_create(user=request.user)
+        # A rebuilt feed gets a new built_at, and a favorite or rating write a
+        # new user state version, so either gives its pages new keys
+        built_at = feed.built_at.timestamp() if feed.built_at else 0
+        state_version = get_user_state_version(request.user.id)
+        cache_key = public_list_cache_key(
+            request, prefix=f'recipes:feed:{request.user.id}:{built_at}:{state_version}'
+        )
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+        
+        if feed.built_at is None:
+            # Not built yet: the best-rated recipes stand in
+            page = self.paginate_queryset(
+                Recipe.objects.filter(is_public=True).exclude(created_by=request.user)
+                .select_related('created_by').prefetch_related('tags')
+                .order_by('-average_rating', '-rating_count')[:FEED_SIZE]
+            )
+        else:
+            page = self.paginate_queryset(feed.recipe_ids)
+            recipes = Recipe.objects.filter(is_public=True).select_related('created_by').prefetch_related('tags')
+            recipes = recipes.in_bulk(page)
+            page = [recipes[recipe_id] for recipe_id in page if recipe_id in recipes]
+        
+        data = self.get_paginated_response(self.get_serializer(page, many=True).data).data
+        cache.set(cache_key, data, get_cache_timeout())
+        return Response(data)
+
+
 class RecipeTagsView(generics.ListAPIView):
     """List all recipe tags"""
     queryset = RecipeTag.objects.all().order_by('name')
@@ -175,22 +334,116 @@ class RecipeTagsView(generics.ListAPIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def recipe_autocomplete(request):
+    """Most used tags and catalog ingredients with a word starting with ?q="""
+    query = request.query_params.get('q', '')
+    kind = request.query_params.get('type')
+    if kind not in (None, '', 'tag', 'ingredient'):
+        return Response({'error': 'type must be tag or ingredient'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = {}
+    if kind != 'ingredient':
+        data['tags'] = [
+            {'name': name, 'count': count} for name, count in autocomplete.tag_index().search(query, limit)
+        ]
+    if kind != 'tag':
+        data['ingredients'] = [
+            {'name': name, 'count': count} for name, count in autocomplete.ingredient_index().search(query, limit)
+        ]
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def similar_recipes(request, recipe_id):
+    """Public recipes most like this one, from the precomputed similarity lists"""
+    recipe = get_object_or_404(Recipe.objects.only('id', 'is_public', 'created_by_id'), id=recipe_id)
+    if not recipe.is_public and recipe.created_by_id != request.user.id:
+        return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    entries = list(
+        RecipeSimilarity.objects.filter(recipe=recipe, similar__is_public=True)
+        .select_related('similar__created_by').prefetch_related('similar__tags').order_by('rank')
+    )
+    data = RecipeListSerializer([entry.similar for entry in entries], many=True, context={'request': request}).data
+    for item, entry in zip(data, entries):
+        item['similarity'] = round(entry.score, 4)
+    return Response({'results': data})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def pantry_search(request):
+    """Rank public recipes by how much of each one the given ingredients cover"""
+    terms = [term for term in request.query_params.get('ingredients', '').split(',') if term.strip()]
+    if not terms:
+        return Response({'error': 'ingredients is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        max_missing = request.query_params.get('max_missing')
+        max_missing = int(max_missing) if max_missing not in (None, '') else None
+    except ValueError:
+        return Response({'error': 'limit and max_missing must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    pantry = resolve_pantry(terms)
+    ranked = pantry_index.search(pantry, limit=limit, max_missing=max_missing)
+    
+    recipes = Recipe.objects.select_related('created_by').prefetch_related('tags').in_bulk(
+        [recipe_id for recipe_id, *_ in ranked]
+    )
+    ranked = [row for row in ranked if row[0] in recipes]
+    missing = {recipe_id: pantry_index.missing_ingredients(recipe_id, pantry) for recipe_id, *_ in ranked}
+    names = dict(
+        IngredientCatalog.objects.filter(id__in=set().union(*missing.values())).values_list('id', 'display_name')
+    )
+    
+    data = RecipeListSerializer(
+        [recipes[recipe_id] for recipe_id, *_ in ranked], many=True, context={'request': request}
+    ).data
+    for item, (recipe_id, coverage, matched, missing_count) in zip(data, ranked):
+        item.update({
+            'coverage': round(coverage, 3),
+            'matched_count': matched,
+            'missing_count': missing_count,
+            'missing_ingredients': sorted(names[catalog_id] for catalog_id in missing[recipe_id] if catalog_id in names),
+        })
+    return Response({'results': data})
+
+
 @api_view(['GET'])
 def recipe_stats(request):
     """Get recipe statistics"""
-    stats = {
-        'total_recipes': Recipe.objects.filter(is_public=True).count(),
-        'total_ratings': RecipeRating.objects.count(),
-        'average_rating': RecipeRating.objects.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0,        'popular_cuisines': list(
-            Recipe.objects.filter(is_public=True)
-            .values('cuisine')
-            .annotate(count=Count('cuisine'))
-            .order_by('-count')[:5]
-        ),
-        'popular_tags': list(
-            RecipeTag.objects.annotate(recipe_count=Count('recipes'))
-            .order_by('-recipe_count')[:10]
-            .values('name', 'recipe_count')
-        )
-    }
-    return Response(stats)
+    return Response(get_stats_snapshot())
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+def recipe_import(request):
+    """Bulk import recipes from an uploaded JSON Lines or CSV file"""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'A file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    file_format = request.data.get('format') or detect_format(upload.name)
+    if file_format not in FORMATS:
+        return Response({'error': f'Format must be one of {", ".join(FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        batch_size = max(1, int(request.data.get('batch_size', 500)))
+    except ValueError:
+        return Response({'error': 'batch_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    owner = request.user
+    if request.data.get('owner'):
+        owner = get_object_or_404(User, username=request.data['owner'])
+    
+    # Large uploads are spooled to disk by Django, so this reads a stream
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8', errors='surrogateescape', newline='')
+    report = import_recipes(stream, owner, file_format=file_format, batch_size=batch_size)
+    return Response(report.as_dict(), status=status.HTTP_201_CREATED if report.created else status.HTTP_200_OK)